@@ -0,0 +1,229 @@
+import bz2
+import io
+import json
+import os
+
+# ================= BZ2 FORMAT =================
+# A bzip2 stream is 'BZh' + level digit, then blocks that each start with the
+# 48-bit magic 0x314159265359 (followed by the block CRC) at any bit position,
+# and ends with 0x177245385090 + the combined CRC. Blocks are independent, so
+# one block can be decoded by wrapping it in a stream of its own.
+BLOCK_MAGIC = 0x314159265359
+EOS_MAGIC = 0x177245385090
+
+# Cached index saved beside each file
+INDEX_SUFFIX = '.idx.json'
+# Bumped when the index format or builder changes; older indexes are rebuilt
+INDEX_VERSION = 2
+# Candidate block ends tried per block before giving up (each extra one skips a
+# chance occurrence of a magic inside compressed data)
+MAX_BOUNDARY_TRIES = 16
+# ==============================================
+
+def _magic_patterns(magic):
+    """
+    For each of the 8 bit alignments, the whole bytes that the 48-bit magic
+    always produces, with their position relative to the magic's first byte.
+    """
+    patterns = []
+    for shift in range(8):
+        window = (magic << (8 - shift)).to_bytes(7, 'big')
+        if shift == 0:
+            patterns.append((shift, window[0:6], 0))
+        else:
+            patterns.append((shift, window[1:6], 1))
+    return patterns
+
+def _read_bits(data, bit_offset, nbits):
+    """
+    Integer value of nbits bits of data starting at bit_offset (MSB first).
+    """
+    first = bit_offset // 8
+    last = (bit_offset + nbits + 7) // 8
+    value = int.from_bytes(data[first:last], 'big')
+    trailing = last * 8 - (bit_offset + nbits)
+    return (value >> trailing) & ((1 << nbits) - 1)
+
+def find_magic_offsets(data, magic):
+    """
+    Bit offsets of every occurrence of a 48-bit magic in data, in order.
+    """
+    offsets = set()
+    for shift, pattern, lead in _magic_patterns(magic):
+        pos = data.find(pattern)
+        while pos != -1:
+            bit_offset = (pos - lead) * 8 + shift
+            if bit_offset >= 0 and _read_bits(data, bit_offset, 48) == magic:
+                offsets.add(bit_offset)
+            pos = data.find(pattern, pos + 1)
+    return sorted(offsets)
+
+def decode_block(data, level, bit_start, bit_end):
+    """
+    Decompresses the single bzip2 block stored between two bit offsets by
+    wrapping it in a one-block stream (the combined CRC of a one-block stream
+    is the block's own CRC).
+    """
+    nbits = bit_end - bit_start
+    block = _read_bits(data, bit_start, nbits)
+    block_crc = _read_bits(data, bit_start + 48, 32)
+    stream = (block << 80) | (EOS_MAGIC << 32) | block_crc
+    total_bits = nbits + 80
+    pad = (-total_bits) % 8
+    stream <<= pad
+    return bz2.decompress(b'BZh' + level + stream.to_bytes((total_bits + pad) // 8, 'big'))
+
+def build_index(bz2_path):
+    """
+    Scans a .bz2 file for its block boundaries and decodes each block once to
+    learn the uncompressed range it covers.
+    The magics can also occur by chance inside compressed data, so each block
+    is decoded up to the nearest candidate boundary that gives a valid block
+    (its CRC is checked by the decode). Blocks must chain from the first to the
+    last end-of-stream marker; files of several concatenated streams (pbzip2,
+    lbzip2) are followed across their stream headers.
+    Raises ValueError if the file can't be indexed that way.
+    Returns {'version', 'size', 'level', 'blocks': [[bit_start, bit_end, start, end], ...]}.
+    """
+    with open(bz2_path, 'rb') as f:
+        data = f.read()
+    if data[:3] != b'BZh':
+        raise ValueError(f"{bz2_path} is not a bzip2 file")
+    level = data[3:4]
+    starts = find_magic_offsets(data, BLOCK_MAGIC)
+    eos = find_magic_offsets(data, EOS_MAGIC)
+    if not starts or not eos:
+        raise ValueError(f"No bzip2 blocks found in {bz2_path}")
+    eos_set = set(eos)
+    boundaries = sorted(set(starts) | eos_set)
+
+    blocks = []
+    position = 0
+    max_level = level
+    bit_start = starts[0]
+    while True:
+        candidates = [b for b in boundaries if b > bit_start][:MAX_BOUNDARY_TRIES]
+        for bit_end in candidates:
+            try:
+                block = decode_block(data, level, bit_start, bit_end)
+            except (OSError, EOFError, ValueError):
+                continue
+            break
+        else:
+            raise ValueError(f"No valid bzip2 block at bit {bit_start} of {bz2_path}")
+        blocks.append([bit_start, bit_end, position, position + len(block)])
+        position += len(block)
+        if bit_end not in eos_set:
+            bit_start = bit_end
+            continue
+        # End of a stream: the next one (if any) starts with its own 'BZh' header
+        stream_end = (bit_end + 80 + 7) // 8
+        if stream_end >= len(data):
+            break
+        if data[stream_end:stream_end + 3] != b'BZh':
+            raise ValueError(f"Unexpected data after bzip2 stream at byte {stream_end} of {bz2_path}")
+        level = data[stream_end + 3:stream_end + 4]
+        max_level = max(max_level, level)
+        bit_start = (stream_end + 4) * 8
+        if bit_start not in starts:
+            raise ValueError(f"No bzip2 block after stream header at byte {stream_end} of {bz2_path}")
+    if stream_end != len(data):
+        raise ValueError(f"bzip2 blocks of {bz2_path} don't cover the whole file")
+    # The largest block size of any stream decodes every block
+    return {'version': INDEX_VERSION, 'size': len(data), 'level': max_level.decode(), 'blocks': blocks}
+
+def index_path(bz2_path):
+    return bz2_path + INDEX_SUFFIX
+
+def load_or_build_index(bz2_path):
+    """
+    Returns the cached block index beside the file, building (and saving) it
+    first if it is missing, was built by an older builder or belongs to a
+    different version of the file. Nothing is saved if building fails.
+    """
+    path = index_path(bz2_path)
+    size = os.path.getsize(bz2_path)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                index = json.load(f)
+            if index.get('size') == size and index.get('version') == INDEX_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+    index = build_index(bz2_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+    return index
+
+class IndexedBz2Reader(io.RawIOBase):
+    """
+    Read-only, seekable view of the uncompressed data of a .bz2 file that only
+    decodes the blocks covering the bytes actually read. The last block decoded
+    is kept, so nearby reads (header fields, pixels on the same lines) cost one
+    decode. Works as a drop-in buffer for the native HSD reader.
+    """
+    def __init__(self, bz2_path, index=None):
+        super().__init__()
+        self.index = index if index is not None else load_or_build_index(bz2_path)
+        self.level = self.index['level'].encode()
+        self.blocks = self.index['blocks']
+        self.length = self.blocks[-1][3] if self.blocks else 0
+        self.position = 0
+        self.blocks_decoded = 0
+        self.bytes_read = 0
+        self._file = open(bz2_path, 'rb')
+        self._cached = (None, b'')
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.position = max(0, offset)
+        return self.position
+
+    def _block(self, number):
+        if self._cached[0] != number:
+            bit_start, bit_end = self.blocks[number][0], self.blocks[number][1]
+            first = bit_start // 8
+            self._file.seek(first)
+            data = self._file.read((bit_end + 7) // 8 - first)
+            self.bytes_read += len(data)
+            self._cached = (number, decode_block(data, self.level, bit_start - first * 8,
+                                                 bit_end - first * 8))
+            self.blocks_decoded += 1
+        return self._cached[1]
+
+    def read(self, size=-1):
+        end = self.length if size is None or size < 0 else min(self.length, self.position + size)
+        chunks = []
+        for number, (_, _, start, stop) in enumerate(self.blocks):
+            if stop <= self.position or start >= end:
+                continue
+            block = self._block(number)
+            chunks.append(block[max(self.position, start) - start:min(end, stop) - start])
+        data = b''.join(chunks)
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
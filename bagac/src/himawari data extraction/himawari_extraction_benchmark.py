@@ -0,0 +1,139 @@
+import glob
+import json
+import os
+import platform
+import shutil
+import tempfile
+from datetime import datetime
+import himawari_bt_extraction_bz2 as extractor
+from himawari_segment_planner import plan_segments
+from himawari_stations import station_points
+from himawari_synthetic_hsd import write_synthetic_archive
+from himawari_bz2_index import INDEX_SUFFIX
+
+# ================= CONFIGURATION =================
+# Synthetic timestamps extracted by every mode
+N_TIMESTAMPS = 24
+START_TIME_UTC = datetime(2025, 4, 16, 0, 0)
+# Folder for the synthetic archive (kept between runs, so files are only
+# generated once) and the scratch output of each mode
+BENCHMARK_DIR = os.path.join(tempfile.gettempdir(), 'himawari_extraction_benchmark')
+# Results of every run are appended here; the latest run is compared with the
+# previous one with the same N_TIMESTAMPS
+HISTORY_FILE = 'himawari_extraction_benchmark.json'
+# A mode is flagged when its timestamps/s drops by more than this fraction
+REGRESSION_TOLERANCE = 0.20
+# Extraction modes: extractor settings applied for each run
+MODES = {
+    'satpy': {'USE_NATIVE_READER': False, 'DECOMPRESS_IN_MEMORY': False},
+    'native': {'USE_NATIVE_READER': True, 'DECOMPRESS_IN_MEMORY': False},
+    'native_in_memory': {'USE_NATIVE_READER': True, 'DECOMPRESS_IN_MEMORY': True,
+                         'USE_BZ2_INDEX': False},
+    # First indexed run builds the block indexes, the second reuses them
+    'native_bz2_index_cold': {'USE_NATIVE_READER': True, 'DECOMPRESS_IN_MEMORY': True,
+                              'USE_BZ2_INDEX': True},
+    'native_bz2_index_warm': {'USE_NATIVE_READER': True, 'DECOMPRESS_IN_MEMORY': True,
+                              'USE_BZ2_INDEX': True},
+}
+# =================================================
+
+def run_mode(name, settings, data_dir):
+    """
+    Runs process_himawari_data over data_dir with one mode's settings and
+    returns its timestamps/s, compressed bytes/s and peak RSS.
+    Every path the extractor writes to is pointed at the mode's scratch folder
+    (or switched off), so nothing lands in the configured study folders.
+    """
+    scratch = os.path.join(BENCHMARK_DIR, name)
+    overrides = dict(settings, DATA_DIR=data_dir, TEMP_DIR=os.path.join(scratch, 'temp'),
+                     QUARANTINE_DIR=os.path.join(scratch, 'quarantine'),
+                     OUTPUT_CSV=os.path.join(scratch, 'output.csv'), OUTPUT_PARQUET=None,
+                     ARCHIVE_ROOT=None, RAW_CACHE=None, GAP_REGISTRY=None, VERIFY_BZ2=False,
+                     CHECKPOINT_DB=None, PROFILE_OUTPUT=None, RUN_HISTORY=None, MAX_WORKERS=1)
+    saved = {key: getattr(extractor, key) for key in overrides}
+    os.makedirs(scratch, exist_ok=True)
+    if name.endswith('_cold'):
+        for path in glob.glob(os.path.join(data_dir, '*' + INDEX_SUFFIX)):
+            os.remove(path)
+    try:
+        for key, value in overrides.items():
+            setattr(extractor, key, value)
+        stats = extractor.process_himawari_data()
+    finally:
+        for key, value in saved.items():
+            setattr(extractor, key, value)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    input_bytes = sum(os.path.getsize(p) for p in glob.glob(os.path.join(data_dir, '*.DAT.bz2')))
+    elapsed = max(stats['elapsed_s'], 1e-9)
+    return {
+        'groups': stats['groups'],
+        'rows': stats['rows'],
+        'elapsed_s': stats['elapsed_s'],
+        'timestamps_per_s': stats['groups'] / elapsed,
+        'mb_per_s': input_bytes / 1e6 / elapsed,
+        'peak_rss_mb': max((p['peak_rss_mb'] for p in stats['profiles'] if p), default=0.0),
+    }
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+def find_regressions(previous, current, tolerance=REGRESSION_TOLERANCE):
+    """
+    Modes whose timestamps/s fell by more than tolerance since the previous run,
+    as {mode: (previous rate, current rate)}.
+    """
+    regressions = {}
+    for mode, result in current['results'].items():
+        before = previous['results'].get(mode) if previous else None
+        if before and result['timestamps_per_s'] < before['timestamps_per_s'] * (1 - tolerance):
+            regressions[mode] = (before['timestamps_per_s'], result['timestamps_per_s'])
+    return regressions
+
+def run_benchmark():
+    """
+    Generates (or reuses) N_TIMESTAMPS of synthetic HSD files for the stations'
+    segments, runs every mode over them, prints a table, appends the run to
+    HISTORY_FILE and reports modes that got slower than the previous run.
+    Returns the regressions found.
+    """
+    data_dir = os.path.join(BENCHMARK_DIR, f'data_{N_TIMESTAMPS}')
+    segments = plan_segments(station_points(extractor.get_stations()))
+    print(f"Preparing {N_TIMESTAMPS} synthetic timestamps (segments {segments}) in {data_dir}...")
+    write_synthetic_archive(data_dir, START_TIME_UTC, N_TIMESTAMPS, extractor.BANDS, segments)
+
+    results = {}
+    for name, settings in MODES.items():
+        print(f"\n=== {name} ===")
+        results[name] = run_mode(name, settings, data_dir)
+
+    run = {'date': datetime.now().isoformat(timespec='seconds'), 'host': platform.node(),
+           'n_timestamps': N_TIMESTAMPS, 'results': results}
+    history = load_history()
+    previous = next((r for r in reversed(history) if r['n_timestamps'] == N_TIMESTAMPS), None)
+    regressions = find_regressions(previous, run)
+
+    print("-" * 72)
+    print(f"{'mode':<24}{'timestamps/s':>14}{'MB/s':>10}{'peak RSS MB':>13}{'vs last':>11}")
+    for name, result in results.items():
+        before = previous['results'].get(name) if previous else None
+        change = (f"{100.0 * (result['timestamps_per_s'] / before['timestamps_per_s'] - 1):+.0f}%"
+                  if before else '-')
+        print(f"{name:<24}{result['timestamps_per_s']:>14.2f}{result['mb_per_s']:>10.1f}"
+              f"{result['peak_rss_mb']:>13.0f}{change:>11}")
+    print("-" * 72)
+    for name, (before, now) in regressions.items():
+        print(f"REGRESSION: {name} {before:.2f} -> {now:.2f} timestamps/s")
+    if not regressions:
+        print("No regressions." if previous else "First run; nothing to compare with yet.")
+
+    history.append(run)
+    with open(HISTORY_FILE, 'w') as f:
+        json.dump(history, f, indent=1)
+    return regressions
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -1,12 +1,27 @@
-import boto3
 import os
-from botocore import UNSIGNED
-from botocore.client import Config
 from datetime import datetime, timedelta
+from himawari_storage import build_storage_client
+from himawari_s3_listing import (iter_slots, build_manifest,
+                                 summarize_coverage, print_coverage_summary)
+from himawari_segment_planner import (plan_segments, filter_manifest_by_segments,
+                                      print_segment_savings, TYPICAL_SEGMENT_BYTES)
+from himawari_gap_registry import (open_gap_registry, skip_dead_slots, known_missing,
+                                    record_manifest, record_object, STATUS_PRESENT, STATUS_MISSING)
+from himawari_sources import hsd_file_name, object_bucket, describe_sources
+from himawari_async_download import download_async
+from himawari_verify import check_download, verify_and_quarantine, part_path, QUARANTINE_DIR
+from himawari_time_windows import (filter_slots_by_windows, describe_windows, print_download_plan,
+                                   NIGHTTIME_WINDOW, DAYTIME_WINDOW)
 
 # ================= CONFIGURATION =================
-# AWS Bucket for Himawari-9 (Public)
-BUCKET_NAME = 'noaa-himawari9'
+# AWS Bucket (Public). None = noaa-himawari8 before the 2022-12-13 switchover
+# and noaa-himawari9 after it (himawari_sources.py); set a name to force one bucket.
+BUCKET_NAME = None
+# Where the bucket lives: 's3' (AWS, or an S3-compatible server at ENDPOINT_URL
+# such as moto/MinIO) or 'directory' (local fake bucket under LOCAL_BUCKET_DIR)
+STORAGE_BACKEND = 's3'
+ENDPOINT_URL = None
+LOCAL_BUCKET_DIR = None
 LOCAL_DOWNLOAD_DIR = '/Users/danwilliammartinez/Desktop/Himawari_AWS_Study/satellite files'
 
 # Date Range: March 1, 2025 to May 31, 2025
@@ -19,63 +34,184 @@ TARGET_BANDS = [14, 15]
 
 # Himawari Full Disk is split into 10 segments (1-10)
 # You generally need all 10 to reconstruct the full disk image.
-TARGET_SEGMENTS = range(1, 11) 
+ALL_SEGMENTS = range(1, 11)
+
+# Points of interest (lat, lon) - corners of the Bataan study area.
+# Only the segments covering them are downloaded (set to [] for the full disk).
+TARGET_POINTS = [(14.5, 120.3), (14.5, 120.6), (14.9, 120.3), (14.9, 120.6)]
+TARGET_SEGMENTS = plan_segments(TARGET_POINTS) if TARGET_POINTS else ALL_SEGMENTS
+
+# List the bucket once per hour and only request objects that exist.
+# Set to False to request every expected filename blindly.
+USE_LISTING = True
+
+# Analysis windows in local PH time (UTC+8) - only these slots are downloaded.
+# Matches the nighttime/daytime cleaning scripts; set to [] for all 144 slots per day.
+LOCAL_WINDOWS = [NIGHTTIME_WINDOW, DAYTIME_WINDOW]
+# Widen each window on both sides (the combined files use a 30-min delay)
+WINDOW_PADDING_MINUTES = 30
+
+# Print the planned object count and size, then stop without downloading
+DRY_RUN = False
+
+# Registry of known missing slots (shared with the other downloaders and the
+# extractor); dead slots are skipped and every listing and 404 is recorded.
+# Set to None to request every slot.
+GAP_REGISTRY = 'himawari_gaps.sqlite'
+
+# Download with the asyncio engine, keeping this many requests in flight on one
+# event loop (e.g. 256), optionally capped to ASYNC_BANDWIDTH_MBPS in total.
+# Needs the 's3' backend (AWS over HTTPS or ENDPOINT_URL); 0 = one request at a time.
+ASYNC_IN_FLIGHT = 0
+ASYNC_BANDWIDTH_MBPS = None
+
+# CRC-check the files already downloaded (on all cores) before skipping them;
+# corrupt ones are moved to QUARANTINE_DIR and downloaded again
+VERIFY_EXISTING = True
 
 # =================================================
 
-def download_himawari_aws():
-    # 1. Setup AWS S3 Client for anonymous access
-    s3 = boto3.client('s3', config=Config(signature_version=UNSIGNED))
+def download_himawari_aws(s3_client=None):
+    # 1. Setup AWS S3 Client for anonymous access (or the configured stand-in)
+    s3 = s3_client if s3_client is not None else build_storage_client(
+        STORAGE_BACKEND, endpoint_url=ENDPOINT_URL, root_dir=LOCAL_BUCKET_DIR)
+
+    print(f"Period: {START_DATE} to {END_DATE}")
+    print(f"Bands: {TARGET_BANDS}")
+    print(f"Segments: {list(TARGET_SEGMENTS)}")
+
+    # Every 10-minute slot in the period (standard Himawari observation cycle)
+    all_slots = list(iter_slots(START_DATE, END_DATE))
+    slots = all_slots
+    if LOCAL_WINDOWS:
+        # Keep only slots whose PH time falls inside the analysis windows
+        slots = filter_slots_by_windows(all_slots, LOCAL_WINDOWS, padding_minutes=WINDOW_PADDING_MINUTES)
+        print(f"Analysis windows: {describe_windows(LOCAL_WINDOWS, padding_minutes=WINDOW_PADDING_MINUTES)}")
+
+    if slots:
+        print(f"Starting download from {f's3://{BUCKET_NAME}' if BUCKET_NAME else describe_sources(slots)}...")
+
+    band_strs = [f"B{band:02}" for band in TARGET_BANDS]
+    gaps = open_gap_registry(GAP_REGISTRY) if GAP_REGISTRY else None
+    missing = set()
+    if gaps is not None:
+        # Housekeeping slots and slots already known to be empty are never requested
+        slots, n_dead = skip_dead_slots(gaps, slots, band_strs, TARGET_SEGMENTS)
+        if n_dead:
+            print(f"Gap registry: skipping {n_dead} slot(s) with no data")
+
+    etags = {}
+    if USE_LISTING:
+        # Discovery phase: one listing per hour prefix instead of one GET per expected file
+        manifest = build_manifest(s3, BUCKET_NAME, slots, band_strs, ALL_SEGMENTS, etags=etags)
+        manifest, skipped_objects, skipped_bytes = filter_manifest_by_segments(manifest, TARGET_SEGMENTS)
+        print_segment_savings(TARGET_SEGMENTS, len(manifest), sum(manifest.values()),
+                              skipped_objects, skipped_bytes)
+        if gaps is not None:
+            record_manifest(gaps, manifest, slots, band_strs, TARGET_SEGMENTS)
+        print_coverage_summary(summarize_coverage(manifest, slots, band_strs, TARGET_SEGMENTS))
+        sizes = manifest
+    else:
+        sizes = {}
+        if gaps is not None:
+            missing = known_missing(gaps, slots, band_strs, TARGET_SEGMENTS)
+        for current_time in slots:
+            # Time components for path construction
+            year = current_time.strftime("%Y")
+            month = current_time.strftime("%m")
+            day = current_time.strftime("%d")
+            hhmm = current_time.strftime("%H%M")
+
+            # AWS S3 Path Structure: AHI-L1b-FLDK/YYYY/MM/DD/HHMM/
+            prefix = f"AHI-L1b-FLDK/{year}/{month}/{day}/{hhmm}/"
+
+            for band in TARGET_BANDS:
+                for seg in TARGET_SEGMENTS:
+                    # Construct the standard filename
+                    # Format: HS_Hxx_YYYYMMDD_hhmm_Bxx_FLDK_R20_Szz10.DAT.bz2
+                    # Hxx = H08 or H09, whichever satellite was operational
+                    # R20 = 2km resolution (Standard for IR bands 14/15)
+                    # Szz10 = Segment zz of 10
+
+                    band_str = f"B{band:02}"
+                    file_date_str = current_time.strftime("%Y%m%d_%H%M")
+
+                    filename = hsd_file_name(current_time, band_str, seg)
+                    if (file_date_str, band_str, seg) in missing:
+                        continue
+                    # Size unknown without a listing: assume a typical segment
+                    sizes[prefix + filename] = TYPICAL_SEGMENT_BYTES
+
+    keys = sorted(sizes)
+    # Skip if already exists (and, with a listing, has the listed size)
+    to_fetch = []
+    on_disk = {}
+    for key in keys:
+        local_path = os.path.join(LOCAL_DOWNLOAD_DIR, key.rsplit('/', 1)[-1])
+        if not os.path.exists(local_path) or (USE_LISTING and os.path.getsize(local_path) != sizes[key]):
+            to_fetch.append(key)
+        else:
+            on_disk[local_path] = key
+    if VERIFY_EXISTING and on_disk and not DRY_RUN:
+        bad = verify_and_quarantine(sorted(on_disk), QUARANTINE_DIR)
+        to_fetch = sorted(to_fetch + [on_disk[path] for path in bad])
+    print_download_plan(slots, all_slots, len(keys), sum(sizes.values()),
+                        len(to_fetch), sum(sizes[key] for key in to_fetch), estimated=not USE_LISTING)
+    if DRY_RUN:
+        print("Dry run: nothing downloaded.")
+        if gaps is not None:
+            gaps.close()
+        return
 
     if not os.path.exists(LOCAL_DOWNLOAD_DIR):
         os.makedirs(LOCAL_DOWNLOAD_DIR)
 
-    print(f"Starting download from s3://{BUCKET_NAME}...")
-    print(f"Period: {START_DATE} to {END_DATE}")
-    print(f"Bands: {TARGET_BANDS}")
+    if ASYNC_IN_FLIGHT and STORAGE_BACKEND == 's3':
+        def on_result(key, status, size):
+            filename = key.rsplit('/', 1)[-1]
+            if gaps is not None and status == 'downloaded':
+                record_object(gaps, filename, STATUS_PRESENT, 'download', size)
+            elif gaps is not None and status == 'missing':
+                record_object(gaps, filename, STATUS_MISSING, '404')
+
+        print(f"Downloading {len(to_fetch)} objects with up to {ASYNC_IN_FLIGHT} requests in flight...")
+        stats = download_async(((key, os.path.join(LOCAL_DOWNLOAD_DIR, key.rsplit('/', 1)[-1]),
+                                 sizes[key] if USE_LISTING else None, etags.get(key))
+                                for key in to_fetch),
+                               BUCKET_NAME, ENDPOINT_URL, on_result=on_result,
+                               max_in_flight=ASYNC_IN_FLIGHT, bandwidth_mbps=ASYNC_BANDWIDTH_MBPS)
+        print(f"Downloaded: {stats['downloaded']}  Missing on S3: {stats['missing']}  "
+              f"Failed: {stats['failed']}  ({stats['bytes'] / 1e6 / max(stats['elapsed_s'], 1e-9):.2f} MB/s)")
+    else:
+        for key in to_fetch:
+            filename = key.rsplit('/', 1)[-1]
+            local_path = os.path.join(LOCAL_DOWNLOAD_DIR, filename)
 
-    current_time = START_DATE
-    while current_time <= END_DATE:
-        # Time components for path construction
-        year = current_time.strftime("%Y")
-        month = current_time.strftime("%m")
-        day = current_time.strftime("%d")
-        hhmm = current_time.strftime("%H%M")
-        
-        # AWS S3 Path Structure: AHI-L1b-FLDK/YYYY/MM/DD/HHMM/
-        prefix = f"AHI-L1b-FLDK/{year}/{month}/{day}/{hhmm}/"
-
-        for band in TARGET_BANDS:
-            for seg in TARGET_SEGMENTS:
-                # Construct the standard filename
-                # Format: HS_H09_YYYYMMDD_hhmm_Bxx_FLDK_R20_Szz10.DAT.bz2
-                # R20 = 2km resolution (Standard for IR bands 14/15)
-                # Szz10 = Segment zz of 10
-                
-                band_str = f"B{band:02}"
-                seg_str = f"S{seg:02}10" 
-                file_date_str = current_time.strftime("%Y%m%d_%H%M")
-                
-                filename = f"HS_H09_{file_date_str}_{band_str}_FLDK_R20_{seg_str}.DAT.bz2"
-                key = prefix + filename
-                local_path = os.path.join(LOCAL_DOWNLOAD_DIR, filename)
-
-                # Skip if already exists
-                if os.path.exists(local_path):
-                    # print(f"Skipping {filename} (exists)")
-                    continue
-
-                try:
-                    print(f"Downloading: {key}")
-                    s3.download_file(BUCKET_NAME, key, local_path)
-                except Exception as e:
-                    # If 404, file might not exist (maintenance, eclipse, etc.)
-                    print(f"Failed to download {key}: {e}")
-
-        # Advance 10 minutes (standard Himawari observation cycle)
-        current_time += timedelta(minutes=10)
+            try:
+                print(f"Downloading: {key}")
+                # Written under a temporary name, so an interrupted download never
+                # leaves a truncated file that the next run would skip
+                s3.download_file(BUCKET_NAME or object_bucket(key), key, part_path(local_path))
+                problem = check_download(part_path(local_path),
+                                         sizes[key] if USE_LISTING else None, etags.get(key))
+                if problem is not None:
+                    raise OSError(f"incomplete download ({problem})")
+                os.replace(part_path(local_path), local_path)
+                if gaps is not None:
+                    record_object(gaps, filename, STATUS_PRESENT, 'download', os.path.getsize(local_path))
+            except Exception as e:
+                # If 404, file might not exist (maintenance, eclipse, etc.)
+                print(f"Failed to download {key}: {e}")
+                code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+                if gaps is not None and code in ('404', 'NoSuchKey'):
+                    record_object(gaps, filename, STATUS_MISSING, '404')
+                if os.path.exists(part_path(local_path)):
+                    os.remove(part_path(local_path))
 
+    if gaps is not None:
+        gaps.commit()
+        gaps.close()
     print("Download complete.")
 
 if __name__ == "__main__":
-    download_himawari_aws()
\ No newline at end of file
+    download_himawari_aws()
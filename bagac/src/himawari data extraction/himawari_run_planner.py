@@ -0,0 +1,210 @@
+from datetime import datetime
+from himawari_bz2_download import build_s3_client, iter_day_slots, plan_downloads
+from himawari_s3_listing import open_listing_cache, parse_himawari_filename
+from himawari_segment_planner import plan_segments
+from himawari_stations import station_points
+from himawari_bt_extraction_bz2 import get_stations
+from himawari_time_windows import (filter_slots_by_windows, describe_windows, PH_UTC_OFFSET_HOURS,
+                                   NIGHTTIME_WINDOW, DAYTIME_WINDOW)
+from himawari_gap_registry import open_gap_registry, skip_dead_slots
+from himawari_run_history import load_runs, RUN_HISTORY
+
+# ================= CONFIGURATION =================
+# Study to plan (UTC dates, whole days like the downloader)
+START_DATE = datetime(2025, 3, 1)
+END_DATE = datetime(2025, 5, 31)
+BANDS = ['B14', 'B15']
+# Stations to extract (None = the extractor's, i.e. this tree's target location);
+# only the segments covering them are counted
+STATIONS = None
+# Analysis windows in local PH time, padded like the downloader ([] = all slots)
+LOCAL_WINDOWS = [NIGHTTIME_WINDOW, DAYTIME_WINDOW]
+WINDOW_PADDING_MINUTES = 30
+
+# Exact counts and sizes from bucket listings; False = expected objects at a typical size
+USE_LISTING = True
+# Listings are cached here and reused (the downloader shares the same cache)
+LISTING_CACHE = 'himawari_listing_cache.sqlite'
+# Slots known to be empty are left out (None = count every slot)
+GAP_REGISTRY = 'himawari_gaps.sqlite'
+# None = the Himawari-8 or -9 bucket, whichever covers each date (himawari_sources.py)
+BUCKET_NAME = None
+
+# How the study would be run: download engine and concurrency, extraction
+# worker processes, and whether .bz2 files are decompressed in memory
+DOWNLOAD_ENGINE = 'threads'
+DOWNLOAD_WORKERS = 16
+EXTRACT_WORKERS = 1
+DECOMPRESS_IN_MEMORY = False
+# =================================================
+
+# Measured throughput comes from RUN_HISTORY; these are used until a run has been logged
+DEFAULT_DOWNLOAD_MB_S = 5.0
+DEFAULT_DOWNLOAD_REQUESTS_S = 20.0
+# Compressed MB/s one process decompresses
+DEFAULT_DECOMPRESS_MB_S = 15.0
+# Seconds per group for everything but decompression (load, geolocate, read)
+DEFAULT_EXTRACT_S_PER_GROUP = 0.5
+# Seconds per group decompressed in memory, decoding included
+DEFAULT_IN_MEMORY_S_PER_GROUP = 1.0
+# Decompressed HSD segments are roughly this many times larger than the .bz2
+# (same ratio as the pipeline's disk budget)
+DECOMPRESSION_RATIO = 2.5
+
+def download_rates(history=RUN_HISTORY, engine=DOWNLOAD_ENGINE, workers=DOWNLOAD_WORKERS):
+    """
+    (bytes/s, requests/s, source) measured by earlier downloads: runs with the
+    same engine and workers if there are any, else the same engine, else any.
+    """
+    for match in ({'engine': engine, 'workers': workers}, {'engine': engine}, {}):
+        runs = load_runs(history, 'download', **match)
+        elapsed = sum(run['elapsed_s'] for run in runs)
+        if runs and elapsed > 0:
+            label = ', '.join(f"{k}={v}" for k, v in match.items()) or 'any setup'
+            return (sum(run['bytes'] for run in runs) / elapsed,
+                    sum(run['requests'] for run in runs) / elapsed,
+                    f"{len(runs)} measured run(s), {label}")
+    return DEFAULT_DOWNLOAD_MB_S * 1e6, DEFAULT_DOWNLOAD_REQUESTS_S, "defaults, no measured runs"
+
+def extraction_rates(history=RUN_HISTORY, in_memory=DECOMPRESS_IN_MEMORY):
+    """
+    (compressed bytes/s decompressed per process, other seconds per group, source)
+    measured by earlier extractions. In memory only the blocks holding the
+    stations are decoded, so the time scales with groups rather than bytes:
+    the rate is None and the seconds per group include decoding (from
+    in-memory runs if there are any, else any run).
+    """
+    if in_memory:
+        for match in ({'in_memory': True}, {}):
+            runs = [run for run in load_runs(history, 'extraction', **match) if run['groups']]
+            if runs:
+                return (None, sum(run['group_s'] for run in runs) / sum(run['groups'] for run in runs),
+                        f"{len(runs)} measured run(s)" + (", same mode" if match else ", any mode"))
+        return None, DEFAULT_IN_MEMORY_S_PER_GROUP, "defaults, no measured runs"
+    runs = [run for run in load_runs(history, 'extraction', in_memory=False)
+            if run['decompress_s'] > 0]
+    if runs:
+        decompress_s = sum(run['decompress_s'] for run in runs)
+        groups = sum(run['groups'] for run in runs)
+        return (sum(run['bz2_bytes'] for run in runs) / decompress_s,
+                (sum(run['group_s'] for run in runs) - decompress_s) / groups,
+                f"{len(runs)} measured run(s), same mode")
+    return (DEFAULT_DECOMPRESS_MB_S * 1e6, DEFAULT_EXTRACT_S_PER_GROUP,
+            "defaults, no measured runs")
+
+def format_duration(seconds):
+    hours, rest = divmod(int(round(seconds)), 3600)
+    return f"{hours}h {rest // 60:02d}m" if hours else f"{rest // 60}m {rest % 60:02d}s"
+
+def plan_run(start_date=START_DATE, end_date=END_DATE, bands=BANDS, stations=STATIONS,
+             local_windows=LOCAL_WINDOWS, window_padding_minutes=WINDOW_PADDING_MINUTES,
+             use_listing=USE_LISTING, listing_cache=LISTING_CACHE, gap_registry=GAP_REGISTRY,
+             bucket_name=BUCKET_NAME, s3_client=None, history=RUN_HISTORY,
+             engine=DOWNLOAD_ENGINE, download_workers=DOWNLOAD_WORKERS,
+             extract_workers=EXTRACT_WORKERS, in_memory=DECOMPRESS_IN_MEMORY):
+    """
+    Works out what a study implies before anything is downloaded: the exact
+    objects and bytes (from the bucket listing, or its cache), the observation
+    times that can be extracted, and the download, decompression and extraction
+    wall time from the throughput of earlier runs in history.
+    Returns a dict with the counts, bytes, seconds and the rates used.
+    """
+    s3 = s3_client if s3_client is not None else build_s3_client(download_workers)
+    stations = stations or get_stations()
+    all_segments = range(1, 11)
+    segments = plan_segments(station_points(stations))
+
+    all_slots = list(iter_day_slots(start_date, end_date))
+    slots = all_slots
+    if local_windows:
+        slots = filter_slots_by_windows(all_slots, local_windows, PH_UTC_OFFSET_HOURS,
+                                        window_padding_minutes)
+        print(f"Analysis windows: {describe_windows(local_windows, PH_UTC_OFFSET_HOURS, window_padding_minutes)}")
+    gaps = open_gap_registry(gap_registry) if gap_registry else None
+    listings = open_listing_cache(listing_cache) if listing_cache and use_listing else None
+    try:
+        if gaps is not None:
+            slots, n_dead = skip_dead_slots(gaps, slots, bands, segments)
+            if n_dead:
+                print(f"Gap registry: skipping {n_dead} slot(s) with no data")
+        planned, estimated = plan_downloads(s3, bucket_name, slots, bands, segments, all_segments,
+                                            use_listing, {}, gaps, None, listings)
+    finally:
+        if gaps is not None:
+            gaps.close()
+        if listings is not None:
+            listings.close()
+
+    # Observation times with every band and segment can be extracted
+    per_slot = {}
+    largest = {}
+    for _, file_name, size in planned:
+        ts_key = parse_himawari_filename(file_name)['ts_key']
+        per_slot[ts_key] = per_slot.get(ts_key, 0) + 1
+        largest[ts_key] = largest.get(ts_key, 0) + size
+    groups = [ts_key for ts_key, n in per_slot.items() if n == len(bands) * len(segments)]
+    group_bytes = sum(largest[ts_key] for ts_key in groups)
+    total_bytes = sum(obj[2] for obj in planned)
+
+    bytes_s, requests_s, download_source = download_rates(history, engine, download_workers)
+    decompress_bytes_s, extract_s, extraction_source = extraction_rates(history, in_memory)
+    download_s = max(total_bytes / bytes_s, len(planned) / requests_s)
+    # Extraction workers split the groups (assumes near-linear scaling); in
+    # memory, decoding is part of the per-group time
+    decompress_s = (group_bytes / decompress_bytes_s / max(extract_workers, 1)
+                    if decompress_bytes_s else 0.0)
+    extract_only_s = len(groups) * extract_s / max(extract_workers, 1)
+    # Each worker holds one decompressed group on disk at a time
+    temp_bytes = 0 if in_memory else int(max(largest.values(), default=0) * DECOMPRESSION_RATIO
+                                         * max(extract_workers, 1))
+    return {
+        'slots': len(slots), 'all_slots': len(all_slots), 'segments': list(segments),
+        'objects': len(planned), 'bytes': total_bytes, 'estimated': estimated,
+        'groups': len(groups), 'rows': len(groups) * len(stations),
+        'download_s': download_s, 'decompress_s': decompress_s, 'extract_s': extract_only_s,
+        'temp_bytes': temp_bytes,
+        'rates': {'download_mb_s': bytes_s / 1e6, 'download_requests_s': requests_s,
+                  'download_source': download_source,
+                  'decompress_mb_s': decompress_bytes_s / 1e6 if decompress_bytes_s else None,
+                  'extract_s_per_group': extract_s,
+                  'extraction_source': extraction_source},
+        'engine': engine, 'download_workers': download_workers, 'extract_workers': extract_workers,
+        'in_memory': in_memory,
+    }
+
+def print_run_plan(plan):
+    rates = plan['rates']
+    size_label = "estimated" if plan['estimated'] else "listed"
+    print("=" * 60)
+    print(f"Slots: {plan['slots']} of {plan['all_slots']}   Segments: {plan['segments']}")
+    print(f"Objects: {plan['objects']}   Raw .bz2: {plan['bytes'] / 1e9:.2f} GB ({size_label})")
+    print(f"Observation times to extract: {plan['groups']}   Output rows: ~{plan['rows']}")
+    print("-" * 60)
+    print(f"Download    ({plan['engine']}, {plan['download_workers']} workers): "
+          f"{format_duration(plan['download_s'])}")
+    print(f"    at {rates['download_mb_s']:.1f} MB/s, {rates['download_requests_s']:.1f} requests/s "
+          f"[{rates['download_source']}]")
+    if plan['in_memory']:
+        print("Decompress  (in memory): decoded while extracting, timed with it")
+    else:
+        print(f"Decompress  (to disk, {plan['extract_workers']} worker(s)): "
+              f"{format_duration(plan['decompress_s'])}")
+    print(f"Extract     ({plan['extract_workers']} worker(s)): {format_duration(plan['extract_s'])}")
+    if rates['decompress_mb_s'] is None:
+        print(f"    at {rates['extract_s_per_group'] * 1000:.0f} ms per group, decoding included "
+              f"[{rates['extraction_source']}]")
+    else:
+        print(f"    at {rates['decompress_mb_s']:.1f} MB/s decompressed per worker, "
+              f"{rates['extract_s_per_group'] * 1000:.0f} ms per group otherwise [{rates['extraction_source']}]")
+    total_s = plan['download_s'] + plan['decompress_s'] + plan['extract_s']
+    print(f"Total, one stage after another: {format_duration(total_s)}   "
+          f"(streamed by himawari_pipeline.py: ~{format_duration(max(plan['download_s'], plan['decompress_s'] + plan['extract_s']))})")
+    print("-" * 60)
+    print(f"Disk: {plan['bytes'] / 1e9:.2f} GB for the raw files, "
+          f"+{plan['temp_bytes'] / 1e9:.2f} GB scratch for decompressed groups")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    print(f"Planning {START_DATE.date()} to {END_DATE.date()}, bands {BANDS}, "
+          f"{len(STATIONS or get_stations())} station(s)")
+    print_run_plan(plan_run())
@@ -0,0 +1,172 @@
+import math
+import numpy as np
+from himawari_s3_listing import parse_himawari_filename
+
+# ================= AHI FIXED GRID =================
+# Normalized geostationary projection of the 2 km full-disk grid (bands 7-16),
+# as given in the HSD header block 3 (Himawari Standard Data User's Guide, 4.4).
+AHI_2KM = {
+    'sub_lon': 140.7,          # degrees East
+    'cfac': 20466275,
+    'lfac': 20466275,
+    'coff': 2750.5,
+    'loff': 2750.5,
+    'h': 42164.0,              # distance from Earth centre to satellite (km)
+    'req': 6378.1370,          # Earth equatorial radius (km)
+    'rpol': 6356.7523,         # Earth polar radius (km)
+    'lines': 5500,
+    'columns': 5500,
+    'segments': 10,
+}
+
+# A station this many lines (or fewer) from a segment boundary also pulls in
+# the neighbouring segment, so small navigation shifts and pixel windows stay covered.
+EDGE_MARGIN_LINES = 5
+
+# Rough size of one B14/B15 2 km segment (.DAT.bz2), used when no listing is available
+TYPICAL_SEGMENT_BYTES = 3_000_000
+# =================================================
+
+def lonlat_to_fulldisk(lat, lon, grid=AHI_2KM):
+    """
+    Projects a lat/lon point onto the full-disk grid (CGMS normalized geostationary
+    projection). Returns 0-based fractional (row, col), or None if the point is
+    not visible from the satellite.
+    """
+    req, rpol, h = grid['req'], grid['rpol'], grid['h']
+    lat_r = math.radians(lat)
+    dlon = math.radians(lon - grid['sub_lon'])
+
+    # Geocentric latitude and distance from Earth centre to the point
+    c_lat = math.atan((rpol ** 2 / req ** 2) * math.tan(lat_r))
+    rl = rpol / math.sqrt(1 - ((req ** 2 - rpol ** 2) / req ** 2) * math.cos(c_lat) ** 2)
+
+    # Vector from the satellite to the point
+    r1 = h - rl * math.cos(c_lat) * math.cos(dlon)
+    r2 = -rl * math.cos(c_lat) * math.sin(dlon)
+    r3 = rl * math.sin(c_lat)
+
+    # Far side of the Earth
+    if h * (h - r1) < r2 ** 2 + (req ** 2 / rpol ** 2) * r3 ** 2:
+        return None
+
+    rn = math.sqrt(r1 ** 2 + r2 ** 2 + r3 ** 2)
+    x = math.degrees(math.atan(-r2 / r1))
+    y = math.degrees(math.asin(-r3 / rn))
+
+    # COFF/LOFF are 1-based image coordinates
+    col = grid['coff'] + x * 2 ** -16 * grid['cfac'] - 1
+    row = grid['loff'] + y * 2 ** -16 * grid['lfac'] - 1
+    return row, col
+
+def locate_points(lats, lons, grid=AHI_2KM):
+    """
+    Vectorized lonlat_to_fulldisk for many points at once: nearest full-disk pixel
+    and where it lives in the segmented files.
+    Returns a dict of arrays: row, col (0-based full disk), segment (1-based, 0 where
+    the point is not on the disk), line (0-based within the segment), pixel (= col)
+    and visible.
+    """
+    req, rpol, h = grid['req'], grid['rpol'], grid['h']
+    lat_r = np.radians(np.asarray(lats, dtype=float))
+    dlon = np.radians(np.asarray(lons, dtype=float) - grid['sub_lon'])
+
+    c_lat = np.arctan((rpol ** 2 / req ** 2) * np.tan(lat_r))
+    rl = rpol / np.sqrt(1 - ((req ** 2 - rpol ** 2) / req ** 2) * np.cos(c_lat) ** 2)
+    r1 = h - rl * np.cos(c_lat) * np.cos(dlon)
+    r2 = -rl * np.cos(c_lat) * np.sin(dlon)
+    r3 = rl * np.sin(c_lat)
+    visible = h * (h - r1) >= r2 ** 2 + (req ** 2 / rpol ** 2) * r3 ** 2
+
+    rn = np.sqrt(r1 ** 2 + r2 ** 2 + r3 ** 2)
+    x = np.degrees(np.arctan(-r2 / r1))
+    y = np.degrees(np.arcsin(-r3 / rn))
+    col = np.round(grid['coff'] + x * 2 ** -16 * grid['cfac'] - 1).astype(int)
+    row = np.round(grid['loff'] + y * 2 ** -16 * grid['lfac'] - 1).astype(int)
+    visible &= (row >= 0) & (row < grid['lines']) & (col >= 0) & (col < grid['columns'])
+
+    seg_lines = lines_per_segment(grid)
+    return {
+        'row': row,
+        'col': col,
+        'segment': np.where(visible, row // seg_lines + 1, 0),
+        'line': row % seg_lines,
+        'pixel': col,
+        'visible': visible,
+    }
+
+def fulldisk_pixel(lat, lon, grid=AHI_2KM):
+    """
+    Nearest full-disk pixel (0-based row, col) for a lat/lon point, or None if not visible.
+    """
+    position = lonlat_to_fulldisk(lat, lon, grid)
+    if position is None:
+        return None
+    row, col = int(round(position[0])), int(round(position[1]))
+    if not (0 <= row < grid['lines'] and 0 <= col < grid['columns']):
+        return None
+    return row, col
+
+def lines_per_segment(grid=AHI_2KM):
+    return grid['lines'] // grid['segments']
+
+def segment_of_row(row, grid=AHI_2KM):
+    """
+    1-based segment number (the zz in Szz10) holding a 0-based full-disk row.
+    """
+    return int(row) // lines_per_segment(grid) + 1
+
+def plan_segments(points, edge_margin=EDGE_MARGIN_LINES, grid=AHI_2KM):
+    """
+    Works out which segments cover a list of (lat, lon) points.
+    A segment's neighbour is added when a point lies within edge_margin lines
+    of the shared boundary. Returns a sorted list of segment numbers.
+    """
+    seg_lines = lines_per_segment(grid)
+    segments = set()
+    for lat, lon in points:
+        position = lonlat_to_fulldisk(lat, lon, grid)
+        if position is None:
+            print(f"Warning: ({lat}, {lon}) is not visible from the satellite; ignored.")
+            continue
+        row = position[0]
+        seg = segment_of_row(round(row), grid)
+        segments.add(seg)
+        first_row = (seg - 1) * seg_lines
+        last_row = seg * seg_lines - 1
+        if row - first_row < edge_margin and seg > 1:
+            segments.add(seg - 1)
+        if last_row - row < edge_margin and seg < grid['segments']:
+            segments.add(seg + 1)
+    return sorted(segments)
+
+def filter_manifest_by_segments(manifest, segments):
+    """
+    Splits a {key: size} manifest into the planned segments and the rest.
+    Returns (kept_manifest, skipped_objects, skipped_bytes).
+    """
+    wanted = set(segments)
+    kept = {}
+    skipped_objects = 0
+    skipped_bytes = 0
+    for key, size in manifest.items():
+        info = parse_himawari_filename(key)
+        if info is not None and info['segment'] in wanted:
+            kept[key] = size
+        else:
+            skipped_objects += 1
+            skipped_bytes += size
+    return kept, skipped_objects, skipped_bytes
+
+def print_segment_savings(segments, kept_objects, kept_bytes, skipped_objects, skipped_bytes,
+                          estimated=False, grid=AHI_2KM):
+    """
+    Prints the segment plan and how much data it avoids.
+    """
+    total_bytes = kept_bytes + skipped_bytes
+    share = 100.0 * skipped_bytes / total_bytes if total_bytes else 0.0
+    label = "Estimated savings" if estimated else "Bytes saved"
+    seg_list = ', '.join(f"S{seg:02d}{grid['segments']:02d}" for seg in segments)
+    print(f"Segment plan: {seg_list} ({len(segments)} of {grid['segments']})")
+    print(f"Keeping {kept_objects} objects ({kept_bytes / 1e9:.2f} GB), skipping {skipped_objects} "
+          f"({skipped_bytes / 1e9:.2f} GB). {label}: {share:.0f}%")
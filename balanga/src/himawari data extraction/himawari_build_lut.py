@@ -0,0 +1,109 @@
+import json
+import time
+import numpy as np
+from himawari_segment_planner import AHI_2KM, locate_points
+
+# ================= CONFIGURATION =================
+# Output lookup table (a .npy opened memory-mapped) and its settings (<LUT_PATH>.json)
+LUT_PATH = 'ahi_2km_segment_lut.npy'
+# Area covered (lat_min, lat_max, lon_min, lon_max). The default covers the
+# Philippines; the whole visible disk also works at a coarser step.
+LUT_BOUNDS = (4.0, 22.0, 116.0, 128.0)
+# Cell size in degrees. Each cell stores the pixel under its centre, so keep it
+# well below the ~0.02 degree pixel size; at 0.005 a lookup is at most one pixel off.
+LUT_STEP_DEG = 0.005
+# Random points checked against the exact projection after building
+VERIFY_POINTS = 100000
+# =================================================
+
+# segment 0 = not on the disk (or outside LUT_BOUNDS)
+LUT_DTYPE = np.dtype([('segment', 'u1'), ('line', '<u2'), ('pixel', '<u2')])
+
+def build_lut(path=LUT_PATH, bounds=LUT_BOUNDS, step=LUT_STEP_DEG, grid=AHI_2KM):
+    """
+    Writes a (lat, lon) grid of (segment, line, pixel) to a .npy file, one
+    latitude row at a time, plus a .json with the bounds/step needed to index it.
+    """
+    lat_min, lat_max, lon_min, lon_max = bounds
+    nlat = int(round((lat_max - lat_min) / step))
+    nlon = int(round((lon_max - lon_min) / step))
+    lut = np.lib.format.open_memmap(path, mode='w+', dtype=LUT_DTYPE, shape=(nlat, nlon))
+    lons = lon_min + (np.arange(nlon) + 0.5) * step
+    for i in range(nlat):
+        lat = lat_min + (i + 0.5) * step
+        located = locate_points(np.full(nlon, lat), lons, grid)
+        lut['segment'][i] = located['segment']
+        lut['line'][i] = np.where(located['visible'], located['line'], 0)
+        lut['pixel'][i] = np.where(located['visible'], located['pixel'], 0)
+    lut.flush()
+    del lut
+
+    with open(path + '.json', 'w') as f:
+        json.dump({'bounds': list(bounds), 'step': step, 'shape': [nlat, nlon], 'grid': grid}, f)
+    return path
+
+def open_lut(path=LUT_PATH):
+    """
+    Opens a table from build_lut memory-mapped (only the cells looked up are
+    paged in). Returns (lut, settings).
+    """
+    with open(path + '.json') as f:
+        settings = json.load(f)
+    return np.load(path, mmap_mode='r'), settings
+
+def lookup_lut(lut, settings, lats, lons):
+    """
+    (segment, line, pixel) of many points by direct indexing, no projection.
+    Returns a dict of arrays like locate_points: segment (0 = off the disk or
+    outside the table), line, pixel and visible.
+    """
+    lat_min, _, lon_min, _ = settings['bounds']
+    step = settings['step']
+    nlat, nlon = settings['shape']
+    i = np.floor((np.asarray(lats, dtype=float) - lat_min) / step).astype(int)
+    j = np.floor((np.asarray(lons, dtype=float) - lon_min) / step).astype(int)
+    inside = (i >= 0) & (i < nlat) & (j >= 0) & (j < nlon)
+    cells = lut[np.where(inside, i, 0), np.where(inside, j, 0)]
+    segment = np.where(inside, cells['segment'], 0).astype(int)
+    return {
+        'segment': segment,
+        'line': cells['line'].astype(int),
+        'pixel': cells['pixel'].astype(int),
+        'visible': segment > 0,
+    }
+
+def verify_lut(path=LUT_PATH, n_points=VERIFY_POINTS, seed=0):
+    """
+    Compares random lookups with the exact projection and prints how often
+    the segment and the pixel agree.
+    """
+    lut, settings = open_lut(path)
+    lat_min, lat_max, lon_min, lon_max = settings['bounds']
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(lat_min, lat_max, n_points)
+    lons = rng.uniform(lon_min, lon_max, n_points)
+
+    start = time.perf_counter()
+    looked_up = lookup_lut(lut, settings, lats, lons)
+    elapsed = time.perf_counter() - start
+    exact = locate_points(lats, lons, settings['grid'])
+
+    same_segment = looked_up['segment'] == exact['segment']
+    # Compare full-disk rows so a cell on the other side of a segment boundary counts as one line
+    seg_lines = settings['grid']['lines'] // settings['grid']['segments']
+    rows = (looked_up['segment'] - 1) * seg_lines + looked_up['line']
+    both = exact['visible'] & looked_up['visible']
+    off_by = np.maximum(np.abs(rows - exact['row']), np.abs(looked_up['pixel'] - exact['pixel']))[both]
+    print(f"Looked up {n_points} points in {elapsed * 1000:.1f} ms")
+    print(f"Same segment: {same_segment.mean():.2%}")
+    if off_by.size:
+        print(f"Same pixel: {(off_by == 0).mean():.2%} (at most {off_by.max()} pixel(s) off)")
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    build_lut()
+    nlat = int(round((LUT_BOUNDS[1] - LUT_BOUNDS[0]) / LUT_STEP_DEG))
+    nlon = int(round((LUT_BOUNDS[3] - LUT_BOUNDS[2]) / LUT_STEP_DEG))
+    print(f"Built {LUT_PATH} ({nlat} x {nlon} cells, "
+          f"{nlat * nlon * LUT_DTYPE.itemsize / 1e6:.1f} MB) in {time.perf_counter() - start:.1f} s")
+    verify_lut()
@@ -0,0 +1,190 @@
+import bz2
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import importlib.util
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import boto3
+from botocore.config import Config
+
+from himawari_bz2_download import download_himawari_data_flat
+from himawari_storage import build_storage_client, start_directory_server
+from himawari_async_download import download_async
+
+# ================= CONFIGURATION =================
+# Local S3 stand-in - nothing is fetched from the real bucket
+# 'directory': fake bucket backed by a local folder, with simulated per-request latency
+# 'http':      the same fake bucket served over HTTP by a local stand-in server in
+#              a separate process, so the asyncio engine can be compared too
+# 'moto':      moto S3 server in a separate process (pip install 'moto[server]')
+BACKEND = 'http'
+# Simulated round-trip time per request for the 'directory' and 'http' backends (seconds).
+# ~0.1 s is typical from the Philippines to us-east-1.
+LATENCY_S = 0.1
+# Simulated per-request bandwidth in Mbit/s ('directory'/'http'; None = unlimited)
+BANDWIDTH_MBPS = None
+# Fraction of downloads answered with an injected 404 / 503 SlowDown
+# ('directory'/'http'). 503s are retried by the downloader, 404s are not.
+MISSING_RATE = 0.0
+ERROR_RATE = 0.0
+
+HOST = '127.0.0.1'
+PORT = 5055
+BUCKET_NAME = 'noaa-himawari9'
+
+# Synthetic day to seed: 1 day = 144 slots x 2 bands x 10 segments
+BENCH_DATE = datetime(2025, 4, 16)
+# Number of 10-minute slots to seed (144 = full day); the rest of the day is missing
+SLOTS = 12
+# Size of each fake segment object in bytes (real B14/B15 segments are ~2-5 MB)
+OBJECT_SIZE = 256 * 1024
+
+# Worker counts to compare
+WORKER_COUNTS = [1, 4, 16, 32]
+# Requests in flight for the asyncio engine ('http' and 'moto' backends only)
+ASYNC_IN_FLIGHT = [64, 256]
+# Also run the asyncio engine streaming into in-memory decompressors instead of disk
+ASYNC_IN_MEMORY = True
+# True: list the bucket first and only request existing objects
+# False: request every expected key blindly (404s included)
+USE_LISTING = True
+# =================================================
+
+def seed_bucket(s3):
+    """
+    Uploads fake segment objects using the same key layout as the real
+    noaa-himawari9 bucket. Returns their keys.
+    """
+    # Valid .bz2 (of incompressible data) so the in-memory mode can decompress it
+    payload = bz2.compress(os.urandom(OBJECT_SIZE))
+    date_str = BENCH_DATE.strftime('%Y%m%d')
+    prefix_day = BENCH_DATE.strftime('AHI-L1b-FLDK/%Y/%m/%d')
+    keys = []
+    for slot in range(SLOTS):
+        time_str = f"{slot // 6:02d}{(slot % 6) * 10:02d}"
+        for band in ['B14', 'B15']:
+            for seg in range(1, 11):
+                file_name = f"HS_H09_{date_str}_{time_str}_{band}_FLDK_R20_S{seg:02d}10.DAT.bz2"
+                keys.append(f"{prefix_day}/{time_str}/{file_name}")
+                s3.put_object(Bucket=BUCKET_NAME, Key=keys[-1], Body=payload)
+    print(f"Seeded {len(keys)} objects ({len(keys) * len(payload) / 1e6:.1f} MB) into s3://{BUCKET_NAME}")
+    return keys
+
+def start_moto_server():
+    """
+    Starts moto's S3 server in a separate process (so it doesn't compete with
+    the download threads for the GIL) and waits until it answers.
+    """
+    server = subprocess.Popen([sys.executable, '-m', 'moto.server', '-H', HOST, '-p', str(PORT)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    endpoint_url = f"http://{HOST}:{PORT}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(endpoint_url, timeout=1)
+            return server, endpoint_url
+        except urllib.error.HTTPError:
+            # Any HTTP answer means the server is up
+            return server, endpoint_url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"Local S3 server did not start on {endpoint_url}")
+
+def run_benchmark():
+    work_dir = tempfile.mkdtemp(prefix='himawari_bench_')
+    server = None
+    results = []
+    try:
+        if BACKEND == 'moto':
+            if importlib.util.find_spec('moto') is None:
+                print("The 'moto' backend needs moto's server extra: pip install 'moto[server]'")
+                return
+            server, endpoint_url = start_moto_server()
+            # The downloader uses unsigned requests; the seeding client still needs some credentials
+            seeder = boto3.client('s3', endpoint_url=endpoint_url, region_name='us-east-1',
+                                  aws_access_key_id='bench', aws_secret_access_key='bench',
+                                  config=Config(max_pool_connections=32))
+            # Public-read, like the real bucket, so the unsigned downloader can fetch
+            seeder.create_bucket(Bucket=BUCKET_NAME, ACL='public-read')
+            seeder.put_bucket_policy(Bucket=BUCKET_NAME, Policy=(
+                '{"Statement": [{"Effect": "Allow", "Principal": "*", '
+                '"Action": ["s3:GetObject", "s3:ListBucket"], '
+                f'"Resource": ["arn:aws:s3:::{BUCKET_NAME}", "arn:aws:s3:::{BUCKET_NAME}/*"]}}]}}'))
+            keys = seed_bucket(seeder)
+            client = None
+        elif BACKEND == 'http':
+            bucket_dir = os.path.join(work_dir, 'bucket')
+            keys = seed_bucket(build_storage_client('directory', root_dir=bucket_dir))
+            server, endpoint_url = start_directory_server(
+                bucket_dir, HOST, PORT + 1, latency=LATENCY_S, bandwidth_mbps=BANDWIDTH_MBPS,
+                missing_rate=MISSING_RATE, error_rate=ERROR_RATE, seed=0)
+            client = None
+            print(f"Local HTTP bucket at {endpoint_url}: {LATENCY_S * 1000:.0f} ms per request")
+        else:
+            endpoint_url = None
+            client = build_storage_client('directory', root_dir=os.path.join(work_dir, 'bucket'),
+                                          latency=LATENCY_S, bandwidth_mbps=BANDWIDTH_MBPS,
+                                          missing_rate=MISSING_RATE, error_rate=ERROR_RATE, seed=0)
+            keys = seed_bucket(client)
+            print(f"Simulated latency: {LATENCY_S * 1000:.0f} ms per request, bandwidth: "
+                  f"{f'{BANDWIDTH_MBPS} Mbit/s' if BANDWIDTH_MBPS else 'unlimited'}, "
+                  f"injected 404s: {MISSING_RATE:.0%}, 503s: {ERROR_RATE:.0%}")
+
+        for workers in WORKER_COUNTS:
+            output_dir = os.path.join(work_dir, f"workers_{workers}")
+            print(f"\n=== {workers} worker(s) ===")
+            stats = download_himawari_data_flat(BENCH_DATE, BENCH_DATE, output_dir=output_dir,
+                                                max_workers=workers, endpoint_url=endpoint_url,
+                                                bucket_name=BUCKET_NAME, s3_client=client,
+                                                use_listing=USE_LISTING)
+            results.append(stats)
+            shutil.rmtree(output_dir)
+
+        if BACKEND == 'directory' and ASYNC_IN_FLIGHT:
+            print("\nThe asyncio engine needs an HTTP endpoint; use BACKEND = 'http' to compare it.")
+        for in_flight in ASYNC_IN_FLIGHT if endpoint_url else []:
+            output_dir = os.path.join(work_dir, f"async_{in_flight}")
+            print(f"\n=== asyncio, {in_flight} requests in flight ===")
+            stats = download_himawari_data_flat(BENCH_DATE, BENCH_DATE, output_dir=output_dir,
+                                                max_workers=in_flight, endpoint_url=endpoint_url,
+                                                bucket_name=BUCKET_NAME, s3_client=client,
+                                                use_listing=USE_LISTING, engine='asyncio')
+            results.append(stats)
+            shutil.rmtree(output_dir)
+            if ASYNC_IN_MEMORY:
+                # Same requests, decompressed as they stream in; nothing is written
+                stats = download_async([(key, None, None, None) for key in keys], BUCKET_NAME,
+                                       endpoint_url, on_data=lambda key, data: None,
+                                       max_in_flight=in_flight)
+                stats['engine'] = 'async-mem'
+                results.append(stats)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if server is not None:
+            server.terminate()
+            # moto runs as a subprocess, the HTTP stand-in as a multiprocessing.Process
+            if BACKEND == 'moto':
+                server.wait()
+            else:
+                server.join()
+
+    # Summary table
+    base = results[0]['elapsed_s'] if results else 0
+    print("\n" + "-" * 92)
+    print(f"{'engine':>9} {'workers':>8} {'seconds':>10} {'requests/s':>11} {'objects/s':>10} {'MB/s':>8} "
+          f"{'missing':>8} {'failed':>7} {'speedup':>8}")
+    for stats in results:
+        elapsed = max(stats['elapsed_s'], 1e-9)
+        print(f"{stats['engine']:>9} {stats['workers']:>8} {elapsed:>10.2f} {stats['requests'] / elapsed:>11.1f} "
+              f"{stats['downloaded'] / elapsed:>10.1f} {stats['bytes'] / 1e6 / elapsed:>8.2f} "
+              f"{stats['missing']:>8} {stats['failed']:>7} {base / elapsed:>7.1f}x")
+    print("-" * 92)
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,42 @@
+from himawari_segment_planner import plan_segments
+from himawari_stations import station_points
+from himawari_bt_extraction_bz2 import (find_timestamp_groups, run_groups, print_extraction_rate,
+                                        get_stations, ONLY_PLANNED_SEGMENTS)
+
+# ================= CONFIGURATION =================
+# Number of timestamp groups (from DATA_DIR / ARCHIVE_ROOT) used for each run
+SAMPLE_GROUPS = 48
+# Worker counts to compare; the first should be 1 (serial baseline)
+WORKER_COUNTS = [1, 2, 4, 8]
+# =================================================
+
+def run_scaling_test():
+    """
+    Extracts the same sample of groups with each worker count and prints
+    groups/s, speedup and scaling efficiency against the serial run.
+    """
+    planned_segments = plan_segments(station_points(get_stations())) if ONLY_PLANNED_SEGMENTS else None
+    grouped_files = find_timestamp_groups(planned_segments)
+    sample = {ts_key: grouped_files[ts_key] for ts_key in sorted(grouped_files)[:SAMPLE_GROUPS]}
+    if not sample:
+        return
+
+    rates = []
+    serial_rate = None
+    for workers in WORKER_COUNTS:
+        print(f"\n=== {workers} worker(s), {len(sample)} groups ===")
+        _, elapsed = run_groups(sample, workers)
+        rate = print_extraction_rate(len(sample), elapsed, workers, serial_rate)
+        if serial_rate is None:
+            serial_rate = rate
+        rates.append((workers, elapsed, rate))
+
+    print("-" * 56)
+    print(f"{'workers':>8} {'seconds':>10} {'groups/s':>10} {'speedup':>10} {'efficiency':>12}")
+    for workers, elapsed, rate in rates:
+        speedup = rate / serial_rate
+        print(f"{workers:>8} {elapsed:>10.1f} {rate:>10.2f} {speedup:>9.2f}x {100.0 * speedup / workers:>11.0f}%")
+    print("-" * 56)
+
+if __name__ == "__main__":
+    run_scaling_test()
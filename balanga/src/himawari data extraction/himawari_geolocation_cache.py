@@ -0,0 +1,54 @@
+from himawari_segment_planner import lonlat_to_fulldisk
+from himawari_stations import station_pixel_indices
+
+# The AHI fixed grid doesn't move between timestamps, so the pixel of every
+# station only has to be worked out once per grid (or satpy area) per process.
+# Keys: (area hash, area shape, stations) and (grid parameters, stations).
+_AREA_CACHE = {}
+_GRID_CACHE = {}
+CACHE_STATS = {'hits': 0, 'misses': 0}
+
+def stations_key(stations):
+    """
+    Hashable form of a (name, lat, lon) registry.
+    """
+    return tuple((str(name), float(lat), float(lon)) for name, lat, lon in stations)
+
+def cached_pixel_indices(area, stations):
+    """
+    station_pixel_indices (rows, cols, inside) for a satpy/pyresample area,
+    computed on the first call for that area and reused afterwards.
+    """
+    key = (hash(area), area.shape, stations_key(stations))
+    if key in _AREA_CACHE:
+        CACHE_STATS['hits'] += 1
+    else:
+        CACHE_STATS['misses'] += 1
+        _AREA_CACHE[key] = station_pixel_indices(area, stations)
+    return _AREA_CACHE[key]
+
+def cached_fulldisk_pixels(grid, stations):
+    """
+    Nearest full-disk (row, col) of every station on an AHI grid (AHI_2KM-style
+    dict, e.g. from an HSD header), or None where the satellite can't see it.
+    In-segment rows are these minus the segment's first row.
+    """
+    key = (tuple(sorted(grid.items())), stations_key(stations))
+    if key in _GRID_CACHE:
+        CACHE_STATS['hits'] += 1
+        return _GRID_CACHE[key]
+    CACHE_STATS['misses'] += 1
+    pixels = []
+    for _, lat, lon in stations:
+        position = lonlat_to_fulldisk(lat, lon, grid)
+        pixels.append(None if position is None else (int(round(position[0])), int(round(position[1]))))
+    _GRID_CACHE[key] = pixels
+    return pixels
+
+def print_geolocation_cache_stats():
+    """
+    Prints how many station lookups were computed versus served from the cache.
+    """
+    total = CACHE_STATS['hits'] + CACHE_STATS['misses']
+    print(f"Geolocation: {CACHE_STATS['misses']} grid(s) projected, "
+          f"{CACHE_STATS['hits']} of {total} lookups served from cache")
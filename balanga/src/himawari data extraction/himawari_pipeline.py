@@ -0,0 +1,308 @@
+import os
+import queue
+import shutil
+import threading
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from himawari_bz2_download import (build_s3_client, iter_day_slots, download_with_retry,
+                                   plan_downloads)
+from himawari_segment_planner import plan_segments
+from himawari_gap_registry import open_gap_registry, skip_dead_slots, record_object, STATUS_MISSING
+from himawari_time_windows import (filter_slots_by_windows, describe_windows,
+                                   PH_UTC_OFFSET_HOURS, NIGHTTIME_WINDOW, DAYTIME_WINDOW)
+from himawari_stations import station_points
+from himawari_parquet import write_parquet_dataset
+from himawari_profiling import start_group, finish_group, print_profile_summary
+import himawari_bt_extraction_bz2 as extractor
+from himawari_bt_extraction_bz2 import (decompress_group, read_group_stations, read_group_in_memory,
+                                        get_stations, output_columns)
+
+# ================= CONFIGURATION =================
+# Date range to stream (UTC)
+START_DATE = datetime(2025, 4, 16)
+END_DATE = datetime(2025, 4, 30)
+
+# Scratch folder for files in flight; emptied as soon as each group is extracted
+WORK_DIR = '/Users/danwilliammartinez/Desktop/Himawari_AWS_Study/pipeline_work'
+OUTPUT_CSV = 'himawari_ph_temperature.csv'
+# Optional Parquet dataset (partitioned by station and month); None = CSV only
+OUTPUT_PARQUET = None
+
+# Peak disk usage allowed for files in flight (compressed + decompressed).
+# The downloader waits when the next group would go over it.
+DISK_BUDGET_BYTES = 2 * 1024 ** 3
+# Decompressed HSD segments are roughly this many times larger than the .bz2
+DECOMPRESSION_RATIO = 2.5
+
+# Concurrent downloads and how many groups may wait between stages
+DOWNLOAD_WORKERS = 8
+QUEUE_SIZE = 4
+
+# Same analysis windows as the downloader (local PH time), padded by 30 min
+LOCAL_WINDOWS = [NIGHTTIME_WINDOW, DAYTIME_WINDOW]
+WINDOW_PADDING_MINUTES = 30
+
+# Gap registry shared with the downloaders (None = request every slot)
+GAP_REGISTRY = 'himawari_gaps.sqlite'
+# =================================================
+
+class DiskBudget:
+    """
+    Counts the bytes reserved by groups in flight. reserve() blocks while the
+    next group would exceed the limit, which holds the downloader back until the
+    extraction stage frees space. A group larger than the whole budget is still
+    let through once nothing else is in flight, so the pipeline can't stall.
+    """
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.used_bytes = 0
+        self.peak_bytes = 0
+        self.waits = 0
+        self._cond = threading.Condition()
+
+    def reserve(self, nbytes):
+        with self._cond:
+            if self.used_bytes and self.used_bytes + nbytes > self.limit_bytes:
+                self.waits += 1
+            while self.used_bytes and self.used_bytes + nbytes > self.limit_bytes:
+                self._cond.wait()
+            self.used_bytes += nbytes
+            self.peak_bytes = max(self.peak_bytes, self.used_bytes)
+
+    def release(self, nbytes):
+        with self._cond:
+            self.used_bytes -= nbytes
+            self._cond.notify_all()
+
+    def adjust(self, delta):
+        """Corrects a reservation once the real size on disk is known."""
+        with self._cond:
+            self.used_bytes += delta
+            self.peak_bytes = max(self.peak_bytes, self.used_bytes)
+            self._cond.notify_all()
+
+def group_by_timestamp(planned, bands):
+    """
+    Groups planned (object_key, file_name, size) entries by observation time.
+    Returns a chronological list of (ts_key, objects); timestamps missing any
+    of the bands are dropped since they can't produce a row.
+    """
+    groups = {}
+    for obj in planned:
+        parts = obj[1].split('_')
+        groups.setdefault(f"{parts[2]}_{parts[3]}", []).append(obj)
+    complete = []
+    for ts_key in sorted(groups):
+        present = {obj[1].split('_')[4] for obj in groups[ts_key]}
+        if all(band in present for band in bands):
+            complete.append((ts_key, groups[ts_key]))
+    return complete
+
+def run_pipeline(start_date, end_date, work_dir=WORK_DIR, output_csv=OUTPUT_CSV,
+                 output_parquet=OUTPUT_PARQUET,
+                 disk_budget_bytes=DISK_BUDGET_BYTES, download_workers=DOWNLOAD_WORKERS,
+                 queue_size=QUEUE_SIZE, stations=None, local_windows=LOCAL_WINDOWS,
+                 window_padding_minutes=WINDOW_PADDING_MINUTES, bucket_name=None,
+                 s3_client=None, use_listing=True, extract=read_group_stations,
+                 gap_registry=GAP_REGISTRY):
+    """
+    Streams the date range through three concurrent stages linked by bounded queues:
+      download   -> fetches every segment of one timestamp into work_dir/<ts_key>/
+      decompress -> unpacks the .bz2 files and deletes them straight away
+      extract    -> reads the station pixel, then deletes the group folder
+    With the extractor's DECOMPRESS_IN_MEMORY (and native reader) nothing is
+    unpacked to disk: the extract stage reads the .bz2 files in memory.
+    Disk space is reserved per group before it is downloaded and released after
+    extraction, so peak disk stays around disk_budget_bytes however long the range is
+    (decompressed sizes are estimated with DECOMPRESSION_RATIO until known).
+    stations is a (name, lat, lon) registry; defaults to the extractor's stations.
+    With gap_registry, slots known to be empty are never requested and 404s are
+    recorded for later runs.
+    Returns a dict with the run statistics.
+    """
+    s3 = s3_client if s3_client is not None else build_s3_client(download_workers)
+    stations = stations or get_stations()
+    # The extractor's settings are read now, not at import, so changes made after import apply
+    bands = extractor.BANDS
+    all_segments = range(1, 11)
+    segments = plan_segments(station_points(stations))
+
+    stats = {'groups': 0, 'rows': 0, 'failed_groups': 0, 'bytes_downloaded': 0,
+             'peak_reserved_bytes': 0, 'budget_waits': 0, 'elapsed_s': 0.0}
+    start_time = time.perf_counter()
+
+    # 1. Plan the run exactly like the downloader
+    slots = list(iter_day_slots(start_date, end_date))
+    if local_windows:
+        slots = filter_slots_by_windows(slots, local_windows, PH_UTC_OFFSET_HOURS, window_padding_minutes)
+        print(f"Analysis windows: {describe_windows(local_windows, PH_UTC_OFFSET_HOURS, window_padding_minutes)}")
+    gaps = open_gap_registry(gap_registry) if gap_registry else None
+    if gaps is not None:
+        slots, n_dead = skip_dead_slots(gaps, slots, bands, segments)
+        if n_dead:
+            print(f"Gap registry: skipping {n_dead} slot(s) with no data")
+    etags = {}
+    planned, estimated = plan_downloads(s3, bucket_name, slots, bands, segments, all_segments,
+                                        use_listing, {}, gaps, etags)
+    groups = group_by_timestamp(planned, bands)
+    stats['groups'] = len(groups)
+    print(f"Streaming {len(groups)} observation times through a "
+          f"{disk_budget_bytes / 1e9:.2f} GB disk budget...")
+
+    in_memory = extractor.DECOMPRESS_IN_MEMORY and extractor.USE_NATIVE_READER
+    if in_memory and extract is read_group_stations:
+        # Files are deleted right after extraction, so a block index would never be reused
+        def extract(hsd_files, stations):
+            return read_group_in_memory(hsd_files, stations, use_index=False)
+    # Only the .bz2 files ever touch the disk in memory mode
+    ratio = 0 if in_memory else DECOMPRESSION_RATIO
+
+    os.makedirs(work_dir, exist_ok=True)
+    budget = DiskBudget(disk_budget_bytes)
+    downloaded_q = queue.Queue(maxsize=queue_size)
+    decompressed_q = queue.Queue(maxsize=queue_size)
+    lock = threading.Lock()
+    # Objects that came back 404, recorded in the gap registry by this thread
+    # at the end (SQLite connections stay on the thread that opened them)
+    missing_files = []
+
+    def download_group(ts_key, objects, reserved):
+        group_dir = os.path.join(work_dir, ts_key)
+        paths = []
+        try:
+            os.makedirs(group_dir, exist_ok=True)
+            for object_key, file_name, listed_size in objects:
+                local_file_path = os.path.join(group_dir, file_name)
+                status, size = download_with_retry(
+                    s3, bucket_name, object_key, local_file_path,
+                    expected_size=None if estimated else listed_size,
+                    expected_etag=etags.get(object_key))
+                with lock:
+                    stats['bytes_downloaded'] += size
+                if status == 'missing':
+                    with lock:
+                        missing_files.append(file_name)
+                if status != 'downloaded':
+                    # Incomplete group: pass it on so the later stages free its space
+                    paths = None
+                    break
+                paths.append(local_file_path)
+        except Exception as e:
+            print(f"\nError downloading {ts_key}: {e}")
+            paths = None
+        # Blocks while the decompressor is behind (bounded queue)
+        downloaded_q.put((ts_key, group_dir, paths, reserved))
+
+    def download_stage():
+        with ThreadPoolExecutor(max_workers=download_workers) as pool:
+            for ts_key, objects in groups:
+                reserved = int(sum(obj[2] for obj in objects) * (1 + ratio))
+                # Backpressure: wait for extraction to free disk space
+                budget.reserve(reserved)
+                pool.submit(download_group, ts_key, objects, reserved)
+        downloaded_q.put(None)
+
+    def decompress_stage():
+        while True:
+            item = downloaded_q.get()
+            if item is None:
+                break
+            ts_key, group_dir, paths, reserved = item
+            if in_memory:
+                # Decompressed by the extract stage, in memory
+                decompressed_q.put(item)
+                continue
+            hsd_files = None
+            if paths is not None:
+                try:
+                    hsd_files = decompress_group(paths, group_dir)
+                except Exception as e:
+                    print(f"\nError decompressing {ts_key}: {e}")
+            # The compressed copies are never needed again
+            for path in paths or []:
+                if os.path.exists(path):
+                    os.remove(path)
+            if hsd_files:
+                # Swap the estimate for what is actually on disk now
+                actual = sum(os.path.getsize(path) for path in hsd_files)
+                budget.adjust(actual - reserved)
+                reserved = actual
+            decompressed_q.put((ts_key, group_dir, hsd_files, reserved))
+        decompressed_q.put(None)
+
+    threads = [threading.Thread(target=download_stage, daemon=True),
+               threading.Thread(target=decompress_stage, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    # 2. Extraction runs on this thread as groups arrive
+    results = []
+    profiles = []
+    while True:
+        item = decompressed_q.get()
+        if item is None:
+            break
+        ts_key, group_dir, hsd_files, reserved = item
+        start_group(ts_key)
+        try:
+            if hsd_files is None:
+                stats['failed_groups'] += 1
+                print(f"Skipping {ts_key}: download incomplete.")
+                continue
+            utc_time = datetime.strptime(ts_key, "%Y%m%d_%H%M")
+            ph_time = utc_time + timedelta(hours=PH_UTC_OFFSET_HOURS)
+            # All stations from one load of the scene
+            for values in extract(hsd_files, stations):
+                row_data = {'timestamp_ph': ph_time, 'timestamp_utc': utc_time}
+                row_data.update(values)
+                results.append(row_data)
+            print(f"Processed: {ph_time.strftime('%Y-%m-%d %H:%M:%S')} (PST)")
+        except Exception as e:
+            stats['failed_groups'] += 1
+            print(f"\nError processing {ts_key}: {e}")
+        finally:
+            # Raw and decompressed files are gone once the values are extracted
+            shutil.rmtree(group_dir, ignore_errors=True)
+            budget.release(reserved)
+            profiles.append(finish_group())
+
+    for thread in threads:
+        thread.join()
+
+    if gaps is not None:
+        for file_name in missing_files:
+            record_object(gaps, file_name, STATUS_MISSING, '404')
+        gaps.commit()
+        gaps.close()
+
+    stats['rows'] = len(results)
+    stats['peak_reserved_bytes'] = budget.peak_bytes
+    stats['budget_waits'] = budget.waits
+    stats['elapsed_s'] = time.perf_counter() - start_time
+    stats['profiles'] = profiles
+
+    # 3. Save results to CSV (in timestamp order)
+    if results:
+        df = pd.DataFrame(results).sort_values(['timestamp_utc', 'station'])
+        cols = output_columns()
+        df[cols].to_csv(output_csv, index=False)
+        print(f"Data saved to: {os.path.abspath(output_csv)}")
+        if output_parquet:
+            write_parquet_dataset(df[cols], output_parquet)
+            print(f"Parquet dataset: {os.path.abspath(output_parquet)}")
+    else:
+        print("No valid data was extracted.")
+
+    print("-" * 30)
+    print(f"Groups: {stats['groups']}  Rows: {stats['rows']}  Failed: {stats['failed_groups']}")
+    print(f"Downloaded {stats['bytes_downloaded'] / 1e6:.1f} MB in {stats['elapsed_s']:.1f} s")
+    print(f"Peak disk reserved: {stats['peak_reserved_bytes'] / 1e6:.1f} MB "
+          f"(budget {disk_budget_bytes / 1e6:.1f} MB, downloader waited {stats['budget_waits']} times)")
+    print_profile_summary(profiles)
+    print("-" * 30)
+    return stats
+
+if __name__ == "__main__":
+    run_pipeline(START_DATE, END_DATE)
@@ -0,0 +1,311 @@
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta, timezone
+from himawari_sources import split_slots_by_bucket, describe_sources
+
+# Root prefix of the full-disk L1b data in the NOAA Himawari buckets
+FLDK_ROOT = 'AHI-L1b-FLDK'
+
+# A cached listing is reused as-is once the period it covers ended at least this
+# long before it was listed (late uploads have landed by then); newer ones are re-listed
+LISTING_FINAL_HOURS = 24
+
+# Prefixes listed at once by build_manifest. Listing is bound by round trips,
+# so a multi-year plan (tens of thousands of hour prefixes) needs many in flight.
+LISTING_WORKERS = 32
+
+def parse_himawari_filename(file_name):
+    """
+    Splits a standard HSD filename into its parts:
+    HS_Hxx_YYYYMMDD_hhmm_Bxx_FLDK_R20_Szz10.DAT.bz2
+    Returns a dict, or None if the name doesn't follow the convention.
+    """
+    parts = os.path.basename(file_name).split('_')
+    if len(parts) < 8 or not parts[7].startswith('S'):
+        return None
+    try:
+        timestamp = datetime.strptime(f"{parts[2]}_{parts[3]}", "%Y%m%d_%H%M")
+        segment = int(parts[7][1:3])
+        total_segments = int(parts[7][3:5])
+    except ValueError:
+        return None
+    return {
+        'satellite': parts[1],
+        'timestamp': timestamp,
+        'ts_key': f"{parts[2]}_{parts[3]}",
+        'band': parts[4],
+        'area': parts[5],
+        'resolution': parts[6],
+        'segment': segment,
+        'total_segments': total_segments,
+    }
+
+def iter_slots(start_time, end_time, step_minutes=10):
+    """
+    Yields every observation slot (datetime) from start_time to end_time inclusive.
+    """
+    current = start_time
+    while current <= end_time:
+        yield current
+        current += timedelta(minutes=step_minutes)
+
+def slot_prefix(slot):
+    """
+    S3 prefix holding all files of one 10-minute slot: AHI-L1b-FLDK/YYYY/MM/DD/HHMM/
+    """
+    return f"{FLDK_ROOT}/{slot.strftime('%Y/%m/%d/%H%M')}/"
+
+def list_prefix(s3, bucket_name, prefix, max_retries=3, backoff=1.0, etags=None):
+    """
+    Lists every object under prefix with list_objects_v2, following continuation tokens.
+    Each page request is retried with exponential backoff.
+    Returns a dict {key: size_in_bytes}; the ETags are added to etags if a dict is given.
+    """
+    objects = {}
+    kwargs = {'Bucket': bucket_name, 'Prefix': prefix}
+    while True:
+        for attempt in range(max_retries + 1):
+            try:
+                response = s3.list_objects_v2(**kwargs)
+                break
+            except Exception:
+                if attempt == max_retries:
+                    raise
+                time.sleep(backoff * (2 ** attempt))
+        for obj in response.get('Contents', []):
+            objects[obj['Key']] = obj['Size']
+            if etags is not None and obj.get('ETag'):
+                etags[obj['Key']] = obj['ETag'].strip('"')
+        if not response.get('IsTruncated'):
+            return objects
+        kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+def listing_prefixes(slots, granularity='hour'):
+    """
+    Returns the sorted set of listing prefixes covering the given slots.
+    'hour' lists AHI-L1b-FLDK/YYYY/MM/DD/HH (6 slots, ~1 page per request),
+    'day' lists AHI-L1b-FLDK/YYYY/MM/DD/ (144 slots, all 16 bands, ~24 pages).
+    """
+    if granularity == 'day':
+        fmt = '%Y/%m/%d/'
+    elif granularity == 'hour':
+        fmt = '%Y/%m/%d/%H'
+    else:
+        raise ValueError(f"Unknown listing granularity: {granularity}")
+    return sorted({f"{FLDK_ROOT}/{slot.strftime(fmt)}" for slot in slots})
+
+def open_listing_cache(path):
+    """
+    Opens (and creates if needed) the SQLite cache of bucket listings, one
+    row per listed prefix, so repeated plans and runs don't list again.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS listings (
+            bucket    TEXT NOT NULL,
+            prefix    TEXT NOT NULL,
+            listed_at TEXT NOT NULL,       -- UTC
+            objects   TEXT NOT NULL,       -- JSON {key: [size, etag]}
+            PRIMARY KEY (bucket, prefix)
+        )""")
+    return conn
+
+def _prefix_end(prefix):
+    """
+    UTC time at which the period of an hour or day listing prefix ends.
+    """
+    parts = prefix[len(FLDK_ROOT) + 1:].rstrip('/').split('/')
+    start = datetime(*(int(part) for part in parts))
+    return start + (timedelta(hours=1) if len(parts) == 4 else timedelta(days=1))
+
+def cached_listing(conn, bucket_name, prefix, etags=None):
+    """
+    A cached listing {key: size} taken at least LISTING_FINAL_HOURS after its
+    period ended, or None if the prefix has to be listed (again).
+    """
+    row = conn.execute("SELECT listed_at, objects FROM listings WHERE bucket = ? AND prefix = ?",
+                       (bucket_name, prefix)).fetchone()
+    if row is None:
+        return None
+    listed_at = datetime.fromisoformat(row[0])
+    if listed_at < _prefix_end(prefix) + timedelta(hours=LISTING_FINAL_HOURS):
+        return None
+    objects = {}
+    for key, (size, etag) in json.loads(row[1]).items():
+        objects[key] = size
+        if etags is not None and etag:
+            etags[key] = etag
+    return objects
+
+def store_listing(conn, bucket_name, prefix, objects, etags):
+    """
+    Saves a fresh listing ({key: size} and its {key: etag}) in the cache. The caller commits.
+    """
+    conn.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)",
+                 (bucket_name, prefix,
+                  datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds'),
+                  json.dumps({key: [size, etags.get(key)] for key, size in objects.items()})))
+
+def list_prefix_cached(conn, s3, bucket_name, prefix, etags=None):
+    """
+    list_prefix through the listing cache: a final cached listing is returned
+    without a request, anything else is listed again and stored. Commits.
+    """
+    objects = cached_listing(conn, bucket_name, prefix, etags)
+    if objects is not None:
+        return objects
+    listed_etags = {}
+    objects = list_prefix(s3, bucket_name, prefix, etags=listed_etags)
+    if etags is not None:
+        etags.update(listed_etags)
+    store_listing(conn, bucket_name, prefix, objects, listed_etags)
+    conn.commit()
+    return objects
+
+def _list_prefix_etags(s3, bucket_name, prefix):
+    etags = {}
+    return list_prefix(s3, bucket_name, prefix, etags=etags), etags
+
+def build_manifest(s3, bucket_name, slots, bands, segments, granularity='hour', etags=None,
+                   listing_cache=None, listing_workers=LISTING_WORKERS):
+    """
+    Discovery phase: lists the bucket once per hour (or day) prefix and keeps
+    only the keys for the requested slots, bands and segments.
+    Returns an in-memory manifest {key: size_in_bytes} of objects that actually exist.
+    With bucket_name None each slot is listed in the bucket of the satellite
+    that observed it (himawari_sources.py), so a range spanning the Himawari-8
+    to -9 switchover is planned in one go.
+    Up to listing_workers prefixes are listed at once on threads sharing the
+    client; the cache and the manifest are only touched on this thread.
+    Pass a dict as etags to also collect the listed ETags (used to verify downloads).
+    listing_cache is an open listing cache (open_listing_cache) to reuse final listings from.
+    """
+    slots = list(slots)
+    wanted_bands = set(bands)
+    wanted_segments = set(segments)
+    manifest = {}
+
+    # (bucket, prefix, slots wanted from it), slots kept per bucket so a day
+    # prefix at the switchover only contributes its own satellite's half
+    jobs = []
+    for bucket, bucket_slots in split_slots_by_bucket(slots, bucket_name):
+        wanted_slots = {slot.strftime('%Y%m%d_%H%M') for slot in bucket_slots}
+        jobs.extend((bucket, prefix, wanted_slots)
+                    for prefix in listing_prefixes(bucket_slots, granularity))
+
+    def keep(listing, wanted_slots):
+        for key, size in listing.items():
+            info = parse_himawari_filename(key)
+            if info is None:
+                continue
+            if (info['ts_key'] in wanted_slots and info['band'] in wanted_bands
+                    and info['segment'] in wanted_segments):
+                manifest[key] = size
+
+    to_list = []
+    for bucket, prefix, wanted_slots in jobs:
+        listing = cached_listing(listing_cache, bucket, prefix, etags) if listing_cache is not None else None
+        if listing is None:
+            to_list.append((bucket, prefix, wanted_slots))
+        else:
+            keep(listing, wanted_slots)
+    if slots and bucket_name is None:
+        print(f"Sources: {describe_sources(slots)}")
+    buckets = sorted({bucket for bucket, _, _ in jobs})
+    print(f"Listing {len(to_list)} prefixes in {', '.join(f's3://{b}' for b in buckets)}"
+          + (f" ({len(jobs) - len(to_list)} cached)" if len(to_list) < len(jobs) else "") + "...")
+
+    def finish(bucket, prefix, wanted_slots, listing, listed_etags):
+        if etags is not None:
+            etags.update(listed_etags)
+        if listing_cache is not None:
+            store_listing(listing_cache, bucket, prefix, listing, listed_etags)
+        keep(listing, wanted_slots)
+
+    if listing_workers <= 1 or len(to_list) <= 1:
+        for bucket, prefix, wanted_slots in to_list:
+            finish(bucket, prefix, wanted_slots, *_list_prefix_etags(s3, bucket, prefix))
+    else:
+        # Bounded like the download pool, so listings wait in memory only
+        # while this thread files the previous ones
+        in_flight = set()
+        pending = {}
+        with ThreadPoolExecutor(max_workers=listing_workers) as pool:
+            for bucket, prefix, wanted_slots in to_list:
+                if len(in_flight) >= listing_workers * 4:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(*pending.pop(future), *future.result())
+                future = pool.submit(_list_prefix_etags, s3, bucket, prefix)
+                pending[future] = (bucket, prefix, wanted_slots)
+                in_flight.add(future)
+            for future in in_flight:
+                finish(*pending.pop(future), *future.result())
+    if listing_cache is not None:
+        listing_cache.commit()
+    return manifest
+
+def summarize_coverage(manifest, slots, bands, segments):
+    """
+    Compares the manifest against what the slots/bands/segments should contain.
+    Returns a dict with the expected/found object counts and the empty and
+    partially available slots.
+    """
+    per_slot = {}
+    for key in manifest:
+        info = parse_himawari_filename(key)
+        per_slot[info['ts_key']] = per_slot.get(info['ts_key'], 0) + 1
+
+    objects_per_slot = len(bands) * len(segments)
+    slot_keys = [slot.strftime('%Y%m%d_%H%M') for slot in slots]
+    empty = [ts_key for ts_key in slot_keys if ts_key not in per_slot]
+    partial = [(ts_key, objects_per_slot - per_slot[ts_key])
+               for ts_key in slot_keys if 0 < per_slot.get(ts_key, 0) < objects_per_slot]
+    return {
+        'slots': len(slot_keys),
+        'expected_objects': len(slot_keys) * objects_per_slot,
+        'found_objects': len(manifest),
+        'found_bytes': sum(manifest.values()),
+        'empty_slots': empty,
+        'partial_slots': partial,
+    }
+
+def format_slot_ranges(ts_keys, step_minutes=10):
+    """
+    Collapses consecutive slot keys (YYYYMMDD_hhmm) into "first..last" ranges.
+    """
+    ranges = []
+    for ts_key in ts_keys:
+        slot = datetime.strptime(ts_key, "%Y%m%d_%H%M")
+        if ranges and slot - ranges[-1][1] == timedelta(minutes=step_minutes):
+            ranges[-1][1] = slot
+        else:
+            ranges.append([slot, slot])
+    return [first.strftime("%Y%m%d_%H%M") if first == last
+            else f"{first.strftime('%Y%m%d_%H%M')}..{last.strftime('%Y%m%d_%H%M')}"
+            for first, last in ranges]
+
+def print_coverage_summary(coverage, max_listed=20):
+    """
+    Prints a coverage report instead of one error line per missing object.
+    """
+    complete = coverage['slots'] - len(coverage['empty_slots']) - len(coverage['partial_slots'])
+    print("-" * 30)
+    print(f"Coverage: {coverage['found_objects']}/{coverage['expected_objects']} objects "
+          f"({coverage['found_bytes'] / 1e9:.2f} GB) in {coverage['slots']} slots")
+    print(f"Complete slots: {complete}  Partial: {len(coverage['partial_slots'])}  "
+          f"Empty: {len(coverage['empty_slots'])}")
+    if coverage['empty_slots']:
+        empty_ranges = format_slot_ranges(coverage['empty_slots'])
+        listed = ', '.join(empty_ranges[:max_listed])
+        more = len(empty_ranges) - max_listed
+        print(f"Empty slots (UTC): {listed}" + (f" ... (+{more} more)" if more > 0 else ""))
+    if coverage['partial_slots']:
+        listed = ', '.join(f"{ts_key} (-{n})" for ts_key, n in coverage['partial_slots'][:max_listed])
+        more = len(coverage['partial_slots']) - max_listed
+        print(f"Partial slots (UTC, missing objects): {listed}" + (f" ... (+{more} more)" if more > 0 else ""))
+    print("-" * 30)
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime
+
+# Full-disk L1b archives on AWS Open Data, oldest first. Each satellite serves
+# the slots from its start time until the next one took over (UTC): Himawari-8
+# went operational on 2015-07-07 02:00, Himawari-9 replaced it on 2022-12-13 05:00.
+# Both use the same key layout (AHI-L1b-FLDK/YYYY/MM/DD/HHMM/) and HSD format;
+# only the bucket and the HS_Hxx_ filename prefix differ.
+SATELLITE_SOURCES = [
+    {'satellite': 'H08', 'bucket': 'noaa-himawari8', 'start': datetime(2015, 7, 7, 2, 0)},
+    {'satellite': 'H09', 'bucket': 'noaa-himawari9', 'start': datetime(2022, 12, 13, 5, 0)},
+]
+
+def source_for(slot, sources=SATELLITE_SOURCES):
+    """
+    The source (satellite, bucket) that observed a slot (UTC datetime).
+    """
+    current = None
+    for source in sources:
+        if slot >= source['start']:
+            current = source
+    if current is None:
+        raise ValueError(f"No Himawari full-disk archive covers {slot:%Y-%m-%d %H:%M} UTC "
+                         f"(the first starts {sources[0]['start']:%Y-%m-%d %H:%M})")
+    return current
+
+def hsd_file_name(slot, band, segment, sources=SATELLITE_SOURCES):
+    """
+    Standard HSD filename of one segment, with the satellite that observed the slot:
+    HS_Hxx_YYYYMMDD_hhmm_Bxx_FLDK_R20_Szz10.DAT.bz2
+    """
+    satellite = source_for(slot, sources)['satellite']
+    return f"HS_{satellite}_{slot.strftime('%Y%m%d_%H%M')}_{band}_FLDK_R20_S{segment:02d}10.DAT.bz2"
+
+def object_bucket(key, sources=SATELLITE_SOURCES):
+    """
+    Bucket holding an object, from the satellite in its filename
+    (HS_H08_... -> noaa-himawari8). Falls back to the latest source.
+    """
+    satellite = os.path.basename(key).split('_')[1] if '_' in os.path.basename(key) else None
+    for source in sources:
+        if source['satellite'] == satellite:
+            return source['bucket']
+    return sources[-1]['bucket']
+
+def split_slots_by_bucket(slots, bucket_name=None, sources=SATELLITE_SOURCES):
+    """
+    Groups slots by the bucket they are read from, in order of first appearance.
+    bucket_name, if given, overrides the registry (e.g. a local stand-in bucket).
+    Returns a list of (bucket, [slots]).
+    """
+    groups = {}
+    for slot in slots:
+        bucket = bucket_name or source_for(slot, sources)['bucket']
+        groups.setdefault(bucket, []).append(slot)
+    return list(groups.items())
+
+def describe_sources(slots, sources=SATELLITE_SOURCES):
+    """
+    One-line summary of which satellite covers which part of the slots, e.g.
+    "H08 (noaa-himawari8) 2022-12-01 00:00..2022-12-13 04:50, H09 (noaa-himawari9) ..."
+    """
+    spans = []
+    for slot in sorted(slots):
+        source = source_for(slot, sources)
+        if spans and spans[-1][0] is source:
+            spans[-1][2] = slot
+        else:
+            spans.append([source, slot, slot])
+    return ', '.join(f"{source['satellite']} ({source['bucket']}) "
+                     f"{first:%Y-%m-%d %H:%M}..{last:%Y-%m-%d %H:%M}"
+                     for source, first, last in spans)
@@ -0,0 +1,243 @@
+import bz2
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from himawari_segment_planner import AHI_2KM
+
+# ================= CONFIGURATION =================
+# Where write_synthetic_archive puts the files when run directly
+OUTPUT_DIR = 'himawari_synthetic'
+# First timestamp (UTC), number of 10-minute timestamps, bands and segments
+START_TIME_UTC = datetime(2025, 4, 16, 0, 0)
+N_TIMESTAMPS = 6
+BANDS = ['B14', 'B15']
+SEGMENTS = [4]
+# bzip2 level of the written files (JMA's files use 9)
+COMPRESS_LEVEL = 9
+# =================================================
+
+# ================= HSD HEADER LAYOUT =================
+# All eleven header blocks in full (HSD User's Guide, section 5), so satpy's
+# ahi_hsd reader accepts the files as well as himawari_hsd_reader.py.
+BASIC_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                       ('total_number_of_hblocks', '<u2'), ('byte_order', 'u1'),
+                       ('satellite', 'S16'), ('proc_center_name', 'S16'),
+                       ('observation_area', 'S4'), ('other_observation_info', 'S2'),
+                       ('observation_timeline', '<u2'), ('observation_start_time', '<f8'),
+                       ('observation_end_time', '<f8'), ('file_creation_time', '<f8'),
+                       ('total_header_length', '<u4'), ('total_data_length', '<u4'),
+                       ('quality_flag1', 'u1'), ('quality_flag2', 'u1'),
+                       ('quality_flag3', 'u1'), ('quality_flag4', 'u1'),
+                       ('file_format_version', 'S32'), ('file_name', 'S128'), ('spare', 'S40')])
+DATA_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                      ('number_of_bits_per_pixel', '<u2'), ('number_of_columns', '<u2'),
+                      ('number_of_lines', '<u2'), ('compression_flag_for_data', 'u1'),
+                      ('spare', 'S40')])
+PROJ_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                      ('sub_lon', '<f8'), ('CFAC', '<u4'), ('LFAC', '<u4'),
+                      ('COFF', '<f4'), ('LOFF', '<f4'), ('distance_from_earth_center', '<f8'),
+                      ('earth_equatorial_radius', '<f8'), ('earth_polar_radius', '<f8'),
+                      ('req2_rpol2_req2', '<f8'), ('rpol2_req2', '<f8'), ('req2_rpol2', '<f8'),
+                      ('coeff_for_sd', '<f8'), ('resampling_types', '<i2'),
+                      ('resampling_size', '<i2'), ('spare', 'S40')])
+NAV_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                     ('navigation_info_time', '<f8'), ('SSP_longitude', '<f8'),
+                     ('SSP_latitude', '<f8'), ('distance_earth_center_to_satellite', '<f8'),
+                     ('nadir_longitude', '<f8'), ('nadir_latitude', '<f8'),
+                     ('sun_position', '<f8', (3,)), ('moon_position', '<f8', (3,)),
+                     ('spare', 'S40')])
+CAL_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                     ('band_number', '<u2'), ('central_wave_length', '<f8'),
+                     ('valid_number_of_bits_per_pixel', '<u2'),
+                     ('count_value_error_pixels', '<u2'),
+                     ('count_value_outside_scan_pixels', '<u2'),
+                     ('gain_count2rad_conversion', '<f8'),
+                     ('offset_count2rad_conversion', '<f8')])
+IR_CAL_INFO = np.dtype([('c0_rad2tb_conversion', '<f8'), ('c1_rad2tb_conversion', '<f8'),
+                        ('c2_rad2tb_conversion', '<f8'), ('c0_tb2rad_conversion', '<f8'),
+                        ('c1_tb2rad_conversion', '<f8'), ('c2_tb2rad_conversion', '<f8'),
+                        ('speed_of_light', '<f8'), ('planck_constant', '<f8'),
+                        ('boltzmann_constant', '<f8'), ('spare', 'S40')])
+INTER_CAL_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                           ('gsics_calibration_intercept', '<f8'),
+                           ('gsics_calibration_slope', '<f8'),
+                           ('gsics_calibration_coeff_quadratic_term', '<f8'),
+                           ('gsics_std_scn_radiance_bias', '<f8'),
+                           ('gsics_std_scn_radiance_bias_uncertainty', '<f8'),
+                           ('gsics_std_scn_radiance', '<f8'),
+                           ('gsics_correction_starttime', '<f8'),
+                           ('gsics_correction_endtime', '<f8'),
+                           ('gsics_radiance_validity_upper_lim', '<f4'),
+                           ('gsics_radiance_validity_lower_lim', '<f4'),
+                           ('gsics_filename', 'S128'), ('spare', 'S56')])
+SEGMENT_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                         ('total_number_of_segments', 'u1'),
+                         ('segment_sequence_number', 'u1'),
+                         ('first_line_number_of_image_segment', '<u2'), ('spare', 'S40')])
+NAV_CORRECTION_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                                ('center_column_of_rotation', '<f4'),
+                                ('center_line_of_rotation', '<f4'),
+                                ('amount_of_rotational_correction', '<f8'),
+                                ('numof_correction_info_data', '<u2')])
+OBSERVATION_TIME_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                                  ('number_of_observation_times', '<u2')])
+# Block 10 is the only block with a 4-byte length
+ERROR_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u4'),
+                       ('number_of_error_info_data', '<u2')])
+SPARE_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'), ('spare', 'S256')])
+# Blocks 8-10 end with 40 spare bytes after their (here empty) tables
+TABLE_SPARE_BYTES = 40
+# =====================================================
+
+# Central wavelength (um) and count -> radiance calibration of the IR bands,
+# chosen so counts 5200-6800 span roughly 290-220 K.
+BAND_CALIBRATION = {
+    'B07': (3.8853, -0.000235, 1.6061),
+    'B08': (6.2429, -0.002556, 17.7349),
+    'B09': (6.9410, -0.003263, 22.7895),
+    'B10': (7.3467, -0.003591, 25.1767),
+    'B11': (8.5926, -0.004167, 29.5949),
+    'B12': (9.6372, -0.004221, 30.3240),
+    'B13': (10.4073, -0.004090, 29.6356),
+    'B14': (11.2395, -0.003848, 28.1478),
+    'B15': (12.3806, -0.003432, 25.4318),
+    'B16': (13.2807, -0.003084, 23.0841),
+}
+ERROR_COUNT = 65535
+OUTSIDE_SCAN_COUNT = 65534
+
+def _record(dtype, **values):
+    record = np.zeros(1, dtype=dtype)
+    for name, value in values.items():
+        record[name] = value
+    return record.tobytes()
+
+def modified_julian_date(timestamp):
+    """
+    Observation time as stored in HSD headers (days since 1858-11-17).
+    """
+    return (timestamp - datetime(1858, 11, 17)) / timedelta(days=1)
+
+def synthetic_file_name(timestamp, band, segment, satellite='H09', total_segments=10):
+    """
+    HSD filename, e.g. HS_H09_20250416_0200_B14_FLDK_R20_S0410.DAT.bz2.
+    """
+    return (f"HS_{satellite}_{timestamp:%Y%m%d_%H%M}_{band}_FLDK_R20_"
+            f"S{segment:02d}{total_segments:02d}.DAT.bz2")
+
+def synthetic_counts(lines, columns, first_row, seed):
+    """
+    Smooth cloud-like count field with sensor noise, so files compress about as
+    well as real ones (a purely random field barely compresses).
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.arange(first_row, first_row + lines)[:, None]
+    cols = np.arange(columns)[None, :]
+    phase = rng.uniform(0, 2 * np.pi, 3)
+    field = (5800
+             + 500 * np.sin(rows / 97.0 + phase[0]) * np.cos(cols / 131.0 + phase[1])
+             + 300 * np.sin((rows + cols) / 53.0 + phase[2]))
+    field += rng.normal(0, 4, size=(lines, columns))
+    return np.clip(field, 0, 16383).astype('<u2')
+
+def build_synthetic_segment(timestamp, band, segment, grid=AHI_2KM, counts=None, seed=None):
+    """
+    Bytes of one uncompressed HSD segment file for an IR band with navigation
+    from grid. counts (lines x columns) defaults to synthetic_counts, seeded
+    from the timestamp, band and segment so every file differs but is reproducible.
+    """
+    lines = grid['lines'] // grid['segments']
+    columns = grid['columns']
+    first_row = (segment - 1) * lines
+    if seed is None:
+        seed = int(f"{timestamp:%Y%m%d%H%M}") * 100 + int(band[1:]) * 10 + segment
+    if counts is None:
+        counts = synthetic_counts(lines, columns, first_row, seed)
+    cwl, gain, offset = BAND_CALIBRATION[band]
+    name = synthetic_file_name(timestamp, band, segment, total_segments=grid['segments'])[:-4]
+
+    blocks = [
+        _record(DATA_INFO, hblock_number=2, blocklength=DATA_INFO.itemsize,
+                number_of_bits_per_pixel=16, number_of_columns=columns, number_of_lines=lines),
+        _record(PROJ_INFO, hblock_number=3, blocklength=PROJ_INFO.itemsize,
+                sub_lon=grid['sub_lon'], CFAC=grid['cfac'], LFAC=grid['lfac'],
+                COFF=grid['coff'], LOFF=grid['loff'], distance_from_earth_center=grid['h'],
+                earth_equatorial_radius=grid['req'], earth_polar_radius=grid['rpol']),
+        _record(NAV_INFO, hblock_number=4, blocklength=NAV_INFO.itemsize,
+                navigation_info_time=modified_julian_date(timestamp),
+                SSP_longitude=grid['sub_lon'], distance_earth_center_to_satellite=grid['h'],
+                nadir_longitude=grid['sub_lon']),
+        _record(CAL_INFO, hblock_number=5, blocklength=CAL_INFO.itemsize + IR_CAL_INFO.itemsize,
+                band_number=int(band[1:]), central_wave_length=cwl,
+                valid_number_of_bits_per_pixel=14, count_value_error_pixels=ERROR_COUNT,
+                count_value_outside_scan_pixels=OUTSIDE_SCAN_COUNT,
+                gain_count2rad_conversion=gain, offset_count2rad_conversion=offset)
+        + _record(IR_CAL_INFO, c0_rad2tb_conversion=-0.1, c1_rad2tb_conversion=1.0003,
+                  c2_rad2tb_conversion=-1.1e-6, speed_of_light=2.99792458e8,
+                  planck_constant=6.62606957e-34, boltzmann_constant=1.3806488e-23),
+        _record(INTER_CAL_INFO, hblock_number=6, blocklength=INTER_CAL_INFO.itemsize),
+        _record(SEGMENT_INFO, hblock_number=7, blocklength=SEGMENT_INFO.itemsize,
+                total_number_of_segments=grid['segments'], segment_sequence_number=segment,
+                first_line_number_of_image_segment=first_row + 1),
+        _record(NAV_CORRECTION_INFO, hblock_number=8,
+                blocklength=NAV_CORRECTION_INFO.itemsize + TABLE_SPARE_BYTES,
+                center_column_of_rotation=grid['coff'], center_line_of_rotation=grid['loff'])
+        + bytes(TABLE_SPARE_BYTES),
+        _record(OBSERVATION_TIME_INFO, hblock_number=9,
+                blocklength=OBSERVATION_TIME_INFO.itemsize + TABLE_SPARE_BYTES)
+        + bytes(TABLE_SPARE_BYTES),
+        _record(ERROR_INFO, hblock_number=10, blocklength=ERROR_INFO.itemsize + TABLE_SPARE_BYTES)
+        + bytes(TABLE_SPARE_BYTES),
+        _record(SPARE_INFO, hblock_number=11, blocklength=SPARE_INFO.itemsize),
+    ]
+    header_length = BASIC_INFO.itemsize + sum(len(block) for block in blocks)
+    start = modified_julian_date(timestamp)
+    basic = _record(BASIC_INFO, hblock_number=1, blocklength=BASIC_INFO.itemsize,
+                    total_number_of_hblocks=11, byte_order=0, satellite=b'Himawari-9',
+                    proc_center_name=b'SYNTHETIC', observation_area=b'FLDK',
+                    observation_timeline=int(f"{timestamp:%H%M}"),
+                    observation_start_time=start, observation_end_time=start + 10 / 1440,
+                    file_creation_time=start + 15 / 1440, total_header_length=header_length,
+                    total_data_length=counts.size * 2, file_format_version=b'1.3',
+                    file_name=name.encode())
+    return basic + b''.join(blocks) + np.ascontiguousarray(counts, dtype='<u2').tobytes()
+
+def write_synthetic_segment(path, timestamp, band, segment, grid=AHI_2KM, counts=None,
+                            seed=None, compress_level=COMPRESS_LEVEL):
+    """
+    Writes one segment file, bzip2-compressed when path ends in .bz2.
+    Returns the number of bytes written.
+    """
+    data = build_synthetic_segment(timestamp, band, segment, grid, counts, seed)
+    if path.endswith('.bz2'):
+        data = bz2.compress(data, compress_level)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+def write_synthetic_archive(output_dir, start_time, n_timestamps, bands=BANDS, segments=SEGMENTS,
+                            interval_minutes=10, compress_level=COMPRESS_LEVEL):
+    """
+    Writes a flat folder of .DAT.bz2 files (the layout of himawari_data_flat)
+    for n_timestamps consecutive observations. Files already there are kept.
+    Returns the list of paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i in range(n_timestamps):
+        timestamp = start_time + timedelta(minutes=interval_minutes * i)
+        for band in bands:
+            for segment in segments:
+                path = os.path.join(output_dir, synthetic_file_name(timestamp, band, segment))
+                if not os.path.exists(path):
+                    write_synthetic_segment(path, timestamp, band, segment,
+                                            compress_level=compress_level)
+                paths.append(path)
+    return paths
+
+if __name__ == "__main__":
+    written = write_synthetic_archive(OUTPUT_DIR, START_TIME_UTC, N_TIMESTAMPS)
+    total = sum(os.path.getsize(p) for p in written)
+    print(f"{len(written)} synthetic segment files in {os.path.abspath(OUTPUT_DIR)} ({total / 1e6:.1f} MB)")
@@ -0,0 +1,122 @@
+import bz2
+import glob
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from himawari_bz2_index import INDEX_SUFFIX
+
+# ================= CONFIGURATION =================
+# Folder checked when run directly
+VERIFY_DIR = '/Users/danwilliammartinez/Desktop/Himawari_AWS_Study/himawari_data_flat'
+# Corrupt files are moved here (with a log of why), so the next download run
+# fetches them again instead of skipping them
+QUARANTINE_DIR = 'quarantine'
+# Worker processes for the CRC check (None = all cores)
+VERIFY_WORKERS = None
+# =================================================
+
+# Suffix of a download in progress; renamed to the final name only once complete
+PART_SUFFIX = '.part'
+
+def part_path(path):
+    """
+    Name a download of path is written under until complete: <path>.<pid>.part,
+    so processes fetching the same object at once (e.g. station trees sharing
+    the raw cache) never write to or delete each other's partial file.
+    """
+    return f"{path}.{os.getpid()}{PART_SUFFIX}"
+
+def check_download(path, expected_size=None, expected_etag=None):
+    """
+    Compares a downloaded file with what the bucket listing said.
+    Returns None if it matches, otherwise a short description of the problem.
+    Multipart ETags (with a '-') aren't an MD5 of the file, so only plain ones are checked.
+    """
+    size = os.path.getsize(path)
+    if expected_size is not None and size != expected_size:
+        return f"size {size} != listed {expected_size}"
+    if expected_etag and '-' not in expected_etag:
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                md5.update(chunk)
+        if md5.hexdigest() != expected_etag:
+            return f"MD5 {md5.hexdigest()} != ETag {expected_etag}"
+    return None
+
+def check_bz2(path, chunk_size=1 << 20):
+    """
+    Decompresses a .bz2 file without keeping the output, which checks the CRC
+    of every block and of every stream. Returns None if the file is intact,
+    otherwise the error (truncated files end before the stream does).
+    """
+    decompressor = bz2.BZ2Decompressor()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                while chunk:
+                    if decompressor.eof:
+                        # Concatenated streams (as written by pbzip2/lbzip2)
+                        decompressor = bz2.BZ2Decompressor()
+                    decompressor.decompress(chunk)
+                    chunk = decompressor.unused_data
+    except (OSError, EOFError, ValueError) as e:
+        return str(e) or type(e).__name__
+    if not decompressor.eof:
+        return "truncated (stream ends early)"
+    return None
+
+def verify_files(paths, workers=VERIFY_WORKERS):
+    """
+    Runs check_bz2 over the paths in parallel processes.
+    Returns {path: error} for the corrupt ones.
+    """
+    paths = list(paths)
+    if not paths:
+        return {}
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        errors = [check_bz2(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            errors = list(pool.map(check_bz2, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    return {path: error for path, error in zip(paths, errors) if error is not None}
+
+def quarantine_files(bad, quarantine_dir=QUARANTINE_DIR):
+    """
+    Moves the corrupt files ({path: error}) into quarantine_dir and appends why
+    to quarantine_dir/quarantine.log. Their block indexes are deleted, since the
+    files downloaded again will need new ones. Returns the number of files moved.
+    """
+    if not bad:
+        return 0
+    os.makedirs(quarantine_dir, exist_ok=True)
+    with open(os.path.join(quarantine_dir, 'quarantine.log'), 'a') as log:
+        for path, error in sorted(bad.items()):
+            shutil.move(path, os.path.join(quarantine_dir, os.path.basename(path)))
+            if os.path.exists(path + INDEX_SUFFIX):
+                os.remove(path + INDEX_SUFFIX)
+            log.write(f"{datetime.now().isoformat(timespec='seconds')}\t{path}\t{error}\n")
+            print(f"Quarantined {os.path.basename(path)}: {error}")
+    return len(bad)
+
+def verify_and_quarantine(paths, quarantine_dir=QUARANTINE_DIR, workers=VERIFY_WORKERS):
+    """
+    CRC-checks the files and quarantines the corrupt ones.
+    Returns {path: error} of the files that were moved.
+    """
+    paths = list(paths)
+    print(f"Verifying {len(paths)} .bz2 file(s) with {workers or os.cpu_count()} process(es)...")
+    bad = verify_files(paths, workers)
+    quarantine_files(bad, quarantine_dir)
+    print(f"{len(paths) - len(bad)} intact, {len(bad)} corrupt"
+          + (f" (moved to {quarantine_dir})" if bad else ""))
+    return bad
+
+if __name__ == "__main__":
+    # Leftovers of interrupted downloads are never complete
+    for part in glob.glob(os.path.join(VERIFY_DIR, '*' + PART_SUFFIX)):
+        os.remove(part)
+    verify_and_quarantine(sorted(glob.glob(os.path.join(VERIFY_DIR, '*.DAT.bz2'))))
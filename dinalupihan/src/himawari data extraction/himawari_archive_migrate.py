@@ -0,0 +1,20 @@
+from himawari_archive import migrate_flat_folder, open_catalog
+
+# ================= CONFIGURATION =================
+# Existing flat download folder (as written by download_himawari_data_flat)
+FLAT_DIR = '/Users/danwilliammartinez/Desktop/Himawari_AWS_Study/himawari_data_flat'
+# Root of the sharded archive: <root>/<satellite>/<band>/YYYY/MM/DD/HHMM/
+ARCHIVE_ROOT = '/Users/danwilliammartinez/Desktop/Himawari_AWS_Study/himawari_archive'
+# True moves the files (instant on the same disk), False copies them
+MOVE_FILES = True
+# =================================================
+
+if __name__ == "__main__":
+    print(f"Migrating {FLAT_DIR} -> {ARCHIVE_ROOT} ({'move' if MOVE_FILES else 'copy'})")
+    migrated, skipped = migrate_flat_folder(FLAT_DIR, ARCHIVE_ROOT, move=MOVE_FILES)
+    print(f"Migrated {migrated} files, left {skipped} unrecognised files in place.")
+
+    conn = open_catalog(ARCHIVE_ROOT)
+    total, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+    conn.close()
+    print(f"Catalog now holds {total} files ({size / 1e9:.2f} GB).")
@@ -2,80 +2,490 @@ import boto3
 import botocore
 from botocore.config import Config
 import os
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
+from himawari_s3_listing import (iter_slots, slot_prefix, build_manifest, parse_himawari_filename,
+                                 summarize_coverage, print_coverage_summary, open_listing_cache,
+                                 LISTING_WORKERS)
+from himawari_sources import hsd_file_name, object_bucket
+from himawari_run_history import record_run, RUN_HISTORY
+from himawari_segment_planner import (plan_segments, filter_manifest_by_segments,
+                                      print_segment_savings, TYPICAL_SEGMENT_BYTES)
+from himawari_archive import (archive_path, open_catalog, record_file, is_cataloged,
+                              STATUS_COMPLETE, STATUS_FAILED)
+from himawari_gap_registry import (open_gap_registry, record_object, record_manifest,
+                                    skip_dead_slots, known_missing, STATUS_PRESENT, STATUS_MISSING)
+from himawari_raw_cache import (open_raw_cache, cache_path, cache_key, add_object, is_cached, pin,
+                                remove_objects, evict, print_cache_usage, RAW_CACHE_MAX_BYTES, DEFAULT_OWNER)
+from himawari_async_download import download_async
+from himawari_verify import check_download, verify_and_quarantine, part_path, QUARANTINE_DIR
+from himawari_time_windows import (filter_slots_by_windows, describe_windows, print_download_plan,
+                                   PH_UTC_OFFSET_HOURS, NIGHTTIME_WINDOW, DAYTIME_WINDOW)
 
-def download_himawari_data_flat(start_date, end_date, output_dir='himawari_data_flat'):
+# 'threads': boto3 download_file in a thread pool (max_workers threads)
+# 'asyncio': aiohttp on one event loop (max_workers requests in flight)
+DOWNLOAD_ENGINES = ('threads', 'asyncio')
+
+def build_s3_client(max_workers=1, endpoint_url=None):
+    """
+    Creates an anonymous S3 client for the public bucket.
+    The connection pool is sized to the number of download (or listing) workers
+    so that threads sharing the client never wait on each other for a connection.
+    """
+    config = Config(
+        signature_version=botocore.UNSIGNED,
+        max_pool_connections=max(LISTING_WORKERS, max_workers),
+        # Retries are handled per object in download_with_retry
+        retries={'max_attempts': 1, 'mode': 'standard'}
+    )
+    return boto3.client('s3', endpoint_url=endpoint_url, config=config)
+
+def iter_day_slots(start_date, end_date):
+    """
+    Yields every 10-minute slot (00:00 to 23:50) of each day from start_date to end_date.
+    """
+    current_date = start_date
+    while current_date <= end_date:
+        day_start = current_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Iterate through 24 hours in 10-minute intervals
+        for slot in iter_slots(day_start, day_start + timedelta(hours=23, minutes=50)):
+            yield slot
+        current_date += timedelta(days=1)
+
+def iter_himawari_objects(slots, bands, segments):
+    """
+    Yields (object_key, file_name) for every slot, band and segment
+    (same order as the S3 layout).
+    """
+    for slot in slots:
+        # AWS S3 Path (Prefix) - Required to find the file in the bucket
+        prefix = slot_prefix(slot)
+
+        for band in bands:
+            for seg in segments:
+                # Construct the Filename (HS_H08_ or HS_H09_ depending on the date)
+                file_name = hsd_file_name(slot, band, seg)
+                # The full key to the object in S3
+                yield prefix + file_name, file_name
+
+def download_with_retry(s3, bucket_name, object_key, local_file_path, max_retries=3, backoff=1.0,
+                        expected_size=None, expected_etag=None):
     """
-    Downloads Himawari-9 Band 14 and 15 HSD data from AWS S3 into a single folder.
+    Downloads a single object, retrying transient errors with exponential backoff.
+    The object is written to <local_file_path>.<pid>.part and only renamed to its final
+    name once complete, so an interrupted run never leaves a truncated file that
+    looks downloaded. A size or ETag different from the listing is retried too.
+    With bucket_name None the bucket follows the satellite in the filename.
+    Returns a (status, bytes) tuple where status is 'downloaded', 'missing' or 'failed'.
     """
+    partial_path = part_path(local_file_path)
+    bucket_name = bucket_name or object_bucket(object_key)
+    try:
+        for attempt in range(max_retries + 1):
+            try:
+                s3.download_file(bucket_name, object_key, partial_path)
+                error = check_download(partial_path, expected_size, expected_etag)
+                if error is None:
+                    size = os.path.getsize(partial_path)
+                    os.replace(partial_path, local_file_path)
+                    return 'downloaded', size
+            except botocore.exceptions.ClientError as e:
+                if e.response['Error']['Code'] in ("404", "NoSuchKey"):
+                    # File missing on S3 (common for specific timelines)
+                    return 'missing', 0
+                if e.response['Error']['Code'] in ("403", "AccessDenied"):
+                    # Permission problems won't fix themselves; don't retry
+                    print(f"Error downloading {os.path.basename(local_file_path)}: {e}")
+                    return 'failed', 0
+                error = e
+            except (botocore.exceptions.BotoCoreError, OSError) as e:
+                error = e
+
+            if attempt < max_retries:
+                # Exponential backoff with jitter so workers don't retry in lockstep
+                time.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff))
+
+        print(f"Error downloading {os.path.basename(local_file_path)}: {error}")
+        return 'failed', 0
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+def print_download_summary(stats):
+    """
+    Prints object counts and throughput for a finished download run.
+    """
+    elapsed = max(stats['elapsed_s'], 1e-9)
+    print("-" * 30)
+    print(f"Downloaded: {stats['downloaded']}  Skipped (exists): {stats['skipped']}  "
+          f"Missing on S3: {stats['missing']}  Failed: {stats['failed']}")
+    print(f"Transferred {stats['bytes'] / 1e6:.1f} MB in {elapsed:.1f} s "
+          f"with {stats['workers']} worker(s)")
+    print(f"Throughput: {stats['requests'] / elapsed:.1f} requests/s, "
+          f"{stats['bytes'] / 1e6 / elapsed:.2f} MB/s")
+    print("-" * 30)
+
+def plan_downloads(s3, bucket_name, slots, bands, segments, all_segments, use_listing, stats,
+                   gaps=None, etags=None, listing_cache=None):
+    """
+    Works out which objects a run needs.
+    Returns a list of (object_key, file_name, size) and whether the sizes are estimates.
+    With use_listing the sizes come from the bucket listing and missing slots are
+    reported; otherwise every expected key is planned at the typical segment size.
+    gaps is an open gap registry: listings are recorded in it and, without a
+    listing, objects it knows to be missing are left out.
+    etags, if a dict, collects the listed ETags for verifying the downloads.
+    listing_cache is an open listing cache (himawari_s3_listing.open_listing_cache).
+    """
+    stations_planned = len(segments) < len(all_segments)
+    if use_listing:
+        # Discovery phase: only objects that actually exist are requested
+        manifest = build_manifest(s3, bucket_name, slots, bands, all_segments, etags=etags,
+                                  listing_cache=listing_cache)
+        if stations_planned:
+            manifest, skipped_objects, skipped_bytes = filter_manifest_by_segments(manifest, segments)
+            print_segment_savings(segments, len(manifest), sum(manifest.values()),
+                                  skipped_objects, skipped_bytes)
+            stats['bytes_saved'] = skipped_bytes
+        if gaps is not None:
+            record_manifest(gaps, manifest, slots, bands, segments)
+        coverage = summarize_coverage(manifest, slots, bands, segments)
+        print_coverage_summary(coverage)
+        stats['missing'] = coverage['expected_objects'] - coverage['found_objects']
+        return [(key, key.rsplit('/', 1)[-1], manifest[key]) for key in sorted(manifest)], False
+
+    if stations_planned:
+        # No listing, so sizes are unknown; estimate from the typical segment size
+        kept_objects = len(slots) * len(bands) * len(segments)
+        skipped_objects = len(slots) * len(bands) * (len(all_segments) - len(segments))
+        print_segment_savings(segments, kept_objects, kept_objects * TYPICAL_SEGMENT_BYTES,
+                              skipped_objects, skipped_objects * TYPICAL_SEGMENT_BYTES,
+                              estimated=True)
+        stats['bytes_saved'] = skipped_objects * TYPICAL_SEGMENT_BYTES
+    missing = known_missing(gaps, slots, bands, segments) if gaps is not None else set()
+    planned = []
+    for object_key, file_name in iter_himawari_objects(slots, bands, segments):
+        info = parse_himawari_filename(file_name)
+        if (info['ts_key'], info['band'], info['segment']) not in missing:
+            planned.append((object_key, file_name, TYPICAL_SEGMENT_BYTES))
+    if missing:
+        print(f"Gap registry: {len(missing)} object(s) known to be missing, not requested")
+    return planned, True
+
+def download_himawari_data_flat(start_date, end_date, output_dir='himawari_data_flat',
+                                max_workers=1, max_retries=3, endpoint_url=None,
+                                bucket_name=None, s3_client=None, use_listing=True,
+                                stations=None, local_windows=None,
+                                utc_offset_hours=PH_UTC_OFFSET_HOURS, window_padding_minutes=0,
+                                dry_run=False, archive_root=None, gap_registry=None,
+                                verify=False, quarantine_dir=QUARANTINE_DIR, raw_cache=None,
+                                raw_cache_max_bytes=RAW_CACHE_MAX_BYTES, cache_owner=DEFAULT_OWNER,
+                                engine='threads', bandwidth_mbps=None, listing_cache=None,
+                                run_history=None):
+    """
+    Downloads Himawari-8/9 Band 14 and 15 HSD data from AWS S3 into a single folder.
+    Each slot comes from the bucket of the satellite operational at the time
+    (himawari_sources.py); pass bucket_name to read everything from one bucket.
+    With max_workers > 1 the objects are fetched concurrently by a bounded
+    thread pool sharing one client. Files that already exist locally are skipped,
+    so an interrupted run can simply be restarted.
+    With use_listing the bucket is listed once per hour first and only objects
+    that actually exist are requested; gaps are reported as a coverage summary.
+    stations is an optional list of (lat, lon) points; when given, only the
+    segments covering them are downloaded and the bytes saved are reported.
+    local_windows is an optional list of ('HH:MM', 'HH:MM') analysis windows in
+    local time (UTC + utc_offset_hours); slots outside them are never fetched.
+    With dry_run the plan (object count and bytes) is printed and nothing is downloaded.
+    With archive_root the files go into the sharded archive layout
+    (<root>/<satellite>/<band>/YYYY/MM/DD/HHMM/) instead of output_dir, and every
+    file is recorded in the archive's SQLite catalog.
+    gap_registry is an optional path to the gap registry (himawari_gap_registry.py):
+    housekeeping slots and slots known to be empty are skipped without a request,
+    and every listing, download and 404 is recorded in it for the next run.
+    With raw_cache the files go into the cache shared by all stations
+    (himawari_raw_cache.py) instead: objects another station already fetched
+    are not downloaded again, the planned ones are pinned for cache_owner until
+    its extraction has used them, and the cache is then trimmed to raw_cache_max_bytes.
+    Downloads are written to a .part name and renamed once their size (and ETag)
+    match the listing; files already on disk with a different listed size are
+    fetched again. With verify the files already on disk are also CRC-checked on
+    all cores; corrupt ones are moved to quarantine_dir and fetched again.
+    engine 'asyncio' downloads over plain HTTPS (or endpoint_url) from one event
+    loop with max_workers requests in flight and an optional global
+    bandwidth_mbps cap (himawari_async_download.py); 'threads' uses boto3 in a
+    thread pool. Listing always goes through the S3 client; listing_cache is an
+    optional SQLite path (himawari_s3_listing.open_listing_cache) keeping the
+    listings for reuse. With run_history the run's throughput is appended to
+    that file for the run planner (himawari_run_planner.py).
+    s3_client can be any object with a boto3-style download_file (e.g. a local
+    stand-in for benchmarking); by default an anonymous boto3 client is built.
+    Returns a dict with the run statistics.
+    """
+    if engine not in DOWNLOAD_ENGINES:
+        raise ValueError(f"Unknown download engine {engine!r}; expected one of {DOWNLOAD_ENGINES}")
     # 1. Configure anonymous access to the public bucket
-    s3 = boto3.client('s3', config=Config(signature_version=botocore.UNSIGNED))
-    bucket_name = 'noaa-himawari9'
-    
+    s3 = s3_client if s3_client is not None else build_s3_client(max_workers, endpoint_url)
+
+    # 2. Define parameters
+    bands = ['B14', 'B15']
+    all_segments = range(1, 11) # Segments 01 through 10
+    # Only the segments covering the stations, if any were given
+    segments = plan_segments(stations) if stations else all_segments
+
+    stats = {'downloaded': 0, 'skipped': 0, 'missing': 0, 'failed': 0, 'refetched': 0, 'requests': 0,
+             'bytes': 0, 'bytes_saved': 0, 'planned_objects': 0, 'planned_bytes': 0,
+             'workers': max_workers, 'engine': engine, 'elapsed_s': 0.0}
+    start_time = time.perf_counter()
+
+    # Sharded archive + catalog, or the original single folder
+    if archive_root and raw_cache:
+        raise ValueError("Use either archive_root or raw_cache, not both")
+    catalog = open_catalog(archive_root) if archive_root else None
+    cache = open_raw_cache(raw_cache) if raw_cache else None
+    gaps = open_gap_registry(gap_registry) if gap_registry else None
+    listings = open_listing_cache(listing_cache) if listing_cache else None
+
+    def local_path_for(file_name):
+        if archive_root:
+            return archive_path(archive_root, file_name)
+        if raw_cache:
+            return cache_path(raw_cache, cache_key(file_name))
+        # Local file path - SAVING TO ROOT FOLDER ONLY
+        return os.path.join(output_dir, file_name)
+
+    def record(result, file_name, local_file_path):
+        status, size = result
+        stats[status] += 1
+        stats['requests'] += 1
+        stats['bytes'] += size
+        if catalog is not None and status != 'missing':
+            record_file(catalog, file_name, local_file_path, size,
+                        STATUS_COMPLETE if status == 'downloaded' else STATUS_FAILED)
+            if stats['requests'] % 500 == 0:
+                catalog.commit()
+        if cache is not None and status == 'downloaded':
+            add_object(cache, cache_key(file_name), size)
+            if stats['requests'] % 500 == 0:
+                cache.commit()
+        if gaps is not None and status in ('downloaded', 'missing'):
+            if status == 'downloaded':
+                record_object(gaps, file_name, STATUS_PRESENT, 'download', size)
+            else:
+                record_object(gaps, file_name, STATUS_MISSING, '404')
+            if stats['requests'] % 500 == 0:
+                gaps.commit()
+
+    # 3. Plan the run: slots in the analysis windows, segments covering the stations
+    all_slots = list(iter_day_slots(start_date, end_date))
+    slots = all_slots
+    if local_windows:
+        slots = filter_slots_by_windows(all_slots, local_windows, utc_offset_hours, window_padding_minutes)
+        print(f"Analysis windows: {describe_windows(local_windows, utc_offset_hours, window_padding_minutes)}")
+    if gaps is not None:
+        slots, n_dead = skip_dead_slots(gaps, slots, bands, segments)
+        if n_dead:
+            print(f"Gap registry: skipping {n_dead} slot(s) with no data")
+
+    etags = {}
+    planned, estimated = plan_downloads(s3, bucket_name, slots, bands, segments,
+                                        all_segments, use_listing, stats, gaps, etags, listings)
+    if listings is not None:
+        listings.close()
+    to_fetch = []
+    on_disk = []
+    for obj in planned:
+        local_file_path = local_path_for(obj[1])
+        if not os.path.exists(local_file_path):
+            to_fetch.append(obj)
+        elif not estimated and os.path.getsize(local_file_path) != obj[2]:
+            # Truncated by an interrupted run before downloads were atomic
+            stats['refetched'] += 1
+            to_fetch.append(obj)
+        else:
+            on_disk.append(obj)
+    if verify and on_disk and not dry_run:
+        bad = verify_and_quarantine([local_path_for(obj[1]) for obj in on_disk], quarantine_dir)
+        stats['refetched'] += len(bad)
+        for obj in on_disk:
+            if local_path_for(obj[1]) in bad:
+                to_fetch.append(obj)
+                if catalog is not None:
+                    record_file(catalog, obj[1], local_path_for(obj[1]), 0, STATUS_FAILED)
+        if cache is not None:
+            # Re-added once downloaded again
+            remove_objects(cache, [cache_key(path) for path in bad])
+        on_disk = [obj for obj in on_disk if local_path_for(obj[1]) not in bad]
+    for obj in on_disk:
+        if catalog is not None and not is_cataloged(catalog, obj[1]):
+            # Already on disk from an earlier run, make sure the catalog knows
+            local_file_path = local_path_for(obj[1])
+            record_file(catalog, obj[1], local_file_path, os.path.getsize(local_file_path))
+        if cache is not None and not is_cached(cache, cache_key(obj[1])):
+            add_object(cache, cache_key(obj[1]), os.path.getsize(local_path_for(obj[1])))
+    if stats['refetched']:
+        print(f"{stats['refetched']} file(s) on disk are incomplete or corrupt; fetching them again.")
+    stats['skipped'] = len(planned) - len(to_fetch)
+    stats['planned_objects'] = len(planned)
+    stats['planned_bytes'] = sum(obj[2] for obj in planned)
+    print_download_plan(slots, all_slots, len(planned), stats['planned_bytes'],
+                        len(to_fetch), sum(obj[2] for obj in to_fetch), estimated)
+    if dry_run:
+        print("Dry run: nothing downloaded.")
+        if catalog is not None:
+            catalog.commit()
+            catalog.close()
+        if cache is not None:
+            cache.commit()
+            cache.close()
+        if gaps is not None:
+            gaps.close()
+        return stats
+    if cache is not None:
+        # Not evicted before cache_owner's extraction has read them
+        pin(cache, [cache_key(obj[1]) for obj in planned], cache_owner)
+
     # Create the single output directory if it doesn't exist
-    if not os.path.exists(output_dir):
+    if not archive_root and not raw_cache and not os.path.exists(output_dir):
         os.makedirs(output_dir)
         print(f"Created directory: {output_dir}")
-    
-    # 2. Define parameters
-    bands = ['B14', 'B15']
-    segments = range(1, 11) # Segments 01 through 10
-    
-    # 3. Iterate through the date range
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime('%Y%m%d')
-        year = current_date.strftime('%Y')
-        month = current_date.strftime('%m')
-        day = current_date.strftime('%d')
-        
-        print(f"Processing date: {date_str}")
 
-        # Iterate through 24 hours in 10-minute intervals
-        for hour in range(24):
-            for minute in range(0, 60, 10):
-                time_str = f"{hour:02d}{minute:02d}"
-                
-                # AWS S3 Path (Prefix) - Required to find the file in the bucket
-                prefix = f"AHI-L1b-FLDK/{year}/{month}/{day}/{time_str}/"
-                
-                for band in bands:
-                    for seg in segments:
-                        # Construct the Filename
-                        file_name = (
-                            f"HS_H09_{date_str}_{time_str}_{band}_FLDK_R20_S{seg:02d}10.DAT.bz2"
-                        )
-                        
-                        # The full key to the object in S3
-                        object_key = prefix + file_name
-                        
-                        # Local file path - SAVING TO ROOT FOLDER ONLY
-                        local_file_path = os.path.join(output_dir, file_name)
-                        
-                        # Check if file exists locally before downloading
-                        if os.path.exists(local_file_path):
-                            # Optional: Print less frequently to reduce console noise
-                            continue
-
-                        try:
-                            s3.download_file(bucket_name, object_key, local_file_path)
-                            # Print success (optional: comment out to speed up console)
-                            print(f"Downloaded: {file_name}")
-                        except botocore.exceptions.ClientError as e:
-                            if e.response['Error']['Code'] == "404":
-                                # File missing on S3 (common for specific timelines)
-                                pass 
-                            else:
-                                print(f"Error downloading {file_name}: {e}")
+    def iter_fetch():
+        """
+        Yields (object_key, file_name, local path, expected size) of the objects to
+        download, creating their folders and printing each new day.
+        """
+        current_day = None
+        for object_key, file_name, listed_size in to_fetch:
+            date_str = file_name.split('_')[2]
+            if date_str != current_day:
+                current_day = date_str
+                print(f"Processing date: {date_str}")
 
-        current_date += timedelta(days=1)
+            local_file_path = local_path_for(file_name)
+            if archive_root or raw_cache:
+                os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+            # Sizes are only known (and checked) when they come from a listing
+            yield object_key, file_name, local_file_path, None if estimated else listed_size
+
+    # 4. Download
+    if engine == 'asyncio':
+        # One event loop keeps max_workers requests in flight over HTTPS
+        def on_result(object_key, status, size):
+            file_name = object_key.rsplit('/', 1)[-1]
+            record((status, size), file_name, local_path_for(file_name))
+
+        download_async(((object_key, local_file_path, expected_size, etags.get(object_key))
+                        for object_key, _, local_file_path, expected_size in iter_fetch()),
+                       bucket_name, endpoint_url, on_result=on_result, max_in_flight=max_workers,
+                       bandwidth_mbps=bandwidth_mbps, max_retries=max_retries)
+    else:
+        # Keep at most a few tasks per worker in flight so memory stays flat
+        # even for multi-month ranges.
+        max_in_flight = max_workers * 4
+        in_flight = set()
+        # future -> (file_name, local path), so results are recorded on this thread
+        pending = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for object_key, file_name, local_file_path, expected_size in iter_fetch():
+                if max_workers == 1:
+                    status, size = download_with_retry(s3, bucket_name, object_key, local_file_path,
+                                                       max_retries, expected_size=expected_size,
+                                                       expected_etag=etags.get(object_key))
+                    record((status, size), file_name, local_file_path)
+                    if status == 'downloaded':
+                        # Print success (optional: comment out to speed up console)
+                        print(f"Downloaded: {file_name}")
+                    continue
+
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result(), *pending.pop(future))
+
+                future = pool.submit(download_with_retry, s3, bucket_name,
+                                     object_key, local_file_path, max_retries,
+                                     expected_size=expected_size, expected_etag=etags.get(object_key))
+                pending[future] = (file_name, local_file_path)
+                in_flight.add(future)
+
+            for future in in_flight:
+                record(future.result(), *pending.pop(future))
+
+    if catalog is not None:
+        catalog.commit()
+        catalog.close()
+    if gaps is not None:
+        gaps.commit()
+        gaps.close()
+    if cache is not None:
+        cache.commit()
+        evicted, freed = evict(cache, raw_cache, raw_cache_max_bytes)
+        if evicted:
+            print(f"Raw cache: evicted {evicted} least recently used files ({freed / 1e9:.2f} GB)")
+        print_cache_usage(cache, raw_cache_max_bytes)
+        cache.close()
+
+    stats['elapsed_s'] = time.perf_counter() - start_time
+    print_download_summary(stats)
+    if run_history and stats['requests']:
+        record_run(run_history, 'download', engine=engine, workers=max_workers,
+                   requests=stats['requests'], downloaded=stats['downloaded'],
+                   bytes=stats['bytes'], elapsed_s=stats['elapsed_s'])
+    return stats
 
 if __name__ == "__main__":
     # Define period: March 1, 2025 to May 31, 2025
     start_dt = datetime(2025, 4, 16, 00, 00)
     end_dt = datetime(2025, 4, 30, 23, 50)
-    
-    # WARNING: Saving ~260,000 files into a single folder may slow down 
+
+    # WARNING: Saving ~260,000 files into a single folder may slow down
     # file explorer windows on some operating systems.
-    
-    download_himawari_data_flat(start_dt, end_dt)
\ No newline at end of file
+    # Pass archive_root to use the sharded archive + catalog instead
+    # (himawari_archive_migrate.py converts an existing flat folder).
+    archive_root = None
+
+    # Or share one raw cache between the four station trees, so each file is
+    # downloaded once (e.g. himawari_raw_cache.RAW_CACHE_DIR); the extractor's
+    # RAW_CACHE must point at the same folder.
+    raw_cache = None
+
+    # S3-compatible endpoint to download from instead of AWS (e.g. a local moto or
+    # MinIO server); himawari_storage.py also has a directory-backed fake bucket.
+    endpoint_url = None
+
+    # Registry of known missing slots, shared with the extractor; learned from
+    # every listing and 404 so dead slots are never requested again.
+    gap_registry = 'himawari_gaps.sqlite'
+
+    # CRC-check the files already on disk (on all cores) before trusting them;
+    # corrupt ones are quarantined and fetched again.
+    verify = True
+
+    # Corners of the Bataan study area (all AWS stations fall inside).
+    # Only the full-disk segments covering these points are downloaded;
+    # pass stations=None to fetch all 10 segments.
+    study_area = [(14.5, 120.3), (14.5, 120.6), (14.9, 120.3), (14.9, 120.6)]
+
+    # Only the PH-time windows kept by the cleaning scripts (nighttime and daytime).
+    # The combined Himawari/AWS files use a 30-min delay, so pad the windows by 30 min.
+    analysis_windows = [NIGHTTIME_WINDOW, DAYTIME_WINDOW]
+
+    # 'asyncio' keeps hundreds of requests in flight on one event loop (set
+    # max_workers to e.g. 256 and optionally cap bandwidth_mbps); 'threads' uses boto3.
+    engine = 'threads'
+
+    # Listings are kept here for reuse (and shared with himawari_run_planner.py),
+    # and every run's throughput is logged for the planner's time estimates.
+    listing_cache = 'himawari_listing_cache.sqlite'
+    run_history = RUN_HISTORY
+
+    # Set dry_run=True to see the object count and size before downloading anything.
+    # 16 workers saturates a typical home/office link; use 1 for the old serial behaviour.
+    download_himawari_data_flat(start_dt, end_dt, max_workers=16, stations=study_area,
+                                local_windows=analysis_windows, window_padding_minutes=30,
+                                dry_run=False, archive_root=archive_root,
+                                endpoint_url=endpoint_url, gap_registry=gap_registry,
+                                verify=verify, raw_cache=raw_cache, engine=engine,
+                                listing_cache=listing_cache, run_history=run_history)
@@ -0,0 +1,199 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from himawari_s3_listing import parse_himawari_filename, iter_slots, print_coverage_summary, format_slot_ranges
+
+# ================= CONFIGURATION =================
+# Registry shared by the downloaders and the extractor
+GAP_REGISTRY = 'himawari_gaps.sqlite'
+# Period, bands and segments for the coverage report when run directly (UTC)
+REPORT_START = datetime(2025, 4, 16, 0, 0)
+REPORT_END = datetime(2025, 4, 30, 23, 50)
+REPORT_BANDS = ['B14', 'B15']
+REPORT_SEGMENTS = [4]
+# =================================================
+
+# Full-disk slots (UTC hhmm) JMA skips every day for satellite housekeeping
+HOUSEKEEPING_SLOTS = ('0240', '1440')
+# Uploads to the bucket lag the observation, so an object only counts as a gap
+# once its slot is at least this old
+MIN_GAP_AGE_HOURS = 24
+
+# Object states recorded in the registry
+STATUS_PRESENT = 'present'
+STATUS_MISSING = 'missing'
+
+def open_gap_registry(path=GAP_REGISTRY):
+    """
+    Opens (and creates if needed) the SQLite registry of which objects exist
+    in the bucket and which are known to be missing.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS objects (
+            ts_key     TEXT NOT NULL,      -- YYYYMMDD_hhmm (UTC)
+            band       TEXT NOT NULL,
+            segment    INTEGER NOT NULL,
+            status     TEXT NOT NULL,      -- present / missing
+            size       INTEGER,
+            source     TEXT NOT NULL,      -- listing / download / 404
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (ts_key, band, segment)
+        )""")
+    return conn
+
+def is_housekeeping_slot(slot):
+    return slot.strftime('%H%M') in HOUSEKEEPING_SLOTS
+
+def _old_enough(ts_key, now=None):
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    return datetime.strptime(ts_key, '%Y%m%d_%H%M') <= now - timedelta(hours=MIN_GAP_AGE_HOURS)
+
+def record_object(conn, file_name, status, source, size=None, now=None):
+    """
+    Records one object (key or filename) as present or missing. Missing objects
+    of recent slots are ignored, they may simply not be uploaded yet.
+    The caller commits.
+    """
+    info = parse_himawari_filename(file_name)
+    if info is None:
+        return
+    if status == STATUS_MISSING and not _old_enough(info['ts_key'], now):
+        return
+    conn.execute("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?)",
+                 (info['ts_key'], info['band'], info['segment'], status, size, source,
+                  datetime.now(timezone.utc).isoformat(timespec='seconds')))
+
+def record_manifest(conn, manifest, slots, bands, segments, now=None):
+    """
+    Learns from a bucket listing: every listed object is present and every
+    expected object of the slots that isn't listed is missing. Commits.
+    """
+    found = {}
+    for key, size in manifest.items():
+        info = parse_himawari_filename(key)
+        if info is not None:
+            found[(info['ts_key'], info['band'], info['segment'])] = size
+    stamp = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    rows = []
+    for slot in slots:
+        ts_key = slot.strftime('%Y%m%d_%H%M')
+        old_enough = _old_enough(ts_key, now)
+        for band in bands:
+            for segment in segments:
+                size = found.get((ts_key, band, segment))
+                if size is not None:
+                    rows.append((ts_key, band, segment, STATUS_PRESENT, size, 'listing', stamp))
+                elif old_enough:
+                    rows.append((ts_key, band, segment, STATUS_MISSING, None, 'listing', stamp))
+    conn.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+def _slot_states(conn, ts_keys, bands, segments):
+    """
+    {ts_key: {(band, segment): (status, size)}} for the requested objects.
+    """
+    states = {}
+    if not ts_keys:
+        return states
+    rows = conn.execute(
+        "SELECT ts_key, band, segment, status, size FROM objects WHERE ts_key BETWEEN ? AND ?",
+        (min(ts_keys), max(ts_keys)))
+    wanted = set(ts_keys)
+    wanted_objects = {(band, segment) for band in bands for segment in segments}
+    for ts_key, band, segment, status, size in rows:
+        if ts_key in wanted and (band, segment) in wanted_objects:
+            states.setdefault(ts_key, {})[(band, segment)] = (status, size)
+    return states
+
+def dead_slots(conn, slots, bands, segments):
+    """
+    ts_keys of the slots with nothing to fetch: housekeeping slots and slots
+    whose every requested object is known to be missing.
+    """
+    ts_keys = [slot.strftime('%Y%m%d_%H%M') for slot in slots]
+    states = _slot_states(conn, ts_keys, bands, segments)
+    expected = len(bands) * len(segments)
+    dead = set()
+    for slot, ts_key in zip(slots, ts_keys):
+        slot_states = states.get(ts_key, {})
+        if is_housekeeping_slot(slot) or (
+                len(slot_states) == expected
+                and all(status == STATUS_MISSING for status, _ in slot_states.values())):
+            dead.add(ts_key)
+    return dead
+
+def skip_dead_slots(conn, slots, bands, segments):
+    """
+    The slots minus the dead ones. Returns (kept slots, number skipped).
+    """
+    dead = dead_slots(conn, slots, bands, segments)
+    kept = [slot for slot in slots if slot.strftime('%Y%m%d_%H%M') not in dead]
+    return kept, len(slots) - len(kept)
+
+def known_missing(conn, slots, bands, segments):
+    """
+    Set of (ts_key, band, segment) objects known to be missing, so requests
+    planned without a listing can leave them out.
+    """
+    ts_keys = [slot.strftime('%Y%m%d_%H%M') for slot in slots]
+    missing = set()
+    for ts_key, slot_states in _slot_states(conn, ts_keys, bands, segments).items():
+        for (band, segment), (status, _) in slot_states.items():
+            if status == STATUS_MISSING:
+                missing.add((ts_key, band, segment))
+    return missing
+
+def registry_coverage(conn, start_time, end_time, bands, segments):
+    """
+    Coverage of a period from the registry alone (no bucket requests), in the
+    format of summarize_coverage plus 'unknown_slots': slots with objects the
+    registry has never seen listed or requested.
+    """
+    slots = list(iter_slots(start_time, end_time))
+    ts_keys = [slot.strftime('%Y%m%d_%H%M') for slot in slots]
+    states = _slot_states(conn, ts_keys, bands, segments)
+    expected = len(bands) * len(segments)
+    coverage = {'slots': len(slots), 'expected_objects': len(slots) * expected,
+                'found_objects': 0, 'found_bytes': 0, 'empty_slots': [], 'partial_slots': [],
+                'unknown_slots': []}
+    for slot, ts_key in zip(slots, ts_keys):
+        slot_states = states.get(ts_key, {})
+        present = [size or 0 for status, size in slot_states.values() if status == STATUS_PRESENT]
+        coverage['found_objects'] += len(present)
+        coverage['found_bytes'] += sum(present)
+        if is_housekeeping_slot(slot) and not present:
+            coverage['empty_slots'].append(ts_key)
+        elif len(slot_states) < expected:
+            coverage['unknown_slots'].append(ts_key)
+        elif not present:
+            coverage['empty_slots'].append(ts_key)
+        elif len(present) < expected:
+            coverage['partial_slots'].append((ts_key, expected - len(present)))
+    return coverage
+
+def print_registry_coverage(coverage, max_listed=20):
+    """
+    print_coverage_summary of the slots the registry has checked, plus the ones
+    it knows nothing about.
+    """
+    unknown = coverage['unknown_slots']
+    checked = {k: v for k, v in coverage.items() if k != 'unknown_slots'}
+    objects_per_slot = coverage['expected_objects'] // max(coverage['slots'], 1)
+    checked['slots'] -= len(unknown)
+    checked['expected_objects'] -= len(unknown) * objects_per_slot
+    print_coverage_summary(checked, max_listed)
+    if unknown:
+        ranges = format_slot_ranges(unknown)
+        more = len(ranges) - max_listed
+        print(f"Not yet checked ({len(unknown)} slots, UTC): {', '.join(ranges[:max_listed])}"
+              + (f" ... (+{more} more)" if more > 0 else ""))
+        print("-" * 30)
+
+if __name__ == "__main__":
+    registry = open_gap_registry(GAP_REGISTRY)
+    print(f"Coverage from {GAP_REGISTRY}, {REPORT_START} to {REPORT_END} (UTC)")
+    print_registry_coverage(registry_coverage(registry, REPORT_START, REPORT_END,
+                                              REPORT_BANDS, REPORT_SEGMENTS))
+    registry.close()
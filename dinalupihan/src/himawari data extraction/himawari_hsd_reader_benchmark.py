@@ -0,0 +1,78 @@
+import os
+import shutil
+import time
+import numpy as np
+from himawari_segment_planner import plan_segments
+from himawari_stations import station_points
+from himawari_bt_extraction_bz2 import (find_timestamp_groups, decompress_group, get_stations,
+                                        extract_station_values, extract_station_values_native,
+                                        BANDS, TEMP_DIR)
+
+# ================= CONFIGURATION =================
+# Number of timestamp groups (from DATA_DIR / ARCHIVE_ROOT) to compare
+SAMPLE_GROUPS = 12
+# Largest allowed difference between the two readers (Kelvin)
+TOLERANCE_K = 1e-3
+# =================================================
+
+def run_reader_benchmark():
+    """
+    Reads the same decompressed groups with satpy and with the native HSD reader,
+    checks that every station value agrees within TOLERANCE_K and prints the
+    per-timestamp time of each reader.
+    """
+    stations = get_stations()
+    grouped_files = find_timestamp_groups(plan_segments(station_points(stations)))
+    sample = sorted(grouped_files)[:SAMPLE_GROUPS]
+    if not sample:
+        return
+
+    satpy_times = []
+    native_times = []
+    max_diff = {band: 0.0 for band in BANDS}
+    mismatched_rows = 0
+    temp_dir = os.path.join(TEMP_DIR, "reader_benchmark")
+    for ts_key in sample:
+        try:
+            # Decompression is the same for both readers, so it isn't timed
+            hsd_files = decompress_group(grouped_files[ts_key], temp_dir)
+
+            start = time.perf_counter()
+            satpy_rows = extract_station_values(hsd_files, stations)
+            satpy_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            native_rows = extract_station_values_native(hsd_files, stations)
+            native_times.append(time.perf_counter() - start)
+        finally:
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+
+        satpy_by_station = {row['station']: row for row in satpy_rows}
+        for row in native_rows:
+            other = satpy_by_station.get(row['station'])
+            if other is None:
+                mismatched_rows += 1
+                continue
+            for band in BANDS:
+                a, b = row[band], other[band]
+                if np.isnan(a) and np.isnan(b):
+                    continue
+                max_diff[band] = max(max_diff[band], abs(a - b))
+        print(f"{ts_key}: satpy {satpy_times[-1] * 1000:.1f} ms, native {native_times[-1] * 1000:.2f} ms")
+
+    satpy_mean = sum(satpy_times) / len(satpy_times)
+    native_mean = sum(native_times) / len(native_times)
+    print("-" * 40)
+    for band in BANDS:
+        print(f"{band}: max |native - satpy| = {max_diff[band]:.2e} K")
+    print(f"Rows without a satpy match: {mismatched_rows}")
+    print(f"Per timestamp: satpy {satpy_mean * 1000:.1f} ms, native {native_mean * 1000:.2f} ms "
+          f"({satpy_mean / max(native_mean, 1e-9):.0f}x faster)")
+    ok = mismatched_rows == 0 and all(diff <= TOLERANCE_K for diff in max_diff.values())
+    print(f"Result: {'MATCH' if ok else 'MISMATCH'} (tolerance {TOLERANCE_K} K)")
+    print("-" * 40)
+    return ok
+
+if __name__ == "__main__":
+    run_reader_benchmark()
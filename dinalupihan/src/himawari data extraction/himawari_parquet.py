@@ -0,0 +1,109 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# ================= CONFIGURATION =================
+# Dataset written by the extractor (OUTPUT_PARQUET) to time in __main__
+DATASET_DIR = 'himawari_ph_temperature_parquet'
+# =================================================
+
+# Partition folders: <root>/station=<name>/month=YYYY-MM/part-0.parquet (month of timestamp_utc)
+PARTITIONING = ds.partitioning(pa.schema([('station', pa.string()), ('month', pa.string())]),
+                               flavor='hive')
+
+def typed_table(df):
+    """
+    Extraction rows as an Arrow table: timestamps as timestamp[s], band values
+    and window statistics as float32, window counts as int16 (null where a
+    merged row from another run has no window statistics).
+    """
+    df = df.copy()
+    for col in ('timestamp_ph', 'timestamp_utc'):
+        df[col] = pd.to_datetime(df[col]).astype('datetime64[s]')
+    for col in df.columns:
+        if col.startswith('B') and col[1:3].isdigit():
+            df[col] = df[col].astype('Int16' if col.endswith('_count') else np.float32)
+    df['station'] = df['station'].astype(str)
+    df['month'] = df['timestamp_utc'].dt.strftime('%Y-%m')
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def existing_partition_rows(root, df):
+    """
+    Rows already in root for the station/month partitions that df touches,
+    or None if there are none.
+    """
+    if not os.path.isdir(root):
+        return None
+    months = pd.to_datetime(df['timestamp_utc']).dt.strftime('%Y-%m')
+    condition = None
+    for station, month in set(zip(df['station'].astype(str), months)):
+        match = (ds.field('station') == station) & (ds.field('month') == month)
+        condition = match if condition is None else condition | match
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    old = dataset.to_table(filter=condition).to_pandas()
+    return old.drop(columns=['month']) if len(old) else None
+
+def write_parquet_dataset(df, root):
+    """
+    Writes extraction rows partitioned by station and month. The partitions df
+    touches are rewritten with their existing rows plus df's, df winning on
+    the same (station, timestamp_utc), so re-running a period doesn't duplicate
+    it and adding another period to a month keeps what was already there.
+    Other stations and months already in root are left alone.
+    """
+    old = existing_partition_rows(root, df)
+    if old is not None:
+        merged = pd.concat([old, df], ignore_index=True)
+        merged['station'] = merged['station'].astype(str)
+        merged['timestamp_utc'] = pd.to_datetime(merged['timestamp_utc'])
+        merged = merged.drop_duplicates(['station', 'timestamp_utc'], keep='last')
+        # Keep df's column order; columns only older runs had go last
+        df = merged[list(df.columns) + [c for c in merged.columns if c not in df.columns]]
+    table = typed_table(df.sort_values(['station', 'timestamp_utc']))
+    ds.write_dataset(table, root, format='parquet', partitioning=PARTITIONING,
+                     existing_data_behavior='delete_matching',
+                     basename_template='part-{i}.parquet')
+    return root
+
+def read_parquet_dataset(root, stations=None, start_time=None, end_time=None, columns=None):
+    """
+    Loads rows for some stations between two UTC datetimes (inclusive, None =
+    open-ended). Only the matching station/month folders are opened and the
+    time filter is pushed down to the Parquet row groups.
+    Returns a DataFrame sorted by (timestamp_utc, station).
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    condition = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if stations is not None:
+        condition = both(condition, ds.field('station').isin([str(s) for s in stations]))
+    if start_time is not None:
+        condition = both(condition, ds.field('month') >= start_time.strftime('%Y-%m'))
+        condition = both(condition, ds.field('timestamp_utc') >= pa.scalar(start_time, pa.timestamp('s')))
+    if end_time is not None:
+        condition = both(condition, ds.field('month') <= end_time.strftime('%Y-%m'))
+        condition = both(condition, ds.field('timestamp_utc') <= pa.scalar(end_time, pa.timestamp('s')))
+
+    df = dataset.to_table(columns=columns, filter=condition).to_pandas()
+    sort_cols = [c for c in ('timestamp_utc', 'station') if c in df.columns]
+    return df.sort_values(sort_cols).reset_index(drop=True) if sort_cols else df
+
+if __name__ == "__main__":
+    # Time loading one station-month of the dataset
+    dataset = ds.dataset(DATASET_DIR, format='parquet', partitioning=PARTITIONING)
+    first = dataset.to_table(columns=['station', 'month']).slice(0, 1).to_pylist()
+    if first:
+        station, month = first[0]['station'], first[0]['month']
+        start = time.perf_counter()
+        df = read_parquet_dataset(DATASET_DIR, stations=[station],
+                                  start_time=pd.Timestamp(f"{month}-01").to_pydatetime(),
+                                  end_time=(pd.Timestamp(f"{month}-01") + pd.offsets.MonthEnd(1)
+                                            + pd.Timedelta(hours=23, minutes=59)).to_pydatetime())
+        print(f"Loaded {len(df)} rows of {station} {month} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        print(df.dtypes)
@@ -0,0 +1,102 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# AWS stations of the study (name, lat, lon), opt-in through the extractor's STATIONS.
+# Every station is read from the same loaded scene, so adding one costs
+# almost nothing per timestamp.
+# UNCONFIRMED: the coordinates are the TARGET_LAT/LON of the dinalupihan and
+# orani trees, but the original comment in every tree labels both "Orani";
+# check the names and coordinates against the station metadata before use.
+BATAAN_STATIONS = [
+    ('dinalupihan', 14.86591, 120.45983),
+    ('orani', 14.77083, 120.45537),
+    # ('balanga', lat, lon),  - add once the station coordinates are confirmed
+    # ('bagac', lat, lon),
+]
+
+# Statistics reported for each band when a window around the station is read
+WINDOW_STATS = ('mean', 'median', 'std', 'min', 'max', 'count')
+
+def load_stations(csv_path):
+    """
+    Reads a station registry from a CSV with 'name', 'lat' and 'lon' columns
+    (for networks too large to list in the configuration block).
+    """
+    df = pd.read_csv(csv_path)
+    return list(zip(df['name'].astype(str), df['lat'].astype(float), df['lon'].astype(float)))
+
+def station_points(stations):
+    """
+    (lat, lon) points of a registry, e.g. for plan_segments.
+    """
+    return [(lat, lon) for _, lat, lon in stations]
+
+def station_pixel_indices(area, stations):
+    """
+    Nearest (row, col) of every station inside an AreaDefinition, in one vectorized call.
+    Returns (rows, cols, inside) where inside is a boolean mask of the stations
+    that fall on the area; rows/cols are only meaningful where inside is True.
+    """
+    lats = np.array([lat for _, lat, _ in stations], dtype=float)
+    lons = np.array([lon for _, _, lon in stations], dtype=float)
+    # Array input returns masked arrays (masked = outside the area) instead of raising
+    cols, rows = area.get_array_indices_from_lonlat(lons, lats)
+    # A single station comes back as a 0-d masked scalar
+    cols, rows = np.ma.atleast_1d(cols), np.ma.atleast_1d(rows)
+    inside = ~(np.ma.getmaskarray(cols) | np.ma.getmaskarray(rows))
+    rows = np.ma.filled(rows, 0).astype(int)
+    cols = np.ma.filled(cols, 0).astype(int)
+    inside &= (rows >= 0) & (rows < area.shape[0]) & (cols >= 0) & (cols < area.shape[1])
+    return rows, cols, inside
+
+def sample_pixels(data, rows, cols):
+    """
+    Values of a 2-D (numpy or dask) array at the given pixel indices,
+    gathered with a single fancy-index operation.
+    """
+    if hasattr(data, 'vindex'):
+        # dask: only the chunks holding the stations are computed
+        return np.asarray(data.vindex[rows, cols].compute())
+    return np.asarray(data)[rows, cols]
+
+def window_offsets(size):
+    """
+    (row, col) offsets of a size x size window, row-major with the centre
+    pixel in the middle (index size * size // 2).
+    """
+    half = size // 2
+    d_rows, d_cols = np.mgrid[-half:half + 1, -half:half + 1]
+    return d_rows.ravel(), d_cols.ravel()
+
+def sample_windows(data, rows, cols, size, shape):
+    """
+    Values of the size x size window around each pixel of a 2-D array of the
+    given shape, in one gather: (stations, size * size), NaN past the edges.
+    """
+    d_rows, d_cols = window_offsets(size)
+    win_rows = np.asarray(rows)[:, None] + d_rows
+    win_cols = np.asarray(cols)[:, None] + d_cols
+    inside = (win_rows >= 0) & (win_rows < shape[0]) & (win_cols >= 0) & (win_cols < shape[1])
+    values = sample_pixels(data, np.where(inside, win_rows, 0).ravel(),
+                           np.where(inside, win_cols, 0).ravel()).astype(float)
+    values = values.reshape(win_rows.shape)
+    values[~inside] = np.nan
+    return values
+
+def window_stats(windows):
+    """
+    WINDOW_STATS of each station's window (one row per station), ignoring NaN
+    (invalid or off-image pixels). count is the number of valid pixels.
+    """
+    with warnings.catch_warnings():
+        # Windows without a single valid pixel give NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return {
+            'mean': np.nanmean(windows, axis=1),
+            'median': np.nanmedian(windows, axis=1),
+            'std': np.nanstd(windows, axis=1),
+            'min': np.nanmin(windows, axis=1),
+            'max': np.nanmax(windows, axis=1),
+            'count': np.sum(~np.isnan(windows), axis=1),
+        }
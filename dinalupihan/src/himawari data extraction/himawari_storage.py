@@ -0,0 +1,210 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+from xml.sax.saxutils import escape
+import botocore
+from aiohttp import web
+from himawari_bz2_download import build_s3_client
+
+# Storage backends the downloaders can target:
+# 's3':        boto3 client for the real bucket, or any S3-compatible endpoint
+#              (moto server, MinIO, start_directory_server) when endpoint_url is given
+# 'directory': LocalDirectoryS3, a fake bucket in a local folder with
+#              simulated latency, bandwidth and error injection
+STORAGE_BACKENDS = ('s3', 'directory')
+
+# Chunk size the HTTP stand-in streams object bodies in
+SERVER_CHUNK_SIZE = 64 * 1024
+
+class LocalDirectoryS3:
+    """
+    Minimal stand-in for a boto3 S3 client: objects are files under root_dir/bucket/key.
+    Each request sleeps for `latency` seconds to mimic the network round trip and
+    downloads are paced to bandwidth_mbps (per request, like one TCP stream).
+    Missing keys raise the same 404 ClientError as S3; missing_rate and error_rate
+    inject extra 404s and 503 SlowDown errors into that fraction of downloads.
+    """
+
+    def __init__(self, root_dir, latency=0.0, bandwidth_mbps=None, missing_rate=0.0,
+                 error_rate=0.0, seed=None):
+        self.root_dir = root_dir
+        self.latency = latency
+        self.bandwidth_mbps = bandwidth_mbps
+        self.missing_rate = missing_rate
+        self.error_rate = error_rate
+        self.injected = {'404': 0, '503': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            return self._random.random()
+
+    def put_object(self, Bucket, Key, Body):
+        path = os.path.join(self.root_dir, Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(Body)
+
+    def download_file(self, Bucket, Key, Filename):
+        time.sleep(self.latency)
+        path = os.path.join(self.root_dir, Bucket, Key)
+        draw = self._draw()
+        code = None
+        if not os.path.exists(path):
+            code = '404'
+        elif draw < self.missing_rate:
+            code = '404'
+            self.injected['404'] += 1
+        elif draw < self.missing_rate + self.error_rate:
+            code = '503'
+            self.injected['503'] += 1
+        if code == '404':
+            raise botocore.exceptions.ClientError(
+                {'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        if code == '503':
+            raise botocore.exceptions.ClientError(
+                {'Error': {'Code': 'SlowDown', 'Message': 'Please reduce your request rate.'}},
+                'GetObject')
+        if self.bandwidth_mbps:
+            time.sleep(os.path.getsize(path) * 8 / (self.bandwidth_mbps * 1e6))
+        shutil.copyfile(path, Filename)
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None, MaxKeys=1000):
+        time.sleep(self.latency)
+        bucket_dir = os.path.join(self.root_dir, Bucket)
+        keys = []
+        for dirpath, _, filenames in os.walk(bucket_dir):
+            for name in filenames:
+                key = os.path.relpath(os.path.join(dirpath, name), bucket_dir).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    keys.append(key)
+        keys.sort()
+        # The continuation token is simply the last key of the previous page
+        if ContinuationToken:
+            keys = [key for key in keys if key > ContinuationToken]
+        page = keys[:MaxKeys]
+        response = {
+            'Contents': [{'Key': key, 'Size': os.path.getsize(os.path.join(bucket_dir, key))}
+                         for key in page],
+            'IsTruncated': len(keys) > MaxKeys,
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+def _s3_error(status, code, message):
+    body = (f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code>'
+            f'<Message>{message}</Message></Error>')
+    return web.Response(status=status, text=body, content_type='application/xml')
+
+def _list_objects_xml(bucket, prefix, keys, sizes, truncated, next_token):
+    contents = ''.join(f"<Contents><Key>{escape(key)}</Key><Size>{sizes[key]}</Size></Contents>"
+                       for key in keys)
+    token = f"<NextContinuationToken>{escape(next_token)}</NextContinuationToken>" if truncated else ''
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(keys)}</KeyCount>"
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{token}{contents}"
+            '</ListBucketResult>')
+
+def serve_directory_bucket(root_dir, host='127.0.0.1', port=5056, latency=0.0, bandwidth_mbps=None,
+                           missing_rate=0.0, error_rate=0.0, seed=None):
+    """
+    Serves the LocalDirectoryS3 layout (root_dir/bucket/key) over HTTP as a
+    path-style S3 endpoint: GET/HEAD of objects and ListObjectsV2, enough for
+    unsigned boto3 clients and plain HTTP downloaders. Latency, per-response
+    bandwidth and injected 404 / 503 SlowDown behave like LocalDirectoryS3.
+    Blocks until the process is stopped.
+    """
+    draw = random.Random(seed).random
+
+    async def get_object(request):
+        await asyncio.sleep(latency)
+        path = os.path.join(root_dir, request.match_info['bucket'], request.match_info['key'])
+        roll = draw()
+        if not os.path.isfile(path) or roll < missing_rate:
+            return _s3_error(404, 'NoSuchKey', 'The specified key does not exist.')
+        if roll < missing_rate + error_rate:
+            return _s3_error(503, 'SlowDown', 'Please reduce your request rate.')
+        size = os.path.getsize(path)
+        response = web.StreamResponse(headers={'Content-Length': str(size),
+                                               'Content-Type': 'application/octet-stream'})
+        await response.prepare(request)
+        if request.method == 'HEAD':
+            return response
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(SERVER_CHUNK_SIZE), b''):
+                if bandwidth_mbps:
+                    await asyncio.sleep(len(chunk) * 8 / (bandwidth_mbps * 1e6))
+                await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    async def list_objects(request):
+        await asyncio.sleep(latency)
+        bucket = request.match_info['bucket']
+        prefix = request.query.get('prefix', '')
+        token = request.query.get('continuation-token')
+        max_keys = int(request.query.get('max-keys', 1000))
+        bucket_dir = os.path.join(root_dir, bucket)
+        sizes = {}
+        for dirpath, _, filenames in os.walk(bucket_dir):
+            for name in filenames:
+                full = os.path.join(dirpath, name)
+                key = os.path.relpath(full, bucket_dir).replace(os.sep, '/')
+                if key.startswith(prefix) and (token is None or key > token):
+                    sizes[key] = os.path.getsize(full)
+        keys = sorted(sizes)
+        page = keys[:max_keys]
+        truncated = len(keys) > max_keys
+        return web.Response(text=_list_objects_xml(bucket, prefix, page, sizes, truncated,
+                                                   page[-1] if truncated else None),
+                            content_type='application/xml')
+
+    app = web.Application()
+    app.router.add_get('/{bucket}', list_objects)
+    app.router.add_get('/{bucket}/', list_objects)
+    app.router.add_get('/{bucket}/{key:.+}', get_object)
+    web.run_app(app, host=host, port=port, print=None, handle_signals=False)
+
+def start_directory_server(root_dir, host='127.0.0.1', port=5056, **faults):
+    """
+    Runs serve_directory_bucket in a separate process (so it doesn't compete
+    with the downloader for the GIL) and waits until it answers.
+    Returns (process, endpoint_url); terminate() the process when done.
+    """
+    server = multiprocessing.Process(target=serve_directory_bucket, args=(root_dir, host, port),
+                                     kwargs=faults, daemon=True)
+    server.start()
+    endpoint_url = f"http://{host}:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(endpoint_url + '/_', timeout=1)
+            return server, endpoint_url
+        except urllib.error.HTTPError:
+            # Any HTTP answer means the server is up
+            return server, endpoint_url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"Local bucket server did not start on {endpoint_url}")
+
+def build_storage_client(backend='s3', max_workers=1, endpoint_url=None, root_dir=None, **faults):
+    """
+    S3-style client for one of STORAGE_BACKENDS. faults (latency, bandwidth_mbps,
+    missing_rate, error_rate, seed) only apply to the 'directory' backend.
+    """
+    if backend == 's3':
+        return build_s3_client(max_workers, endpoint_url)
+    if backend == 'directory':
+        if root_dir is None:
+            raise ValueError("The 'directory' backend needs root_dir")
+        return LocalDirectoryS3(root_dir, **faults)
+    raise ValueError(f"Unknown storage backend {backend!r}; expected one of {STORAGE_BACKENDS}")
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+# Philippine Standard Time is UTC+8 (no daylight saving)
+PH_UTC_OFFSET_HOURS = 8
+
+# Analysis windows used by the cleaning scripts (local PH time, inclusive)
+NIGHTTIME_WINDOW = ('00:00', '04:00')
+DAYTIME_WINDOW = ('10:00', '16:00')
+
+def parse_window(window):
+    """
+    Converts a ('HH:MM', 'HH:MM') window into minutes after midnight.
+    """
+    start, end = (datetime.strptime(t, '%H:%M') for t in window)
+    return start.hour * 60 + start.minute, end.hour * 60 + end.minute
+
+def in_windows(local_time, windows, padding_minutes=0):
+    """
+    True if a local time falls inside any of the windows (ends inclusive).
+    Windows that cross midnight, e.g. ('22:00', '02:00'), are supported.
+    padding_minutes widens every window on both sides.
+    """
+    minute = local_time.hour * 60 + local_time.minute
+    for window in windows:
+        start, end = parse_window(window)
+        start = (start - padding_minutes) % 1440
+        end = (end + padding_minutes) % 1440
+        if start <= end:
+            if start <= minute <= end:
+                return True
+        elif minute >= start or minute <= end:
+            return True
+    return False
+
+def filter_slots_by_windows(slots_utc, windows, utc_offset_hours=PH_UTC_OFFSET_HOURS, padding_minutes=0):
+    """
+    Keeps the UTC observation slots whose local time falls inside the analysis windows.
+    """
+    offset = timedelta(hours=utc_offset_hours)
+    return [slot for slot in slots_utc if in_windows(slot + offset, windows, padding_minutes)]
+
+def describe_windows(windows, utc_offset_hours=PH_UTC_OFFSET_HOURS, padding_minutes=0):
+    """
+    Human-readable list of windows with their UTC equivalents, e.g.
+    "10:00-16:00 local (02:00-08:00 UTC)".
+    """
+    descriptions = []
+    for window in windows:
+        start, end = parse_window(window)
+        start -= padding_minutes
+        end += padding_minutes
+        utc = [(m - utc_offset_hours * 60) % 1440 for m in (start, end)]
+        local = [m % 1440 for m in (start, end)]
+        descriptions.append(f"{local[0] // 60:02d}:{local[0] % 60:02d}-{local[1] // 60:02d}:{local[1] % 60:02d} local "
+                            f"({utc[0] // 60:02d}:{utc[0] % 60:02d}-{utc[1] // 60:02d}:{utc[1] % 60:02d} UTC)")
+    return ', '.join(descriptions)
+
+def print_download_plan(slots, all_slots, objects, total_bytes, to_fetch, fetch_bytes, estimated=False):
+    """
+    Prints what a run is going to fetch before anything is downloaded.
+    """
+    kept_share = 100.0 * len(slots) / len(all_slots) if all_slots else 0.0
+    size_label = "estimated" if estimated else "listed"
+    print("-" * 30)
+    print(f"Planned slots: {len(slots)} of {len(all_slots)} ({kept_share:.0f}%)")
+    print(f"Planned objects: {objects} ({total_bytes / 1e9:.2f} GB {size_label})")
+    print(f"Still to fetch (not on disk yet): {to_fetch} ({fetch_bytes / 1e9:.2f} GB)")
+    print("-" * 30)
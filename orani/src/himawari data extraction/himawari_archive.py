@@ -0,0 +1,150 @@
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+from himawari_s3_listing import parse_himawari_filename
+
+# Catalog database kept at the root of the archive
+CATALOG_NAME = 'catalog.sqlite'
+
+# File states recorded in the catalog
+STATUS_COMPLETE = 'complete'
+STATUS_FAILED = 'failed'
+
+def archive_path(archive_root, file_name):
+    """
+    Sharded location of a file inside the archive:
+    <root>/<satellite>/<band>/YYYY/MM/DD/HHMM/<file_name>
+    Returns None if the filename doesn't follow the HSD convention.
+    """
+    info = parse_himawari_filename(file_name)
+    if info is None:
+        return None
+    ts = info['timestamp']
+    return os.path.join(archive_root, info['satellite'], info['band'],
+                        ts.strftime('%Y'), ts.strftime('%m'), ts.strftime('%d'),
+                        ts.strftime('%H%M'), os.path.basename(file_name))
+
+def open_catalog(archive_root):
+    """
+    Opens (and creates if needed) the SQLite catalog of an archive.
+    """
+    os.makedirs(archive_root, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(archive_root, CATALOG_NAME))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+            file_name      TEXT PRIMARY KEY,
+            path           TEXT NOT NULL,
+            satellite      TEXT NOT NULL,
+            ts_key         TEXT NOT NULL,   -- YYYYMMDD_hhmm (UTC), sorts chronologically
+            band           TEXT NOT NULL,
+            segment        INTEGER NOT NULL,
+            total_segments INTEGER NOT NULL,
+            resolution     TEXT NOT NULL,
+            size           INTEGER,
+            status         TEXT NOT NULL,
+            updated_at     TEXT NOT NULL
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS files_ts_band ON files (ts_key, band, segment)")
+    return conn
+
+def record_file(conn, file_name, path, size, status=STATUS_COMPLETE):
+    """
+    Inserts or updates one file in the catalog. The caller commits.
+    """
+    info = parse_himawari_filename(file_name)
+    if info is None:
+        return
+    conn.execute(
+        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (os.path.basename(file_name), path, info['satellite'], info['ts_key'], info['band'],
+         info['segment'], info['total_segments'], info['resolution'], size, status,
+         datetime.now(timezone.utc).isoformat(timespec='seconds')))
+
+def is_cataloged(conn, file_name):
+    """
+    True if the file is already recorded as complete.
+    """
+    row = conn.execute("SELECT 1 FROM files WHERE file_name = ? AND status = ?",
+                       (os.path.basename(file_name), STATUS_COMPLETE)).fetchone()
+    return row is not None
+
+def query_complete_groups(conn, start_time=None, end_time=None, bands=('B14', 'B15'), segments=None):
+    """
+    Returns {ts_key: [paths]} for every timestamp between start_time and end_time
+    (inclusive, UTC datetimes or None for open-ended) where all requested bands and
+    segments are present and complete. segments=None means whatever segments the
+    timestamp has, as long as every band has the same ones.
+    """
+    conditions = ["status = ?"]
+    params = [STATUS_COMPLETE]
+    if start_time is not None:
+        conditions.append("ts_key >= ?")
+        params.append(start_time.strftime('%Y%m%d_%H%M'))
+    if end_time is not None:
+        conditions.append("ts_key <= ?")
+        params.append(end_time.strftime('%Y%m%d_%H%M'))
+    conditions.append(f"band IN ({','.join('?' * len(bands))})")
+    params.extend(bands)
+    if segments is not None:
+        conditions.append(f"segment IN ({','.join('?' * len(segments))})")
+        params.extend(segments)
+
+    rows = conn.execute(
+        f"SELECT ts_key, band, segment, path FROM files WHERE {' AND '.join(conditions)} "
+        "ORDER BY ts_key, band, segment", params)
+
+    groups = {}
+    for ts_key, band, segment, path in rows:
+        groups.setdefault(ts_key, []).append((band, segment, path))
+
+    complete = {}
+    for ts_key, entries in groups.items():
+        per_band = {}
+        for band, segment, _ in entries:
+            per_band.setdefault(band, set()).add(segment)
+        if len(per_band) != len(bands):
+            continue
+        band_segments = list(per_band.values())
+        if segments is not None and band_segments[0] != set(segments):
+            continue
+        if any(s != band_segments[0] for s in band_segments):
+            continue
+        complete[ts_key] = [path for _, _, path in entries]
+    return complete
+
+def migrate_flat_folder(flat_dir, archive_root, move=True, batch_size=1000):
+    """
+    One-time migration of a flat download folder into the sharded archive.
+    Files are moved (or copied with move=False) and recorded in the catalog.
+    Files that don't follow the HSD naming convention are left where they are.
+    Returns (migrated, skipped) counts.
+    """
+    conn = open_catalog(archive_root)
+    migrated = 0
+    skipped = 0
+    try:
+        with os.scandir(flat_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.endswith('.DAT.bz2'):
+                    continue
+                target = archive_path(archive_root, entry.name)
+                if target is None:
+                    skipped += 1
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if move:
+                    os.replace(entry.path, target)
+                else:
+                    shutil.copy2(entry.path, target)
+                record_file(conn, entry.name, target, os.path.getsize(target))
+                migrated += 1
+                if migrated % batch_size == 0:
+                    conn.commit()
+                    print(f"Migrated {migrated} files...")
+        conn.commit()
+    finally:
+        conn.close()
+    return migrated, skipped
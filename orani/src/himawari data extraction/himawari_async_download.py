@@ -0,0 +1,219 @@
+import asyncio
+import bz2
+import os
+import random
+import time
+import aiohttp
+from himawari_verify import check_download, part_path
+from himawari_sources import object_bucket
+
+# ================= CONFIGURATION =================
+# Requests kept in flight by the event loop (one connection each). The objects
+# are small (2-5 MB), so throughput is bound by round trips, not bandwidth,
+# until a few hundred requests are in flight.
+MAX_IN_FLIGHT = 256
+# Global download cap in Mbit/s shared by all requests (None = unlimited)
+BANDWIDTH_MBPS = None
+# Bytes read from the socket at a time and handed to the file or decompressor
+CHUNK_SIZE = 256 * 1024
+# =================================================
+
+def object_url(bucket_name, key, endpoint_url=None):
+    """
+    HTTPS URL of an object in the public bucket (virtual-hosted style), or
+    path-style under endpoint_url for S3-compatible servers and local stand-ins.
+    With bucket_name None the bucket follows the satellite in the filename.
+    """
+    bucket_name = bucket_name or object_bucket(key)
+    if endpoint_url:
+        return f"{endpoint_url.rstrip('/')}/{bucket_name}/{key}"
+    return f"https://{bucket_name}.s3.amazonaws.com/{key}"
+
+class BandwidthLimiter:
+    """
+    Token bucket shared by every request on the event loop. consume(n) takes
+    n bytes of budget and sleeps off any deficit, so the combined rate of all
+    requests stays at mbps however many are in flight.
+    """
+    def __init__(self, mbps, burst_s=0.25):
+        self.rate = mbps * 1e6 / 8 if mbps else None
+        self.burst = self.rate * burst_s if self.rate else 0
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    async def consume(self, nbytes):
+        if self.rate is None:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= nbytes
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+class DiskSink:
+    """
+    Streams a body into <path>.<pid>.part and renames it once the size (and ETag)
+    match the listing, like download_with_retry.
+    """
+    def __init__(self, path, expected_size=None, expected_etag=None):
+        self.path = path
+        self.part_path = part_path(path)
+        self.expected_size = expected_size
+        self.expected_etag = expected_etag
+        self.file = None
+
+    def start(self):
+        self.file = open(self.part_path, 'wb')
+
+    async def write(self, chunk):
+        # Page-cache writes of one chunk are short next to a network round trip
+        self.file.write(chunk)
+
+    def finish(self):
+        self.file.close()
+        error = check_download(self.part_path, self.expected_size, self.expected_etag)
+        if error is None:
+            os.replace(self.part_path, self.path)
+        return error
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+class MemorySink:
+    """
+    Streams a .bz2 body through a decompressor as it arrives and hands the
+    decompressed bytes to on_data(key, data); nothing touches the disk.
+    Decompression runs on the loop's thread pool (bz2 releases the GIL), so
+    the event loop keeps serving the other requests meanwhile.
+    """
+    def __init__(self, key, on_data):
+        self.key = key
+        self.on_data = on_data
+        self.parts = []
+        self.decompressor = None
+
+    def start(self):
+        self.parts = []
+        self.decompressor = bz2.BZ2Decompressor()
+
+    def _decompress(self, chunk):
+        out = []
+        while chunk:
+            if self.decompressor.eof:
+                # Concatenated streams
+                self.decompressor = bz2.BZ2Decompressor()
+            out.append(self.decompressor.decompress(chunk))
+            chunk = self.decompressor.unused_data
+        return b''.join(out)
+
+    async def write(self, chunk):
+        loop = asyncio.get_running_loop()
+        self.parts.append(await loop.run_in_executor(None, self._decompress, chunk))
+
+    def finish(self):
+        if not self.decompressor.eof:
+            return "truncated bz2 stream"
+        self.on_data(self.key, b''.join(self.parts))
+        self.parts = []
+        return None
+
+    def discard(self):
+        self.parts = []
+
+async def fetch_object(session, url, sink, limiter, max_retries=3, backoff=1.0):
+    """
+    GETs one object into sink, retrying 5xx/throttling and broken transfers
+    with exponential backoff. Returns (status, bytes) like download_with_retry:
+    status is 'downloaded', 'missing' or 'failed'.
+    """
+    name = url.rsplit('/', 1)[-1]
+    for attempt in range(max_retries + 1):
+        try:
+            async with session.get(url) as response:
+                if response.status == 404:
+                    # File missing on S3 (common for specific timelines)
+                    return 'missing', 0
+                if response.status == 403:
+                    # Permission problems won't fix themselves; don't retry
+                    print(f"Error downloading {name}: HTTP 403")
+                    return 'failed', 0
+                if response.status != 200:
+                    error = f"HTTP {response.status}"
+                else:
+                    sink.start()
+                    size = 0
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        await limiter.consume(len(chunk))
+                        await sink.write(chunk)
+                        size += len(chunk)
+                    error = sink.finish()
+                    if error is None:
+                        return 'downloaded', size
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, EOFError) as e:
+            error = e
+        sink.discard()
+
+        if attempt < max_retries:
+            # Exponential backoff with jitter so requests don't retry in lockstep
+            await asyncio.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff))
+
+    print(f"Error downloading {name}: {error}")
+    return 'failed', 0
+
+async def download_objects(objects, bucket_name, endpoint_url=None, on_data=None, on_result=None,
+                           max_in_flight=MAX_IN_FLIGHT, bandwidth_mbps=BANDWIDTH_MBPS,
+                           max_retries=3):
+    """
+    Downloads objects, an iterable of (object_key, local_path, expected_size,
+    expected_etag), with up to max_in_flight requests on one event loop.
+    Bodies are streamed to local_path, or to on_data(key, decompressed bytes)
+    when local_path is None. on_result(key, status, bytes) is called on this
+    thread as each object finishes. Objects are scheduled as slots free up,
+    so memory stays flat for any number of them.
+    Returns a dict with the run statistics.
+    """
+    stats = {'downloaded': 0, 'missing': 0, 'failed': 0, 'requests': 0, 'bytes': 0,
+             'workers': max_in_flight, 'elapsed_s': 0.0}
+    start_time = time.perf_counter()
+    limiter = BandwidthLimiter(bandwidth_mbps)
+    slots = asyncio.Semaphore(max_in_flight)
+    connector = aiohttp.TCPConnector(limit=max_in_flight, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+
+    async def run_one(session, key, local_path, expected_size, expected_etag):
+        try:
+            sink = (DiskSink(local_path, expected_size, expected_etag) if local_path is not None
+                    else MemorySink(key, on_data))
+            status, size = await fetch_object(session, object_url(bucket_name, key, endpoint_url),
+                                              sink, limiter, max_retries)
+            stats[status] += 1
+            stats['requests'] += 1
+            stats['bytes'] += size
+            if on_result is not None:
+                on_result(key, status, size)
+        finally:
+            slots.release()
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = set()
+        for key, local_path, expected_size, expected_etag in objects:
+            await slots.acquire()
+            task = asyncio.create_task(run_one(session, key, local_path, expected_size, expected_etag))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    stats['elapsed_s'] = time.perf_counter() - start_time
+    return stats
+
+def download_async(objects, bucket_name, endpoint_url=None, on_data=None, on_result=None,
+                   max_in_flight=MAX_IN_FLIGHT, bandwidth_mbps=BANDWIDTH_MBPS, max_retries=3):
+    """
+    Runs download_objects on a new event loop and returns its statistics.
+    """
+    return asyncio.run(download_objects(objects, bucket_name, endpoint_url, on_data, on_result,
+                                        max_in_flight, bandwidth_mbps, max_retries))
@@ -2,10 +2,35 @@ import os
 import bz2
 import glob
 import shutil
+import sys
+import time
+import resource
+import dask
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from satpy import Scene
+from himawari_segment_planner import AHI_2KM, plan_segments, locate_points, lines_per_segment
+from himawari_archive import open_catalog, query_complete_groups, record_file, STATUS_FAILED
+from himawari_stations import (WINDOW_STATS, station_points, sample_pixels,
+                               sample_windows, window_stats)
+from himawari_geolocation_cache import cached_pixel_indices, print_geolocation_cache_stats
+from himawari_geolocation_cache import stations_key
+from himawari_hsd_reader import read_station_temperatures, hsd_band, hsd_segment
+from himawari_build_lut import open_lut, lookup_lut
+from himawari_parquet import write_parquet_dataset
+from himawari_profiling import (start_group, finish_group, stage, print_profile_summary,
+                                export_profile)
+from himawari_checkpoint import (open_checkpoint, completed_groups, failed_groups, load_results,
+                                 group_status, settings_fingerprint, CheckpointBatch,
+                                 STATUS_DONE, STATUS_EMPTY)
+from himawari_bz2_index import IndexedBz2Reader, index_path
+from himawari_gap_registry import open_gap_registry, known_missing
+from himawari_verify import verify_and_quarantine
+from himawari_run_history import record_run
+from himawari_raw_cache import (open_raw_cache, cached_groups, cache_key, pin, unpin, touch,
+                                remove_objects, DEFAULT_OWNER)
 
 # ================= CONFIGURATION =================
 # 1. PATHS
@@ -15,16 +40,88 @@ DATA_DIR = '/Users/danwilliammartinez/Desktop/Himawari_AWS_Study/himawari_data_f
 TEMP_DIR = os.path.join(DATA_DIR, "temp_processing")
 # Output CSV filename
 OUTPUT_CSV = 'himawari_ph_temperature.csv'
+# Also write a Parquet dataset partitioned by station and month (typed columns,
+# fast time-range loads with himawari_parquet.read_parquet_dataset). New rows are
+# merged into the partitions already there, so runs over other periods add up. None = CSV only.
+OUTPUT_PARQUET = None
+# Sharded archive with a catalog (see himawari_archive.py). When set, the file
+# groups come from the catalog instead of scanning DATA_DIR.
+ARCHIVE_ROOT = None
+# Raw cache shared by all stations (see himawari_raw_cache.py, e.g. its
+# RAW_CACHE_DIR). When set, the file groups come from the cache index; they are
+# pinned against eviction until this station has extracted them. Each run also
+# releases this station's pins on groups in its range it no longer needs.
+RAW_CACHE = None
+RAW_CACHE_OWNER = DEFAULT_OWNER
+# Optional UTC time range to extract from the archive or cache (None = everything)
+START_TIME_UTC = None
+END_TIME_UTC = None
+# SQLite checkpoint (e.g. 'himawari_extraction.sqlite'). When set, rows are saved
+# every CHECKPOINT_BATCH groups, groups already in it are skipped on the next run
+# and OUTPUT_CSV is written from everything saved so far. Groups saved with other
+# stations, bands, WINDOW_SIZE or reader are extracted again. None = one-off run.
+CHECKPOINT_DB = None
+CHECKPOINT_BATCH = 50
+# Process groups that failed in an earlier run again
+RETRY_FAILED_GROUPS = True
+# Per-stage timings of every group (wall/CPU time, bytes read, peak RSS) are
+# always recorded and summarised; set a .csv or .json path to also save them.
+PROFILE_OUTPUT = None
+# Gap registry written by the downloaders (e.g. 'himawari_gaps.sqlite'). Groups
+# lacking a band/segment on disk that the registry knows is missing upstream are
+# skipped; groups with every file on disk are always extracted.
+GAP_REGISTRY = None
+# Every run's throughput (groups, bz2 bytes, decompress and total stage times)
+# is appended here for the run planner (himawari_run_planner.py); None = off
+RUN_HISTORY = 'himawari_run_history.jsonl'
+# CRC-check every .bz2 of the groups to process (on all cores) before extracting.
+# Corrupt or truncated files are moved to QUARANTINE_DIR and their groups skipped
+# (marked failed in the archive catalog), so the next download run fetches them again.
+VERIFY_BZ2 = False
+QUARANTINE_DIR = os.path.join(DATA_DIR, "quarantine")
 
 # 2. LOCATION (Orani, Bataan)
 TARGET_LAT = 14.77083
 TARGET_LON = 120.45537
+# Name written in the station column for the target location (this tree's folder)
+STATION_NAME = DEFAULT_OWNER
+# Optional station registry (name, lat, lon), e.g. himawari_stations.BATAAN_STATIONS
+# once its coordinates and names are confirmed. Every station is read from each
+# loaded scene in one pass, so the segments are decompressed once for all of them.
+# None = extract only the target location above.
+STATIONS = None
 
 # 3. SETTINGS
 # Bands to extract (IR Bands 14 & 15)
 BANDS = ['B14', 'B15']
 # Set to True for Celsius, False for Kelvin
-SAVE_IN_CELSIUS = False 
+SAVE_IN_CELSIUS = False
+# Pixels per side of the window read around each station (1 = centre pixel only).
+# With 3 or 5 each band also gets <band>_mean/_median/_std/_min/_max/_count
+# columns over the window; a high _std usually means cloud at the station.
+WINDOW_SIZE = 1
+# Only decompress/load the segment(s) covering the stations.
+# Set to False to load every segment found in DATA_DIR.
+ONLY_PLANNED_SEGMENTS = True
+# Worker processes for extraction (1 = serial). Each worker decompresses into
+# its own folder under TEMP_DIR.
+MAX_WORKERS = 1
+# Read the station pixels straight from the HSD files (himawari_hsd_reader.py)
+# instead of building a satpy Scene. Matches satpy within 1e-3 K; check it on
+# your own files with himawari_hsd_reader_benchmark.py before switching.
+USE_NATIVE_READER = False
+# Decompress in memory instead of writing .DAT files to TEMP_DIR. Each .bz2 is
+# opened as a seekable stream and only decompressed up to the stations' pixels,
+# one file at a time. Needs USE_NATIVE_READER (satpy reads from disk).
+DECOMPRESS_IN_MEMORY = False
+# With DECOMPRESS_IN_MEMORY, keep a block index beside each .bz2 (<file>.idx.json)
+# so only the bz2 blocks holding the header and the stations' lines are decoded.
+# The first read of a file builds the index; later runs reuse it.
+USE_BZ2_INDEX = True
+# Lookup table from himawari_build_lut.py used by the native reader to pick the
+# segment files holding the stations before any file is opened. None = work the
+# segments out with the (exact) vectorized projection instead.
+SEGMENT_LUT = None
 # =================================================
 
 def decompress_group(bz2_files, output_dir):
@@ -50,20 +147,283 @@ def decompress_group(bz2_files, output_dir):
         decompressed_paths.append(out_path)
     return decompressed_paths
 
-def process_himawari_data():
+def open_group_in_memory(bz2_files, use_index=None, stations=None):
+    """
+    Opens every .bz2 of a group as a decompressing in-memory stream, or as a
+    block-indexed reader with use_index (defaults to USE_BZ2_INDEX). Files of
+    segments without a station are skipped without being opened.
+    Returns (file_name, buffer) pairs for extract_station_values_native;
+    the caller closes the buffers.
+    """
+    use_index = USE_BZ2_INDEX if use_index is None else use_index
+    bz2_files = select_station_files(bz2_files, get_stations() if stations is None else stations)
+    opener = open_indexed if use_index else (lambda f: bz2.BZ2File(f, 'rb'))
+    return [(os.path.basename(f).replace('.bz2', ''), opener(f)) for f in bz2_files]
+
+def open_indexed(bz2_file):
+    """
+    Block-indexed reader of a .bz2, or a plain decompressing stream when the
+    file can't be indexed (e.g. blocks that don't validate).
+    """
+    try:
+        return IndexedBz2Reader(bz2_file)
+    except (OSError, EOFError, ValueError) as e:
+        print(f"No block index for {os.path.basename(bz2_file)} ({e}); decompressing it as a stream.")
+        return bz2.BZ2File(bz2_file, 'rb')
+
+def read_group_in_memory(bz2_files, stations=None, use_index=None):
+    """
+    Station rows of one group read straight from the .bz2 files in memory.
+    If a block fails to decode through the index, the group's indexes are
+    deleted and it is read again as plain streams.
+    """
+    use_index = USE_BZ2_INDEX if use_index is None else use_index
+    # Opening builds the bz2 block index the first time a file is seen
+    with stage('open'):
+        buffers = open_group_in_memory(bz2_files, use_index, stations)
+    try:
+        return extract_station_values_native(buffers, stations)
+    except (OSError, EOFError, ValueError):
+        if not use_index:
+            raise
+    finally:
+        for _, buffer in buffers:
+            buffer.close()
+    for bz2_file in bz2_files:
+        if os.path.exists(index_path(bz2_file)):
+            os.remove(index_path(bz2_file))
+    print("Block index didn't match its file; reading the group as plain streams.", end=" ")
+    return read_group_in_memory(bz2_files, stations, use_index=False)
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process so far, in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+def get_stations():
+    """
+    The configured station registry, or this tree's own target location.
+    """
+    return STATIONS if STATIONS else [(STATION_NAME, TARGET_LAT, TARGET_LON)]
+
+# Segments of each station registry, worked out once per process
+_STATION_SEGMENTS = {}
+
+def station_segments(stations, window=1):
+    """
+    Set of segment numbers holding the stations (and the window x window block
+    around them), from SEGMENT_LUT when set or the vectorized projection
+    otherwise (no pyresample, no file reads). A LUT cell can be a line off,
+    so one more line is allowed for on each side.
+    """
+    key = (SEGMENT_LUT, window, stations_key(stations))
+    if key not in _STATION_SEGMENTS:
+        lats = [lat for _, lat, _ in stations]
+        lons = [lon for _, _, lon in stations]
+        margin = window // 2
+        if SEGMENT_LUT:
+            lut, settings = open_lut(SEGMENT_LUT)
+            grid = settings['grid']
+            located = lookup_lut(lut, settings, lats, lons)
+            rows = (located['segment'] - 1) * lines_per_segment(grid) + located['line']
+            margin += 1
+        else:
+            grid = AHI_2KM
+            located = locate_points(lats, lons, grid)
+            rows = located['row']
+        rows = rows[located['visible']]
+        seg_lines = lines_per_segment(grid)
+        segments = set()
+        for offset in (-margin, 0, margin):
+            shifted = np.clip(rows + offset, 0, grid['lines'] - 1)
+            segments.update(int(s) for s in shifted // seg_lines + 1)
+        _STATION_SEGMENTS[key] = segments
+    return _STATION_SEGMENTS[key]
+
+def select_station_files(files, stations, window=None):
+    """
+    The files (paths, names or (name, buffer) pairs) of segments holding a station.
+    """
+    segments = station_segments(stations, WINDOW_SIZE if window is None else window)
+    return [f for f in files if hsd_segment(f[0] if isinstance(f, tuple) else f) in segments]
+
+def checkpoint_settings(stations):
+    """
+    Fingerprint of the settings that shape a group's rows, saved with each
+    checkpointed group.
+    """
+    return settings_fingerprint(stations=[list(station) for station in stations], bands=BANDS,
+                                window=WINDOW_SIZE, celsius=SAVE_IN_CELSIUS,
+                                native=USE_NATIVE_READER)
+
+def output_columns(bands=None, window=None):
+    """
+    CSV columns in order: time and station columns, then each band (and its
+    window statistics when window > 1).
+    """
+    bands = BANDS if bands is None else bands
+    window = WINDOW_SIZE if window is None else window
+    cols = ['timestamp_ph', 'timestamp_utc', 'station', 'latitude', 'longitude']
+    for band in bands:
+        cols.append(band)
+        if window > 1:
+            cols.extend(f'{band}_{stat}' for stat in WINDOW_STATS)
+    return cols
+
+def station_rows(stations, band_values):
+    """
+    Output rows from per-band values aligned with stations: the centre pixel
+    of each band, plus the window statistics when the values are windows.
+    """
+    band_stats = {band: window_stats(values) for band, values in band_values.items()
+                  if values.ndim == 2}
+    results = []
+    for i, (name, lat, lon) in enumerate(stations):
+        row_data = {'station': name, 'latitude': lat, 'longitude': lon}
+        for band, values in band_values.items():
+            if band in band_stats:
+                row_data[band] = values[i, values.shape[1] // 2].item()
+                for stat in WINDOW_STATS:
+                    row_data[f'{band}_{stat}'] = band_stats[band][stat][i].item()
+            else:
+                row_data[band] = values[i].item()
+        results.append(row_data)
+    return results
+
+def extract_station_values(hsd_files, stations=None, bands=None, in_celsius=None, window=None):
+    """
+    Loads decompressed HSD files with satpy once and reads the nearest pixel of
+    every station (or the window around it) with one vectorized index per band.
+    Returns a list of {station, latitude, longitude, band: value} rows; stations
+    outside the loaded segment(s) are left out. Defaults come from the configuration block.
+    """
+    stations = get_stations() if stations is None else stations
+    bands = BANDS if bands is None else bands
+    in_celsius = SAVE_IN_CELSIUS if in_celsius is None else in_celsius
+    window = WINDOW_SIZE if window is None else window
+
+    # 'ahi_hsd' reader handles binary format & calibration automatically
+    with stage('scene'):
+        scn = Scene(filenames=hsd_files, reader='ahi_hsd')
+    with stage('load'):
+        scn.load(bands)
+
+    # Get the AreaDefinition (geometry) from the first band
+    area = scn[bands[0]].attrs['area']
+    # Nearest (row, col) of all stations at once (projected once per area, then
+    # cached); inside protects against segments that don't cover a station
+    with stage('geolocate'):
+        rows, cols, inside = cached_pixel_indices(area, stations)
+    if not inside.any():
+        return []
+    rows, cols = rows[inside], cols[inside]
+
+    # Extract values (Kelvin) for every station in one gather per band
+    band_values = {}
+    for band in bands:
+        # The dask graph is computed here (only the chunks holding the stations)
+        with stage('compute'):
+            if window > 1:
+                values = sample_windows(scn[band].data, rows, cols, window, area.shape)
+            else:
+                values = sample_pixels(scn[band].data, rows, cols).astype(float)
+        # Optional: Convert to Celsius
+        if in_celsius:
+            values = values - 273.15
+        band_values[band] = values
+
+    return station_rows([s for s, keep in zip(stations, inside) if keep], band_values)
+
+def extract_station_values_native(hsd_files, stations=None, bands=None, in_celsius=None, window=None):
+    """
+    Same rows as extract_station_values, read with the native HSD reader:
+    only the header blocks and the stations' count values are read from each file.
+    hsd_files can be paths or (file_name, binary buffer) pairs.
+    """
+    stations = get_stations() if stations is None else stations
+    bands = BANDS if bands is None else bands
+    in_celsius = SAVE_IN_CELSIUS if in_celsius is None else in_celsius
+    window = WINDOW_SIZE if window is None else window
+
+    # Only files of segments holding a station are opened
+    hsd_files = select_station_files(hsd_files, stations, window)
+
+    band_values = {}
+    covered = np.ones(len(stations), dtype=bool)
+    for band in bands:
+        sources = [f[1] if isinstance(f, tuple) else f for f in hsd_files
+                   if hsd_band(f[0] if isinstance(f, tuple) else f) == band]
+        with stage('read') as totals:
+            values, band_covered = read_station_temperatures(sources, stations, window)
+            # Compressed bytes fetched by block-indexed readers
+            totals['bytes'] += sum(getattr(s, 'bytes_read', 0) for s in sources)
+        # Optional: Convert to Celsius
+        if in_celsius:
+            values = values - 273.15
+        band_values[band] = values
+        covered &= band_covered
+
+    kept = [s for s, keep in zip(stations, covered) if keep]
+    return station_rows(kept, {band: values[covered] for band, values in band_values.items()})
+
+def read_group_stations(hsd_files, stations=None):
+    """
+    Station rows of one decompressed group with the configured reader.
+    """
+    if USE_NATIVE_READER:
+        return extract_station_values_native(hsd_files, stations)
+    return extract_station_values(hsd_files, stations)
+
+def find_timestamp_groups(planned_segments):
+    """
+    Returns {ts_key: [bz2 paths]} of the files to process.
+    With ARCHIVE_ROOT the catalog is queried for complete B14+B15 groups, with
+    RAW_CACHE the shared cache's index; otherwise DATA_DIR is scanned and every
+    filename parsed.
+    """
+    if ARCHIVE_ROOT:
+        conn = open_catalog(ARCHIVE_ROOT)
+        try:
+            grouped_files = query_complete_groups(conn, START_TIME_UTC, END_TIME_UTC,
+                                                  BANDS, planned_segments)
+        finally:
+            conn.close()
+        print(f"Catalog returned {len(grouped_files)} complete observation times.")
+        return grouped_files
+    if RAW_CACHE:
+        conn = open_raw_cache(RAW_CACHE)
+        try:
+            grouped_files = cached_groups(conn, RAW_CACHE, START_TIME_UTC, END_TIME_UTC,
+                                          BANDS, planned_segments or range(1, 11))
+        finally:
+            conn.close()
+        print(f"Raw cache has {len(grouped_files)} complete observation times.")
+        return grouped_files
+
     # 1. Find all compressed files
     all_files = sorted(glob.glob(os.path.join(DATA_DIR, "*.DAT.bz2")))
     if not all_files:
         print(f"No .DAT.bz2 files found in {DATA_DIR}")
-        return
+        return {}
+
+    skipped_files = 0
+    skipped_bytes = 0
 
     # 2. Group files by Timestamp (YYYYMMDD_hhmm)
     # This ensures we process all segments for one specific time together.
     grouped_files = {}
     for f in all_files:
         # Extract date/time from standard filename:
-        # HS_H09_YYYYMMDD_hhmm_Bxx_...
+        # HS_Hxx_YYYYMMDD_hhmm_Bxx_FLDK_R20_Szz10.DAT.bz2 (H08 or H09)
         parts = os.path.basename(f).split('_')
+        if planned_segments and len(parts) > 7 and int(parts[7][1:3]) not in planned_segments:
+            # Segment doesn't cover the target: never decompressed or loaded
+            skipped_files += 1
+            skipped_bytes += os.path.getsize(f)
+            continue
         if len(parts) > 3:
             # parts[2] = YYYYMMDD, parts[3] = hhmm
             ts_key = f"{parts[2]}_{parts[3]}"
@@ -71,104 +431,287 @@ def process_himawari_data():
                 grouped_files[ts_key] = []
             grouped_files[ts_key].append(f)
 
-    results = []
-    print(f"Found {len(grouped_files)} unique observation times.")
+    if planned_segments:
+        print(f"Using segment(s) {planned_segments}; skipped {skipped_files} other segment files "
+              f"({skipped_bytes / 1e9:.2f} GB not decompressed).")
+    return grouped_files
 
-    # 3. Process each timestamp group
-    for ts_key, file_list in grouped_files.items():
-        try:
-            # --- A. TIMEZONE CONVERSION ---
-            # Parse UTC time from filename string
-            utc_time = datetime.strptime(ts_key, "%Y%m%d_%H%M")
-            # Add 8 hours for Philippine Standard Time (PST)
-            ph_time = utc_time + timedelta(hours=8)
-            
-            print(f"Processing: {ph_time.strftime('%Y-%m-%d %H:%M:%S')} (PST)...", end=" ")
+def extract_group(ts_key, file_list, temp_dir=None):
+    """
+    Decompresses one timestamp group into temp_dir (default TEMP_DIR), extracts
+    every station's pixel and empties temp_dir again. Returns (ts_key, rows, status message).
+    """
+    # Read at call time, so a TEMP_DIR changed after import is honoured
+    temp_dir = temp_dir or TEMP_DIR
+    try:
+        # --- A. TIMEZONE CONVERSION ---
+        # Parse UTC time from filename string
+        utc_time = datetime.strptime(ts_key, "%Y%m%d_%H%M")
+        # Add 8 hours for Philippine Standard Time (PST)
+        ph_time = utc_time + timedelta(hours=8)
 
+        if DECOMPRESS_IN_MEMORY and USE_NATIVE_READER:
+            # --- B-E. DECOMPRESS IN MEMORY AND EXTRACT (nothing written to disk) ---
+            station_rows = read_group_in_memory(file_list)
+        else:
             # --- B. DECOMPRESSION ---
             # Unzip files to temp folder
-            current_files = decompress_group(file_list, TEMP_DIR)
-
-            # --- C. LOAD DATA ---
-            # Load the scene with Satpy
-            # 'ahi_hsd' reader handles binary format & calibration automatically
-            scn = Scene(filenames=current_files, reader='ahi_hsd')
-            scn.load(BANDS)
-
-            # --- D. GEOLOCATION (UPDATED) ---
-            # Get the AreaDefinition (geometry) from the first band
-            area = scn[BANDS[0]].attrs['area']
-            
-            # Use the new method to avoid DeprecationWarning
-            # This returns the nearest integer indices (row, col)
-            row_idx, col_idx = area.get_array_indices_from_lonlat(TARGET_LON, TARGET_LAT)
-            
-            # Ensure indices are standard Python integers
-            row_idx = int(row_idx)
-            col_idx = int(col_idx)
-
-            # Prepare row data
+            with stage('decompress') as totals:
+                current_files = decompress_group(file_list, temp_dir)
+                totals['bytes'] += sum(os.path.getsize(f) for f in file_list)
+
+            # --- C/D/E. LOAD DATA, GEOLOCATE, EXTRACT VALUES ---
+            station_rows = read_group_stations(current_files)
+        if not station_rows:
+            # No station is inside the loaded segment(s)
+            return ts_key, [], "Out of bounds (Location not in loaded segments)."
+
+        # Prepare row data (long format: one row per station)
+        rows = []
+        for values in station_rows:
             row_data = {
                 'timestamp_ph': ph_time,
-                'timestamp_utc': utc_time,
-                'latitude': TARGET_LAT,
-                'longitude': TARGET_LON
+                'timestamp_utc': utc_time
             }
+            row_data.update(values)
+            rows.append(row_data)
+        return ts_key, rows, f"Done ({len(rows)} station(s), peak RSS {peak_rss_mb():.0f} MB)."
 
-            # --- E. EXTRACT VALUES ---
-            valid_extraction = True
-            for band in BANDS:
-                # Check if the calculated pixel is actually inside the image array
-                # (This protects against segments that don't cover the location)
-                if (0 <= row_idx < scn[band].shape[0]) and (0 <= col_idx < scn[band].shape[1]):
-                    
-                    # Extract value (Kelvin)
-                    val = scn[band][row_idx, col_idx].values.item()
-                    
-                    # Optional: Convert to Celsius
-                    if SAVE_IN_CELSIUS:
-                        val = val - 273.15
-                        
-                    row_data[band] = val
-                else:
-                    # Coordinate is outside the loaded segment(s)
-                    valid_extraction = False
-                    row_data[band] = np.nan
-            
-            if valid_extraction:
-                results.append(row_data)
-                print("Done.")
-            else:
-                print("Out of bounds (Location not in loaded segments).")
+    except Exception as e:
+        return ts_key, [], f"Error: {e}"
 
-            # Clean memory for this loop
-            del scn
+    finally:
+        # --- F. CLEANUP ---
+        # Delete the temp folder contents to save disk space
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
 
-        except Exception as e:
-            print(f"\nError processing {ts_key}: {e}")
-        
-        finally:
-            # --- F. CLEANUP ---
-            # Delete the temp folder contents to save disk space
-            if os.path.exists(TEMP_DIR):
-                shutil.rmtree(TEMP_DIR)
+def process_group(ts_key, file_list, temp_dir=None):
+    """
+    extract_group with its stages timed (see himawari_profiling.py).
+    Returns (ts_key, rows, status message, stage record).
+    """
+    start_group(ts_key)
+    _, rows, message = extract_group(ts_key, file_list, temp_dir)
+    return ts_key, rows, message, finish_group()
+
+def init_worker():
+    """
+    Runs once in every worker process. Dask computes on the calling thread,
+    so N workers use N cores instead of N x (dask threads).
+    """
+    dask.config.set(scheduler='synchronous')
+
+def process_group_in_worker(ts_key, file_list):
+    """
+    process_group with a temp folder private to this worker process, so one
+    worker's cleanup never deletes files another worker is still reading.
+    """
+    return process_group(ts_key, file_list, os.path.join(TEMP_DIR, f"worker_{os.getpid()}"))
+
+def run_groups(grouped_files, max_workers=1, on_group=None, profiles=None):
+    """
+    Processes every timestamp group, serially or across a process pool.
+    on_group(ts_key, rows, message) is called as each group finishes (e.g. to checkpoint it)
+    and each group's stage record is appended to profiles when a list is given.
+    Returns (station rows in timestamp order, elapsed seconds).
+    """
+    rows = {}
+    start_time = time.perf_counter()
+    if max_workers <= 1:
+        for ts_key, file_list in grouped_files.items():
+            print(f"Processing: {ts_key} (UTC)...", end=" ")
+            _, group_rows, message, record = process_group(ts_key, file_list)
+            print(message)
+            if profiles is not None:
+                profiles.append(record)
+            rows[ts_key] = group_rows
+            if on_group is not None:
+                on_group(ts_key, group_rows, message)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as pool:
+            futures = [pool.submit(process_group_in_worker, ts_key, file_list)
+                       for ts_key, file_list in grouped_files.items()]
+            for future in as_completed(futures):
+                ts_key, group_rows, message, record = future.result()
+                print(f"Processed: {ts_key} (UTC)... {message}")
+                if profiles is not None:
+                    profiles.append(record)
+                rows[ts_key] = group_rows
+                if on_group is not None:
+                    on_group(ts_key, group_rows, message)
+        # Worker folders are emptied after every group; remove the parent too
+        if os.path.exists(TEMP_DIR):
+            shutil.rmtree(TEMP_DIR)
+    elapsed = time.perf_counter() - start_time
+    # Workers finish out of order; ts_key (YYYYMMDD_hhmm) sorts chronologically
+    return [row for ts_key in sorted(rows) for row in rows[ts_key]], elapsed
+
+def print_extraction_rate(groups, elapsed, workers, serial_rate=None):
+    """
+    Prints groups per second, plus the scaling efficiency
+    (speedup / workers) when the serial rate is known.
+    """
+    rate = groups / max(elapsed, 1e-9)
+    line = f"Extracted {groups} groups in {elapsed:.1f} s with {workers} worker(s): {rate:.2f} groups/s"
+    if serial_rate:
+        speedup = rate / serial_rate
+        line += f", speedup {speedup:.2f}x, efficiency {100.0 * speedup / workers:.0f}%"
+    print(line)
+    return rate
+
+def process_himawari_data():
+    # Work out which segment(s) actually contain the stations
+    stations = get_stations()
+    planned_segments = plan_segments(station_points(stations)) if ONLY_PLANNED_SEGMENTS else None
+
+    grouped_files = find_timestamp_groups(planned_segments)
+    if not grouped_files:
+        return {'groups': 0, 'rows': 0, 'elapsed_s': 0.0, 'profiles': []}
+    found_files = grouped_files
+
+    print(f"Found {len(grouped_files)} unique observation times, {len(stations)} station(s).")
+    if DECOMPRESS_IN_MEMORY and not USE_NATIVE_READER:
+        print("DECOMPRESS_IN_MEMORY needs USE_NATIVE_READER (satpy reads from disk); using TEMP_DIR.")
+
+    # Skip the groups the gap registry knows cannot be completed. Only files not
+    # on disk are looked up: a group that is all here is extracted regardless.
+    if GAP_REGISTRY:
+        segments = planned_segments or range(1, 11)
+        on_disk = {ts_key: {(hsd_band(path), hsd_segment(path)) for path in paths}
+                   for ts_key, paths in grouped_files.items()}
+        incomplete = [datetime.strptime(ts_key, "%Y%m%d_%H%M") for ts_key in sorted(grouped_files)
+                      if any((band, segment) not in on_disk[ts_key]
+                             for band in BANDS for segment in segments)]
+        dead = set()
+        if incomplete:
+            gaps = open_gap_registry(GAP_REGISTRY)
+            try:
+                missing = known_missing(gaps, incomplete, BANDS, segments)
+            finally:
+                gaps.close()
+            dead = {ts_key for ts_key, band, segment in missing
+                    if (band, segment) not in on_disk[ts_key]}
+        grouped_files = {k: v for k, v in grouped_files.items() if k not in dead}
+        if dead:
+            print(f"Gap registry: skipping {len(dead)} observation time(s) with files missing upstream.")
+
+    # Skip the groups an earlier (possibly interrupted) run already saved
+    checkpoint = open_checkpoint(CHECKPOINT_DB) if CHECKPOINT_DB else None
+    settings = checkpoint_settings(stations)
+    if checkpoint is not None:
+        done = completed_groups(checkpoint, RETRY_FAILED_GROUPS, settings)
+        grouped_files = {k: v for k, v in grouped_files.items() if k not in done}
+        print(f"Checkpoint {CHECKPOINT_DB}: {len(done)} group(s) already processed, "
+              f"{len(grouped_files)} to go.")
+
+    # Catch truncated downloads now rather than halfway through a decompress + load
+    if VERIFY_BZ2:
+        bad = verify_and_quarantine([path for paths in grouped_files.values() for path in paths],
+                                    QUARANTINE_DIR)
+        if bad:
+            # The files have left the archive or cache folder; tell its index
+            if ARCHIVE_ROOT:
+                conn = open_catalog(ARCHIVE_ROOT)
+                try:
+                    for path in bad:
+                        record_file(conn, path, path, 0, STATUS_FAILED)
+                    conn.commit()
+                finally:
+                    conn.close()
+            if RAW_CACHE:
+                conn = open_raw_cache(RAW_CACHE)
+                try:
+                    remove_objects(conn, [cache_key(path) for path in bad])
+                    conn.commit()
+                finally:
+                    conn.close()
+            grouped_files = {k: v for k, v in grouped_files.items()
+                             if not any(path in bad for path in v)}
+            print("Skipping the observation time(s) of the corrupt files; re-run the downloader to fetch them again.")
+
+    # Keep the shared cache from evicting these files until they are extracted,
+    # and release pins an earlier (e.g. crashed) run left on groups now done or skipped
+    cache = open_raw_cache(RAW_CACHE) if RAW_CACHE else None
+    if cache is not None:
+        pending = {cache_key(path) for paths in grouped_files.values() for path in paths}
+        unpin(cache, [key for key in (cache_key(path) for paths in found_files.values()
+                                      for path in paths) if key not in pending],
+              RAW_CACHE_OWNER)
+        pin(cache, sorted(pending), RAW_CACHE_OWNER)
+
+    # 3. Process each timestamp group
+    batch = (CheckpointBatch(checkpoint, CHECKPOINT_BATCH, settings)
+             if checkpoint is not None else None)
+
+    def on_group(ts_key, rows, message):
+        if batch is not None:
+            batch.add(ts_key, rows, message)
+        if cache is not None and group_status(rows, message) in (STATUS_DONE, STATUS_EMPTY):
+            # Failed groups stay pinned for the next run
+            keys = [cache_key(path) for path in grouped_files[ts_key]]
+            touch(cache, keys)
+            unpin(cache, keys, RAW_CACHE_OWNER)
+
+    profiles = []
+    try:
+        results, elapsed = run_groups(grouped_files, MAX_WORKERS, on_group=on_group,
+                                      profiles=profiles)
+    finally:
+        if batch is not None:
+            batch.flush()
+        if cache is not None:
+            cache.close()
+    print_extraction_rate(len(grouped_files), elapsed, MAX_WORKERS)
+    print_profile_summary(profiles)
+    measured = [p for p in profiles if p is not None]
+    if RUN_HISTORY and measured:
+        in_memory = DECOMPRESS_IN_MEMORY and USE_NATIVE_READER
+        # In memory the bz2 blocks are decoded while opening (index) and reading
+        decode_stages = ('open', 'read') if in_memory else ('decompress',)
+        record_run(RUN_HISTORY, 'extraction', workers=MAX_WORKERS, groups=len(measured),
+                   native=USE_NATIVE_READER, in_memory=in_memory,
+                   bz2_bytes=sum(os.path.getsize(path) for paths in grouped_files.values()
+                                 for path in paths if os.path.exists(path)),
+                   decompress_s=sum(p['stages'].get(name, {}).get('wall_s', 0.0)
+                                    for p in measured for name in decode_stages),
+                   group_s=sum(p['wall_s'] for p in measured), elapsed_s=elapsed)
+    if PROFILE_OUTPUT:
+        print(f"Stage timings saved to: {os.path.abspath(export_profile(profiles, PROFILE_OUTPUT))}")
+    if MAX_WORKERS <= 1:
+        # Worker processes keep their own caches
+        print_geolocation_cache_stats()
+
+    if checkpoint is not None:
+        # The CSV covers every run saved in the checkpoint, not just this one
+        results = load_results(checkpoint)
+        failed = failed_groups(checkpoint)
+        if failed:
+            print(f"{len(failed)} group(s) failed (retried next run), e.g. {failed[0][0]}: {failed[0][1]}")
+        checkpoint.close()
 
     # 4. Save results to CSV
     if results:
         df = pd.DataFrame(results)
         
-        # Reorder columns for readability
-        cols = ['timestamp_ph', 'timestamp_utc', 'latitude', 'longitude'] + BANDS
-        df = df[cols]
+        # Reorder columns for readability (checkpointed rows from runs with other
+        # settings may lack some columns)
+        cols = output_columns()
+        df = df.reindex(columns=cols)
         
         df.to_csv(OUTPUT_CSV, index=False)
         print("-" * 30)
         print(f"Processing complete.")
         print(f"Data saved to: {os.path.abspath(OUTPUT_CSV)}")
+        if OUTPUT_PARQUET:
+            write_parquet_dataset(df, OUTPUT_PARQUET)
+            print(f"Parquet dataset: {os.path.abspath(OUTPUT_PARQUET)}")
         print("-" * 30)
         print(df.head())
     else:
         print("No valid data was extracted. Please check if your downloaded segments cover the Philippines (Lat ~14N).")
+    return {'groups': len(grouped_files), 'rows': len(results), 'elapsed_s': elapsed,
+            'profiles': profiles}
 
 if __name__ == "__main__":
     process_himawari_data()
\ No newline at end of file
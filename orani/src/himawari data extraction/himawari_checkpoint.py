@@ -0,0 +1,125 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+# Group states recorded in the checkpoint
+STATUS_DONE = 'done'        # rows extracted
+STATUS_EMPTY = 'empty'      # read fine, but no station inside the segments
+STATUS_FAILED = 'failed'    # error; retried on the next run
+
+def open_checkpoint(path):
+    """
+    Opens (and creates if needed) the SQLite checkpoint of an extraction run:
+    one line per processed ts_key group, the settings it was extracted with and
+    the station rows it produced.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS groups (
+            ts_key     TEXT PRIMARY KEY,   -- YYYYMMDD_hhmm (UTC), sorts chronologically
+            status     TEXT NOT NULL,
+            rows       INTEGER NOT NULL,
+            message    TEXT,
+            updated_at TEXT NOT NULL,
+            settings   TEXT                -- settings_fingerprint() of the run
+        )""")
+    # Checkpoints from before settings were recorded: their groups match no
+    # fingerprint, so they are processed again
+    if 'settings' not in [row[1] for row in conn.execute("PRAGMA table_info(groups)")]:
+        conn.execute("ALTER TABLE groups ADD COLUMN settings TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS results (
+            ts_key  TEXT NOT NULL,
+            station TEXT NOT NULL,
+            data    TEXT NOT NULL,         -- the output row as JSON
+            PRIMARY KEY (ts_key, station)
+        )""")
+    return conn
+
+def settings_fingerprint(**settings):
+    """
+    Canonical JSON of the settings that shape a group's rows (stations, window
+    size, bands, reader...), compared as a string.
+    """
+    return json.dumps(settings, sort_keys=True, default=str)
+
+def group_status(rows, message):
+    """
+    Checkpoint status of a process_group result.
+    """
+    if rows:
+        return STATUS_DONE
+    return STATUS_FAILED if message.startswith("Error") else STATUS_EMPTY
+
+def record_group(conn, ts_key, rows, message, settings=None):
+    """
+    Replaces the status, settings fingerprint and rows of one group. The caller
+    commits, so a group's status and its rows are always saved together.
+    """
+    conn.execute("DELETE FROM results WHERE ts_key = ?", (ts_key,))
+    conn.executemany(
+        "INSERT INTO results VALUES (?, ?, ?)",
+        [(ts_key, str(row['station']), json.dumps(row, default=str)) for row in rows])
+    conn.execute(
+        "INSERT OR REPLACE INTO groups (ts_key, status, rows, message, updated_at, settings) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (ts_key, group_status(rows, message), len(rows), message,
+         datetime.now(timezone.utc).isoformat(timespec='seconds'), settings))
+
+def completed_groups(conn, retry_failed=True, settings=None):
+    """
+    Set of ts_keys that don't need processing again (failed ones too with
+    retry_failed=False). With settings, only groups saved with that same
+    fingerprint count: after a change of stations, window or bands every group
+    (empty ones included) is extracted again.
+    """
+    statuses = [STATUS_DONE, STATUS_EMPTY] + ([] if retry_failed else [STATUS_FAILED])
+    query = f"SELECT ts_key FROM groups WHERE status IN ({','.join('?' * len(statuses))})"
+    if settings is not None:
+        query += " AND settings = ?"
+        statuses.append(settings)
+    return {ts_key for ts_key, in conn.execute(query, statuses)}
+
+def failed_groups(conn):
+    """
+    [(ts_key, error message)] of the groups that failed, in timestamp order.
+    """
+    return conn.execute("SELECT ts_key, message FROM groups WHERE status = ? ORDER BY ts_key",
+                        (STATUS_FAILED,)).fetchall()
+
+def load_results(conn):
+    """
+    Every saved station row in (timestamp, station) order, with the
+    timestamp_* columns back as datetimes.
+    """
+    results = []
+    for data, in conn.execute("SELECT data FROM results ORDER BY ts_key, station"):
+        row = json.loads(data)
+        for key in row:
+            if key.startswith('timestamp_'):
+                row[key] = datetime.fromisoformat(row[key])
+        results.append(row)
+    return results
+
+class CheckpointBatch:
+    """
+    Collects processed groups and commits them every batch_size groups, so a
+    crash loses at most one batch.
+    """
+    def __init__(self, conn, batch_size=50, settings=None):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.settings = settings
+        self.pending = 0
+
+    def add(self, ts_key, rows, message):
+        record_group(self.conn, ts_key, rows, message, self.settings)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.conn.commit()
+        self.pending = 0
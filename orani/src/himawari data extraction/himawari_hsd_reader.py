@@ -0,0 +1,220 @@
+import os
+import numpy as np
+from himawari_geolocation_cache import cached_fulldisk_pixels
+from himawari_stations import window_offsets
+
+# ================= HSD HEADER LAYOUT =================
+# Only the header fields this reader needs (Himawari Standard Data User's Guide,
+# section 5). Each block starts with its number (u1) and length (u2; u4 for block 10),
+# so the blocks are located by walking the lengths and parsed in place.
+
+# Block 1: basic information (up to the total header length)
+BASIC_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                       ('total_number_of_hblocks', '<u2'), ('byte_order', 'u1'),
+                       ('satellite', 'S16'), ('proc_center_name', 'S16'),
+                       ('observation_area', 'S4'), ('other_observation_info', 'S2'),
+                       ('observation_timeline', '<u2'), ('observation_start_time', '<f8'),
+                       ('observation_end_time', '<f8'), ('file_creation_time', '<f8'),
+                       ('total_header_length', '<u4'), ('total_data_length', '<u4')])
+
+# Block 2: data information
+DATA_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                      ('number_of_bits_per_pixel', '<u2'), ('number_of_columns', '<u2'),
+                      ('number_of_lines', '<u2'), ('compression_flag_for_data', 'u1')])
+
+# Block 3: projection information (CGMS normalized geostationary projection)
+PROJ_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                      ('sub_lon', '<f8'), ('CFAC', '<u4'), ('LFAC', '<u4'),
+                      ('COFF', '<f4'), ('LOFF', '<f4'),
+                      ('distance_from_earth_center', '<f8'),
+                      ('earth_equatorial_radius', '<f8'), ('earth_polar_radius', '<f8')])
+
+# Block 5: calibration information, followed by the IR coefficients (bands 7-16)
+CAL_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                     ('band_number', '<u2'), ('central_wave_length', '<f8'),
+                     ('valid_number_of_bits_per_pixel', '<u2'),
+                     ('count_value_error_pixels', '<u2'),
+                     ('count_value_outside_scan_pixels', '<u2'),
+                     ('gain_count2rad_conversion', '<f8'),
+                     ('offset_count2rad_conversion', '<f8'),
+                     ('c0_rad2tb_conversion', '<f8'), ('c1_rad2tb_conversion', '<f8'),
+                     ('c2_rad2tb_conversion', '<f8'), ('c0_tb2rad_conversion', '<f8'),
+                     ('c1_tb2rad_conversion', '<f8'), ('c2_tb2rad_conversion', '<f8'),
+                     ('speed_of_light', '<f8'), ('planck_constant', '<f8'),
+                     ('boltzmann_constant', '<f8')])
+
+# Block 7: segment information
+SEGMENT_INFO = np.dtype([('hblock_number', 'u1'), ('blocklength', '<u2'),
+                         ('total_number_of_segments', 'u1'),
+                         ('segment_sequence_number', 'u1'),
+                         ('first_line_number_of_image_segment', '<u2')])
+
+# Image data are little-endian 16-bit counts, line by line, after the header
+COUNT_DTYPE = np.dtype('<u2')
+# =====================================================
+
+def read_hsd_header(fp):
+    """
+    Parses the header blocks needed to locate and calibrate a pixel from an open
+    (uncompressed) HSD file or any seekable binary buffer. The header is read in
+    one forward pass, so decompressing streams never have to rewind.
+    Returns a dict with the band, image shape, segment line range, projection
+    grid (same keys as AHI_2KM) and calibration coefficients.
+    """
+    fp.seek(0)
+    raw = fp.read(BASIC_INFO.itemsize)
+    basic = np.frombuffer(raw, dtype=BASIC_INFO)[0]
+    header_length = int(basic['total_header_length'])
+    raw += fp.read(header_length - len(raw))
+    if len(raw) < header_length:
+        raise ValueError("Truncated HSD header")
+
+    # Walk the block lengths once to find where each block starts
+    offsets = {}
+    pos = 0
+    for _ in range(int(basic['total_number_of_hblocks'])):
+        number = raw[pos]
+        # Block 10 (error information) is the only one with a 4-byte length
+        length_size = 4 if number == 10 else 2
+        length = int.from_bytes(raw[pos + 1:pos + 1 + length_size], 'little')
+        if length == 0:
+            raise ValueError(f"Corrupt HSD header (block {number} has zero length)")
+        offsets.setdefault(number, pos)
+        pos += length
+
+    def block(number, dtype):
+        return np.frombuffer(raw, dtype=dtype, count=1, offset=offsets[number])[0]
+
+    data_info = block(2, DATA_INFO)
+    proj = block(3, PROJ_INFO)
+    cal = block(5, CAL_INFO)
+    seg = block(7, SEGMENT_INFO)
+
+    nlines = int(data_info['number_of_lines'])
+    ncols = int(data_info['number_of_columns'])
+    total_segments = int(seg['total_number_of_segments'])
+    return {
+        'satellite': basic['satellite'].decode(errors='ignore').strip('\x00 '),
+        'band_number': int(cal['band_number']),
+        'header_length': header_length,
+        'lines': nlines,
+        'columns': ncols,
+        'segment': int(seg['segment_sequence_number']),
+        'total_segments': total_segments,
+        # 0-based full-disk row of the segment's first line
+        'first_row': int(seg['first_line_number_of_image_segment']) - 1,
+        'grid': {
+            'sub_lon': float(proj['sub_lon']),
+            'cfac': int(proj['CFAC']),
+            'lfac': int(proj['LFAC']),
+            'coff': float(proj['COFF']),
+            'loff': float(proj['LOFF']),
+            'h': float(proj['distance_from_earth_center']),
+            'req': float(proj['earth_equatorial_radius']),
+            'rpol': float(proj['earth_polar_radius']),
+            'lines': nlines * total_segments,
+            'columns': ncols,
+            'segments': total_segments,
+        },
+        'calibration': {name: cal[name].item() for name in CAL_INFO.names[3:]},
+    }
+
+def fulldisk_pixels(header, stations):
+    """
+    Nearest full-disk (row, col) of every (name, lat, lon) station on the file's
+    own grid, or None for stations the satellite can't see. Projected once per
+    grid and reused for every later file on the same grid.
+    """
+    return cached_fulldisk_pixels(header['grid'], stations)
+
+def read_counts(fp, header, local_rows, local_cols):
+    """
+    Reads raw counts at (segment row, col) positions by seeking straight to each
+    pixel; nothing else in the image block is read. Pixels are visited in file
+    order so a decompressing stream only ever moves forward.
+    """
+    offsets = [header['header_length'] + (row * header['columns'] + col) * COUNT_DTYPE.itemsize
+               for row, col in zip(local_rows, local_cols)]
+    counts = np.empty(len(offsets), dtype=np.uint16)
+    for i in sorted(range(len(offsets)), key=offsets.__getitem__):
+        fp.seek(offsets[i])
+        counts[i] = np.frombuffer(fp.read(COUNT_DTYPE.itemsize), dtype=COUNT_DTYPE)[0]
+    return counts
+
+def counts_to_brightness_temperature(counts, header):
+    """
+    Count -> radiance -> brightness temperature (K) for IR bands, as in the HSD
+    User's Guide (and satpy's ahi_hsd reader). Error and outside-scan counts,
+    and zero radiance, become NaN.
+    """
+    cal = header['calibration']
+    counts = np.asarray(counts)
+    invalid = ((counts == cal['count_value_error_pixels']) |
+               (counts == cal['count_value_outside_scan_pixels']))
+    radiance = (counts.astype(np.float32) * np.float32(cal['gain_count2rad_conversion'])
+                + np.float32(cal['offset_count2rad_conversion'])).astype(np.float64)
+    invalid |= radiance == 0
+
+    # Effective temperature from the inverse Planck function
+    cwl = cal['central_wave_length'] * 1e-6
+    c, h, k = cal['speed_of_light'], cal['planck_constant'], cal['boltzmann_constant']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        te = (h * c) / (k * cwl) / np.log((2 * h * c ** 2) / (radiance * 1.0e6 * cwl ** 5) + 1)
+    bt = cal['c0_rad2tb_conversion'] + cal['c1_rad2tb_conversion'] * te + cal['c2_rad2tb_conversion'] * te ** 2
+    bt = np.clip(bt, 0, None)
+    bt[invalid] = np.nan
+    return bt
+
+def read_station_temperatures(sources, stations, window=1):
+    """
+    Brightness temperature (K) of every station from the segment files of one band.
+    sources are paths or open binary buffers (e.g. decompressed in memory).
+    Returns (values, covered): arrays aligned with stations, covered is False
+    where no segment holds the station (values are NaN there).
+    With window > 1, values has a column per pixel of the window x window block
+    around each station (see window_offsets); a block crossing a segment boundary
+    is completed from the neighbouring segment when it is among the sources.
+    """
+    d_rows, d_cols = window_offsets(window)
+    centre = d_rows.size // 2
+    values = np.full((len(stations), d_rows.size), np.nan)
+    covered = np.zeros(len(stations), dtype=bool)
+    for source in sources:
+        fp = open(source, 'rb') if isinstance(source, str) else source
+        try:
+            header = read_hsd_header(fp)
+            pixels = fulldisk_pixels(header, stations)
+            index, slots, local_rows, local_cols = [], [], [], []
+            for i, pixel in enumerate(pixels):
+                if pixel is None:
+                    continue
+                for slot in range(d_rows.size):
+                    row = pixel[0] + d_rows[slot] - header['first_row']
+                    col = pixel[1] + d_cols[slot]
+                    if 0 <= row < header['lines'] and 0 <= col < header['columns']:
+                        index.append(i)
+                        slots.append(slot)
+                        local_rows.append(row)
+                        local_cols.append(col)
+            if index:
+                counts = read_counts(fp, header, local_rows, local_cols)
+                values[index, slots] = counts_to_brightness_temperature(counts, header)
+                covered[[i for i, slot in zip(index, slots) if slot == centre]] = True
+        finally:
+            if isinstance(source, str):
+                fp.close()
+    if window == 1:
+        return values[:, 0], covered
+    return values, covered
+
+def hsd_band(source_name):
+    """
+    Band ('B14') from an HSD filename, e.g. HS_H09_20250416_0200_B14_FLDK_R20_S0410.DAT.
+    """
+    return os.path.basename(source_name).split('_')[4]
+
+def hsd_segment(source_name):
+    """
+    Segment number (4) from an HSD filename, e.g. HS_H09_20250416_0200_B14_FLDK_R20_S0410.DAT.
+    """
+    return int(os.path.basename(source_name).split('_')[7][1:3])
@@ -0,0 +1,132 @@
+import csv
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# Record of the group being processed in this process (None outside a group)
+_CURRENT = None
+
+def _peak_rss_mb():
+    """
+    Peak resident memory in MB: since the last reset on Linux (VmHWM),
+    since the process started elsewhere.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1e3
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+def _reset_peak_rss():
+    """
+    Starts a new peak RSS window where the kernel allows it (Linux 4.0+).
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def start_group(ts_key):
+    """
+    Starts recording the stages of one timestamp group in this process.
+    """
+    global _CURRENT
+    _reset_peak_rss()
+    _CURRENT = {'ts_key': ts_key, 'stages': {},
+                '_start': (time.perf_counter(), time.process_time())}
+
+def finish_group():
+    """
+    Stops recording and returns the group's record:
+    {ts_key, wall_s, cpu_s, peak_rss_mb, stages: {name: {wall_s, cpu_s, bytes, calls}}}.
+    """
+    global _CURRENT
+    record, _CURRENT = _CURRENT, None
+    if record is None:
+        return None
+    wall_start, cpu_start = record.pop('_start')
+    record['wall_s'] = time.perf_counter() - wall_start
+    record['cpu_s'] = time.process_time() - cpu_start
+    record['peak_rss_mb'] = _peak_rss_mb()
+    return record
+
+@contextmanager
+def stage(name):
+    """
+    Times a block as one stage of the current group (wall and CPU seconds).
+    Yields the stage's totals so the block can add the bytes it read:
+        with stage('decompress') as s:
+            s['bytes'] += size
+    Repeated stages add up. Outside a group the block just runs.
+    """
+    totals = {'wall_s': 0.0, 'cpu_s': 0.0, 'bytes': 0, 'calls': 0}
+    if _CURRENT is not None:
+        totals = _CURRENT['stages'].setdefault(name, totals)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield totals
+    finally:
+        totals['wall_s'] += time.perf_counter() - wall_start
+        totals['cpu_s'] += time.process_time() - cpu_start
+        totals['calls'] += 1
+
+def profile_rows(records):
+    """
+    Flat rows (one per group and stage, plus a 'total' row per group) for
+    the summary and the CSV export.
+    """
+    rows = []
+    for record in records:
+        for name, totals in record['stages'].items():
+            rows.append({'ts_key': record['ts_key'], 'stage': name, 'wall_s': totals['wall_s'],
+                         'cpu_s': totals['cpu_s'], 'bytes': totals['bytes'],
+                         'peak_rss_mb': record['peak_rss_mb']})
+        rows.append({'ts_key': record['ts_key'], 'stage': 'total', 'wall_s': record['wall_s'],
+                     'cpu_s': record['cpu_s'],
+                     'bytes': sum(t['bytes'] for t in record['stages'].values()),
+                     'peak_rss_mb': record['peak_rss_mb']})
+    return rows
+
+def print_profile_summary(records):
+    """
+    Prints p50 / p95 / max wall time per stage across the groups, with the
+    mean CPU time, mean bytes and the largest peak RSS.
+    """
+    rows = profile_rows([r for r in records if r is not None])
+    if not rows:
+        return
+    stages = list(dict.fromkeys(row['stage'] for row in rows))
+    print(f"{'Stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'CPU ms':>10}{'MB read':>10}{'RSS MB':>10}")
+    for name in stages:
+        selected = [row for row in rows if row['stage'] == name]
+        wall = np.array([row['wall_s'] for row in selected]) * 1000
+        print(f"{name:<12}{np.percentile(wall, 50):>10.1f}{np.percentile(wall, 95):>10.1f}"
+              f"{wall.max():>10.1f}{np.mean([row['cpu_s'] for row in selected]) * 1000:>10.1f}"
+              f"{np.mean([row['bytes'] for row in selected]) / 1e6:>10.2f}"
+              f"{max(row['peak_rss_mb'] for row in selected):>10.0f}")
+
+def export_profile(records, path):
+    """
+    Saves the group records as JSON (path ending in .json) or as the flat
+    per-stage rows in CSV.
+    """
+    records = [r for r in records if r is not None]
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(records, f, indent=1)
+        return path
+    rows = profile_rows(records)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['ts_key', 'stage', 'wall_s', 'cpu_s', 'bytes', 'peak_rss_mb'])
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
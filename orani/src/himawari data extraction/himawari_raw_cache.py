@@ -0,0 +1,238 @@
+import os
+import shutil
+import sqlite3
+import time
+from himawari_s3_listing import parse_himawari_filename, slot_prefix
+from himawari_bz2_index import INDEX_SUFFIX
+
+# ================= CONFIGURATION =================
+# One raw .bz2 cache shared by the four station trees (balanga, bagac,
+# dinalupihan, orani), so every full-disk file is downloaded and stored once
+RAW_CACHE_DIR = '/Users/danwilliammartinez/Desktop/Himawari_AWS_Study/raw_cache'
+# Size cap: least recently used files beyond it are evicted, except the ones
+# a station still has pinned for a pending extraction
+RAW_CACHE_MAX_BYTES = 200 * 1024 ** 3
+# Flat download folder imported into the cache when run directly (None = skip)
+IMPORT_DIR = None
+# Station whose pins are all dropped when run directly, e.g. a tree that crashed
+# and won't extract its pending groups again (None = keep every pin). A station's
+# own extractor already releases the pins it no longer needs on its next run.
+CLEAR_PINS_OWNER = None
+# =================================================
+
+# Index database kept at the root of the cache
+INDEX_NAME = 'cache.sqlite'
+
+# Name pins are recorded under: the station tree this copy of the scripts
+# lives in (<tree>/src/himawari data extraction/)
+DEFAULT_OWNER = os.path.basename(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+def cache_path(cache_root, key):
+    """
+    Location of an object in the cache: the S3 key under cache_root, so the
+    same object always maps to the same file whichever station asks for it.
+    """
+    return os.path.join(cache_root, *key.split('/'))
+
+def cache_key(file_name):
+    """
+    S3 key of a standard HSD filename (AHI-L1b-FLDK/YYYY/MM/DD/HHMM/<name>),
+    or None if the name doesn't follow the convention.
+    """
+    info = parse_himawari_filename(file_name)
+    if info is None:
+        return None
+    return slot_prefix(info['timestamp']) + os.path.basename(file_name)
+
+def open_raw_cache(cache_root=RAW_CACHE_DIR):
+    """
+    Opens (and creates if needed) the SQLite index of the cache.
+    Several stations may use it at once, so writers wait for each other.
+    """
+    os.makedirs(cache_root, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(cache_root, INDEX_NAME), timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS objects (
+            key       TEXT PRIMARY KEY,   -- S3 key
+            ts_key    TEXT NOT NULL,      -- YYYYMMDD_hhmm (UTC)
+            band      TEXT NOT NULL,
+            segment   INTEGER NOT NULL,
+            size      INTEGER NOT NULL,
+            last_used REAL NOT NULL       -- Unix time, for LRU eviction
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS objects_ts_band ON objects (ts_key, band, segment)")
+    conn.execute("CREATE INDEX IF NOT EXISTS objects_last_used ON objects (last_used)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pins (
+            key       TEXT NOT NULL,
+            owner     TEXT NOT NULL,      -- station tree waiting to extract it
+            pinned_at REAL NOT NULL,
+            PRIMARY KEY (key, owner)
+        )""")
+    return conn
+
+def add_object(conn, key, size):
+    """
+    Adds (or refreshes) one object that is now in the cache. The caller commits.
+    """
+    info = parse_himawari_filename(key)
+    if info is None:
+        return
+    conn.execute("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)",
+                 (key, info['ts_key'], info['band'], info['segment'], size, time.time()))
+
+def remove_objects(conn, keys):
+    """
+    Forgets objects whose files have left the cache (e.g. quarantined as
+    corrupt), with every station's pins on them, so the next download run
+    fetches them again. The caller commits.
+    """
+    conn.executemany("DELETE FROM objects WHERE key = ?", [(key,) for key in keys])
+    conn.executemany("DELETE FROM pins WHERE key = ?", [(key,) for key in keys])
+
+def is_cached(conn, key):
+    return conn.execute("SELECT 1 FROM objects WHERE key = ?", (key,)).fetchone() is not None
+
+def touch(conn, keys):
+    """
+    Marks the objects as just used. The caller commits.
+    """
+    now = time.time()
+    conn.executemany("UPDATE objects SET last_used = ? WHERE key = ?", [(now, key) for key in keys])
+
+def pin(conn, keys, owner=DEFAULT_OWNER):
+    """
+    Protects the objects from eviction until owner unpins them (pins never
+    expire). Pinning again refreshes pinned_at. Commits.
+    """
+    now = time.time()
+    conn.executemany("INSERT OR REPLACE INTO pins VALUES (?, ?, ?)", [(key, owner, now) for key in keys])
+    conn.commit()
+
+def unpin(conn, keys, owner=DEFAULT_OWNER):
+    """
+    Drops owner's pins on the objects (other stations' pins stay). Commits.
+    """
+    conn.executemany("DELETE FROM pins WHERE key = ? AND owner = ?", [(key, owner) for key in keys])
+    conn.commit()
+
+def clear_pins(conn, owner):
+    """
+    Drops every pin of owner, e.g. left by a crashed run that won't be resumed.
+    Returns the number of pins dropped. Commits.
+    """
+    cleared = conn.execute("DELETE FROM pins WHERE owner = ?", (owner,)).rowcount
+    conn.commit()
+    return cleared
+
+def cached_groups(conn, cache_root, start_time=None, end_time=None, bands=('B14', 'B15'),
+                  segments=range(1, 11)):
+    """
+    Returns {ts_key: [paths]} of the timestamps between start_time and end_time
+    (inclusive, UTC datetimes or None) with every band and segment in the cache.
+    """
+    conditions = [f"band IN ({','.join('?' * len(bands))})",
+                  f"segment IN ({','.join('?' * len(segments))})"]
+    params = list(bands) + list(segments)
+    if start_time is not None:
+        conditions.append("ts_key >= ?")
+        params.append(start_time.strftime('%Y%m%d_%H%M'))
+    if end_time is not None:
+        conditions.append("ts_key <= ?")
+        params.append(end_time.strftime('%Y%m%d_%H%M'))
+    groups = {}
+    for ts_key, key in conn.execute(
+            f"SELECT ts_key, key FROM objects WHERE {' AND '.join(conditions)} ORDER BY key", params):
+        groups.setdefault(ts_key, []).append(cache_path(cache_root, key))
+    expected = len(bands) * len(segments)
+    return {ts_key: paths for ts_key, paths in sorted(groups.items()) if len(paths) == expected}
+
+def cache_usage(conn):
+    """
+    (objects, bytes, pinned objects) currently in the cache.
+    """
+    objects, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+    pinned = conn.execute("SELECT COUNT(DISTINCT key) FROM pins").fetchone()[0]
+    return objects, size, pinned
+
+def evict(conn, cache_root, max_bytes=RAW_CACHE_MAX_BYTES):
+    """
+    Deletes least recently used objects until the cache fits in max_bytes.
+    Objects pinned by any station are kept, however old the pin.
+    Returns (objects evicted, bytes freed).
+    """
+    _, total, _ = cache_usage(conn)
+    evicted = 0
+    freed = 0
+    if total > max_bytes:
+        rows = conn.execute(
+            "SELECT key, size FROM objects WHERE key NOT IN (SELECT key FROM pins) "
+            "ORDER BY last_used").fetchall()
+        for key, size in rows:
+            if total - freed <= max_bytes:
+                break
+            path = cache_path(cache_root, key)
+            # The block index built by the extractor goes with its file
+            for stale in (path, path + INDEX_SUFFIX):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+            evicted += 1
+            freed += size
+    conn.commit()
+    if total - freed > max_bytes:
+        print(f"Raw cache is {(total - freed) / 1e9:.1f} GB, over its {max_bytes / 1e9:.1f} GB cap: "
+              "the rest is pinned by pending extractions.")
+    return evicted, freed
+
+def import_flat_folder(conn, cache_root, flat_dir, move=True, batch_size=1000):
+    """
+    Moves (or copies with move=False) the .DAT.bz2 files of a station's flat
+    download folder into the cache. Files the cache already has are left alone.
+    Returns (imported, already cached) counts.
+    """
+    imported = 0
+    duplicates = 0
+    with os.scandir(flat_dir) as entries:
+        for entry in entries:
+            key = cache_key(entry.name) if entry.name.endswith('.DAT.bz2') else None
+            if key is None or not entry.is_file():
+                continue
+            if is_cached(conn, key):
+                duplicates += 1
+                continue
+            target = cache_path(cache_root, key)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if move:
+                shutil.move(entry.path, target)
+            else:
+                shutil.copy2(entry.path, target)
+            add_object(conn, key, os.path.getsize(target))
+            imported += 1
+            if imported % batch_size == 0:
+                conn.commit()
+                print(f"Imported {imported} files...")
+    conn.commit()
+    return imported, duplicates
+
+def print_cache_usage(conn, max_bytes=RAW_CACHE_MAX_BYTES):
+    objects, size, pinned = cache_usage(conn)
+    print(f"Raw cache: {objects} objects, {size / 1e9:.2f} of {max_bytes / 1e9:.1f} GB, {pinned} pinned")
+
+if __name__ == "__main__":
+    cache = open_raw_cache(RAW_CACHE_DIR)
+    try:
+        if IMPORT_DIR:
+            imported, duplicates = import_flat_folder(cache, RAW_CACHE_DIR, IMPORT_DIR)
+            print(f"Imported {imported} files from {IMPORT_DIR} ({duplicates} already cached)")
+        if CLEAR_PINS_OWNER:
+            print(f"Cleared {clear_pins(cache, CLEAR_PINS_OWNER)} pin(s) of {CLEAR_PINS_OWNER}")
+        evicted, freed = evict(cache, RAW_CACHE_DIR)
+        if evicted:
+            print(f"Evicted {evicted} files ({freed / 1e9:.2f} GB)")
+        print_cache_usage(cache)
+    finally:
+        cache.close()
@@ -0,0 +1,37 @@
+import json
+import os
+import platform
+from datetime import datetime
+
+# Measured runs of the downloader and the extractor, one JSON object per line.
+# The run planner (himawari_run_planner.py) turns them into throughput estimates.
+RUN_HISTORY = 'himawari_run_history.jsonl'
+
+def record_run(path, kind, **fields):
+    """
+    Appends one finished run ('download' or 'extraction') and its measurements.
+    """
+    run = {'kind': kind, 'date': datetime.now().isoformat(timespec='seconds'),
+           'host': platform.node()}
+    run.update(fields)
+    with open(path, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+def load_runs(path=RUN_HISTORY, kind=None, **match):
+    """
+    Runs from the history, oldest first, optionally only those of one kind
+    whose fields equal every keyword given (e.g. engine='asyncio', workers=16).
+    """
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            run = json.loads(line)
+            if kind is not None and run.get('kind') != kind:
+                continue
+            if all(run.get(field) == value for field, value in match.items()):
+                runs.append(run)
+    return runs